@@ -1,12 +1,17 @@
 import streamlit as st
-import concurrent.futures
-import traceback
+import time
 
 # 모듈화된 파일에서 필요한 함수와 객체 임포트
-from github_util import extract_github_info, fetch_pr_diff
-from utils import parse_diff, get_copy_button_html
-from review_generator import generate_review_for_file, generate_final_summary
-from config import GITHUB_TOKEN
+from github_util import extract_github_info, get_github_stats
+from utils import get_copy_button_html
+from job_queue import CANCELLED, FAILED, FINISHED_STATUSES, INTERRUPTED, SUMMARIZING, get_job_manager
+from review_budget import STOP_REASON_LABELS
+from llm_scheduler import get_scheduler
+from config import METRICS_HOST, METRICS_PORT, prewarm_clients
+from telemetry import start_metrics_server
+
+# 스트리밍 중인 리뷰를 화면에 다시 그리는 최소 간격(초). 토큰마다 그리지 않고 이 주기로 합쳐서 갱신합니다.
+STREAM_UI_INTERVAL = 0.3
 
 def main():
     """
@@ -14,8 +19,15 @@ def main():
     """
     st.set_page_config(page_title="PR AI 리뷰어 v1.0", layout="wide")
     st.title("🤖 GitHub PR AI 리뷰어 v1.0")
+    # 첫 리뷰가 SDK 임포트·클라이언트 생성을 기다리지 않도록 백그라운드에서 미리 준비 (프로세스당 한 번)
+    prewarm_clients()
+    if METRICS_PORT > 0:
+        # Prometheus 형식 지표(/metrics). 프로세스당 한 번만 시작됨
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+    _show_scheduler_stats()
+    manager = get_job_manager()
 
-    diff_text = ""
+    parsed_info = None
     # GitHub PR URL 입력 필드
     pr_url = st.text_input("🔗 GitHub Pull Request URL을 입력해주세요")
 
@@ -24,25 +36,27 @@ def main():
         parsed_info = extract_github_info(pr_url)
         if not parsed_info:
             st.error("❌ 유효하지 않은 GitHub Pull Request URL입니다.")
-        else:
-            owner, repo, pr_num = parsed_info
-            try:
-                with st.spinner("GitHub에서 PR 정보를 가져오는 중..."):
-                    # GitHub API를 통해 PR diff 내용 가져오기
-                    diff_text = fetch_pr_diff(owner, repo, pr_num, GITHUB_TOKEN)
-            except Exception as e:
-                st.error(f"GitHub PR 정보를 가져오는 중 오류 발생: {e}")
-                st.stop() # 오류 발생 시 실행 중단
-
-    # diff 내용이 있고 '리뷰 생성' 버튼이 눌렸을 때
-    if diff_text and st.button("✨ 리뷰 생성", type="primary"):
-        # diff 텍스트를 파일별로 분리
-        file_diffs = parse_diff(diff_text)
-
-        if not file_diffs:
-            st.warning("분석할 코드 변경사항을 찾지 못했습니다. diff 형식이 올바른지 확인해주세요.")
-        else:
-            run_review_process(file_diffs)
+
+    # 캐시를 무시하고 모든 청크를 새로 리뷰할지 여부
+    bypass_cache = bool(parsed_info) and st.checkbox("♻️ 리뷰 캐시를 사용하지 않고 새로 생성")
+
+    # '리뷰 생성' 버튼이 눌리면 리뷰를 백그라운드 작업으로 제출.
+    # 작업 ID를 URL에 남겨 두므로 새로고침하거나 연결이 끊겨도 같은 작업을 다시 볼 수 있음
+    job_id = st.query_params.get("job")
+    if parsed_info and st.button("✨ 리뷰 생성", type="primary"):
+        job_id, coalesced = manager.submit(*parsed_info, use_cache=not bypass_cache)
+        st.query_params["job"] = job_id
+        if coalesced:
+            st.info(f"🔗 같은 PR 커밋에 대해 진행 중인 리뷰 작업 `{job_id}`에 연결합니다.")
+    elif parsed_info and not job_id:
+        # 다른 세션에서 같은 PR을 리뷰 중이면 그 작업에 연결할 수 있도록 안내
+        active_id = manager.find_active(*parsed_info)
+        if active_id and st.button(f"🔗 진행 중인 리뷰 작업 `{active_id}` 보기"):
+            job_id = active_id
+            st.query_params["job"] = job_id
+
+    if job_id:
+        watch_review_job(job_id)
 
     # --- 복사 버튼 표시 ---
     # 이전에 생성된 리뷰 결과가 있을 경우에만 복사 버튼 표시
@@ -52,63 +66,305 @@ def main():
         copy_html = get_copy_button_html(st.session_state["last_review"])
         st.components.v1.html(copy_html, height=50)
 
-def run_review_process(file_diffs: list[dict]):
+    # 이번 실행까지의 GitHub API 호출 통계 (rerun마다 diff를 다시 요청해도 ETag 재검증으로 304가 됨)
+    _show_github_stats()
+
+def watch_review_job(job_id: str):
     """
-    파일별 코드 리뷰 및 최종 요약 생성 프로세스를 실행합니다.
+    백그라운드 리뷰 작업의 진행 상황을 주기적으로 읽어 화면에 표시합니다.
+    작업은 이 스크립트 실행과 무관하게 진행되므로, 화면을 떠났다가 돌아와도 같은 작업을 이어서 볼 수 있습니다.
 
     Args:
-        file_diffs (list[dict]): 파일별 diff 정보를 담은 리스트
+        job_id (str): `job_queue.JobManager.submit`이 반환한 작업 ID.
     """
+    manager = get_job_manager()
+    job = manager.get_job(job_id)
+    if job is None:
+        st.error(f"리뷰 작업 `{job_id}`을(를) 찾을 수 없습니다. 오래되어 삭제되었을 수 있습니다.")
+        del st.query_params["job"]
+        return
+
+    st.caption(f"🗂️ 리뷰 작업 `{job_id}` · {job['owner']}/{job['repo']}#{job['pr_number']}")
+    if job["status"] not in FINISHED_STATUSES and st.button("⏹️ 리뷰 중단"):
+        # 대기 중인 리뷰는 건너뛰고 전송 중인 요청은 끊음. 이미 끝난 파일 리뷰는 남음
+        manager.cancel(job_id)
+    files_area = st.container()
+    usage_placeholder = st.empty()
+    timing_placeholder = st.empty()
+    warnings_placeholder = st.empty()
+    status_placeholder = st.empty()
+    report_placeholder = st.empty()
+    view = JobView(files_area)
+
     with st.spinner("🧠 Azure AI가 코드를 분석하고 리뷰를 생성하는 중입니다... 잠시만 기다려주세요."):
-        review_results = []
-        placeholders = {file_info['filename']: st.empty() for file_info in file_diffs}
+        while True:
+            view.render_files(job)
+            if job["status"] in FINISHED_STATUSES:
+                break
+            if job["live"] and job["live"]["usage"]:
+                usage_placeholder.caption(_format_usage(job["live"]["usage"]))
+            if job["live"] and job["live"]["warnings"]:
+                # 워커 스레드의 경고는 작업에 모아 두고 이 (메인) 스레드에서 표시
+                _show_warnings(warnings_placeholder, job["live"]["warnings"])
+            if job["live"] and job["live"]["timing"]:
+                timing_placeholder.caption(_format_stage_summary(job["live"]["timing"]))
+            if job["status"] == SUMMARIZING:
+                status_placeholder.info("📜 최종 보고서 작성 중...")
+                summary = job["live"]["summary"] if job["live"] else None
+                if summary:
+                    report_placeholder.markdown("## 🚀 PR 리뷰 최종 보고서\n\n" + summary + " ▌")
+            time.sleep(STREAM_UI_INTERVAL)
+            job = manager.get_job(job_id)
 
-        # 파일별 분석 상태를 초기에 '분석 중'으로 표시
-        for filename, placeholder in placeholders.items():
-            with placeholder.container():
-                st.expander(f"**📄 파일: {filename}** - ⏳ 분석 중...", expanded=True)
+    if job["status"] == INTERRUPTED:
+        status_placeholder.warning(f"⚠️ {job['error']} 다시 리뷰를 생성해주세요.")
+        return
+    if job["status"] == FAILED:
+        status_placeholder.error(job["error"] or "리뷰 작업이 실패했습니다.")
+        return
+
+    report = job["report"] or {}
+    _show_warnings(warnings_placeholder, report.get("warnings"))
+    if report.get("usage"):
+        usage_placeholder.caption(_format_usage(report["usage"]))
+    timing_placeholder.empty()
+    _show_timing_breakdown(report.get("trace"))
+    if job["status"] == CANCELLED:
+        report_placeholder.empty()
+        status_placeholder.warning("⏹️ 리뷰를 중단했습니다. 중단 전에 끝난 파일 리뷰는 위에 남아 있습니다.")
+        return
+    if not report.get("file_count"):
+        status_placeholder.empty()
+        st.warning("분석할 코드 변경사항을 찾지 못했습니다. diff 형식이 올바른지 확인해주세요.")
+        return
+
+    if report.get("previous_head") and report.get("reused"):
+        st.info(f"♻️ 마지막으로 리뷰한 커밋 `{report['previous_head'][:7]}` 이후 변경되지 않은 {report['reused']}개 파일의 리뷰를 재사용했습니다.")
+    if report.get("skipped"):
+        reason = STOP_REASON_LABELS.get(report.get("stop_reason"), "제한 초과")
+        st.warning(f"⏭️ {reason}(으)로 {len(report['skipped'])}개 파일은 리뷰하지 않았습니다. 최종 보고서는 끝난 리뷰만으로 작성한 부분 보고서입니다.")
+    _show_triage_stats(report.get("triage"))
+    _show_compaction_stats(report.get("compaction"))
+    _show_dedup_stats(report.get("dedup"))
+    stats = report.get("stats") or {}
+    _show_detection_stats(stats.get("detection"))
+    _show_review_cache_stats(stats.get("cache"))
+    _show_scheduler_run_stats(stats.get("scheduler"))
 
-        # ThreadPoolExecutor를 사용하여 파일 리뷰를 병렬로 처리
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            future_to_file = {executor.submit(generate_review_for_file, file_info): file_info for file_info in file_diffs}
-
-            for future in concurrent.futures.as_completed(future_to_file):
-                file_info = future_to_file[future]
-                filename = file_info['filename']
-                placeholder = placeholders[filename]
-
-                try:
-                    result = future.result()
-                    review_results.append(result)
-                    # 완료된 파일의 UI를 업데이트하여 결과 표시
-                    with placeholder.container():
-                        with st.expander(f"**📄 파일: {result['filename']}** ({result['language']}) - ✅ 분석 완료", expanded=False):
-                            st.markdown(result['review'])
-                except Exception as exc:
-                    error_message = f"리뷰 생성 중 에러 발생: {exc}"
-                    traceback.print_exc()
-                    # 에러 발생 시 UI에 에러 메시지 표시
-                    with placeholder.container():
-                        st.expander(f"**📄 파일: {filename}** - ❌ 분석 실패", expanded=True).error(error_message)
-
-    st.success("✅ 모든 파일 분석이 완료되었습니다! 최종 보고서를 생성합니다...")
-
-    # 모든 개별 리뷰가 완료된 후 최종 요약 생성
-    with st.spinner("📜 최종 보고서 작성 중..."):
-        # 결과를 파일명 순으로 정렬하여 일관성 유지
-        review_results.sort(key=lambda x: x['filename'])
-        final_summary = generate_final_summary(review_results)
-
-    st.success("✨ 최종 리뷰가 생성되었습니다!")
-    st.markdown("---")
-
-    # 최종 응답 템플릿 적용 및 결과 표시
-    st.markdown("## 🚀 PR 리뷰 최종 보고서")
-    st.markdown(final_summary)
+    final_summary = job["summary"]
+    report_placeholder.markdown(f"## 🚀 PR 리뷰 최종 보고서\n\n{final_summary}")
+    status_placeholder.success(f"✨ 최종 리뷰가 생성되었습니다!{_format_timing(report.get('summary_timing'))}")
+    if report.get("map_count"):
+        st.caption(f"🧾 최종 보고서: 부분 요약 {report['map_count']}건, 중간 병합 {report['reduce_count']}건을 거쳐 생성")
 
     # 복사 기능을 위해 전체 내용을 Streamlit session_state에 저장
     st.session_state["last_review"] = f"## 🚀 PR 리뷰 최종 보고서\n\n{final_summary}"
 
+class JobView:
+    """작업의 파일별 진행 상황을 파일별 placeholder에 그립니다. 바뀐 파일만 다시 그립니다."""
+
+    def __init__(self, area):
+        self.area = area
+        self.placeholders = {}
+        self.rendered = {}
+
+    def render_files(self, job: dict):
+        streams = job["live"]["streams"] if job["live"] else {}
+        for item in job["files"]:
+            filename = item["filename"]
+            state = (item["status"], streams.get(filename))
+            if self.rendered.get(filename) == state:
+                continue
+            self.rendered[filename] = state
+            with self._placeholder(filename).container():
+                self._render_file(filename, item, streams.get(filename))
+
+    def _render_file(self, filename: str, item: dict, streaming: str):
+        result = item["result"]
+        if result is None:
+            if streaming:
+                with st.expander(f"**📄 파일: {filename}** - ✍️ 리뷰 작성 중...", expanded=True):
+                    st.markdown(streaming + " ▌")
+            else:
+                # 파일별 분석 상태를 초기에 '분석 중'으로 표시
+                st.expander(f"**📄 파일: {filename}** - ⏳ 분석 중...", expanded=True)
+            return
+        if result.get('skipped'):
+            with st.expander(f"**📄 파일: {filename}** ({result['language']}) - ⏭️ 리뷰하지 않음(일부 또는 전체)", expanded=False):
+                st.markdown(result['review'])
+            return
+        if result.get('reused'):
+            with st.expander(f"**📄 파일: {filename}** ({result['language']}) - ♻️ 이전 결과 재사용", expanded=False):
+                st.markdown(result['review'])
+            return
+        if result.get('triage'):
+            with st.expander(f"**📄 파일: {filename}** - 🧹 리뷰 제외", expanded=False):
+                st.markdown(result['review'])
+            return
+        status = "⚠️ 일부 분석 실패" if result.get('error') else "✅ 분석 완료"
+        status += _format_timing(result.get('timing'))
+        with st.expander(f"**📄 파일: {filename}** ({result['language']}) - {status}", expanded=bool(result.get('error'))):
+            st.markdown(result['review'])
+
+    def _placeholder(self, filename: str):
+        placeholder = self.placeholders.get(filename)
+        if placeholder is None:
+            with self.area:
+                placeholder = self.placeholders[filename] = st.empty()
+        return placeholder
+
+def _format_timing(timing: dict) -> str:
+    """첫 토큰까지 걸린 시간(TTFT)과 전체 시간을 ' (첫 토큰 1.2초 / 전체 8.4초)' 형식으로 만듭니다."""
+    if not timing or not timing.get("total"):
+        return ""
+    if timing.get("ttft") is None:
+        return f" (전체 {timing['total']:.1f}초)"
+    return f" (첫 토큰 {timing['ttft']:.1f}초 / 전체 {timing['total']:.1f}초)"
+
+def _show_warnings(placeholder, warnings: list[str]):
+    """리뷰 중 워커 스레드에서 모은 경고를 한 상자에 표시합니다."""
+    if warnings:
+        placeholder.warning("\n\n".join(f"⚠️ {message}" for message in warnings))
+
+def _format_stage_summary(breakdown: dict, top: int = 3) -> str:
+    """진행 중인 리뷰의 경과 시간과 누적 시간이 큰 단계 몇 개를 한 줄로 만듭니다."""
+    stages = " · ".join(f"{s['stage']} {s['total']:.1f}초" for s in breakdown["stages"][:top])
+    text = f"⏲️ {breakdown['wall']:.0f}초 경과"
+    return f"{text} · {stages}" if stages else text
+
+def _show_timing_breakdown(breakdown: dict):
+    """리뷰 작업의 단계별 시간(워커 누적)과 LLM 호출 수·대기 시간·토큰·비용을 표로 표시합니다."""
+    if not breakdown or not breakdown["stages"]:
+        return
+    llm_by_stage = breakdown["llm"]["by_stage"]
+    rows = [
+        "| 단계 | 횟수 | 누적 시간 | 최대 | LLM 호출 | 큐 대기 | 토큰(입력/출력) | 비용 |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for stage in breakdown["stages"]:
+        llm = llm_by_stage.get(stage["stage"])
+        if llm:
+            calls = f"{llm['calls']}" + (f" (실패 {llm['errors']})" if llm["errors"] else "")
+            wait = f"{llm['queue_wait']:.1f}초"
+            tokens = f"{llm['prompt_tokens']:,} / {llm['completion_tokens']:,}"
+            cost = f"${llm['cost']:.4f}" if llm["cost"] else "-"
+        else:
+            calls = wait = tokens = cost = "-"
+        rows.append(
+            f"| {stage['stage']} | {stage['count']} | {stage['total']:.2f}초 | {stage['max']:.2f}초 "
+            f"| {calls} | {wait} | {tokens} | {cost} |"
+        )
+    llm = breakdown["llm"]
+    with st.expander(f"⏲️ 단계별 시간 분석 (전체 {breakdown['wall']:.1f}초 · LLM 호출 {llm['calls']}건)"):
+        st.markdown("\n".join(rows))
+        st.caption("워커에서 병렬로 실행된 단계는 누적 시간이 전체 시간보다 클 수 있습니다.")
+
+def _format_usage(usage: dict) -> str:
+    """리뷰 작업의 토큰 사용량(과 가격이 설정된 경우 비용)을 한도와 함께 표시할 문자열로 만듭니다."""
+    text = f"🪙 토큰 {usage['total_tokens']:,}개 사용"
+    if usage.get("max_tokens"):
+        text += f" / 한도 {usage['max_tokens']:,}개"
+    if usage.get("cost"):
+        text += f" · 비용 ${usage['cost']:.4f}"
+        if usage.get("max_cost"):
+            text += f" / 한도 ${usage['max_cost']:.2f}"
+    if usage.get("deadline_seconds"):
+        text += f" · {usage['elapsed']:.0f}초 경과 / 시간 제한 {usage['deadline_seconds']:.0f}초"
+    return text
+
+def _show_triage_stats(triage: dict):
+    """LLM 리뷰 전에 걸러낸 파일(잠금·자동 생성·vendored·압축 파일 등)과 아낀 요청·토큰 수를 표시합니다."""
+    if not triage or not triage["files"]:
+        return
+    st.caption(
+        f"🧹 사전 분류: {triage['files']}개 파일을 리뷰에서 제외하여 "
+        f"LLM 요청 약 {triage['calls_saved']}건, 토큰 약 {triage['tokens_saved']:,}개를 아꼈습니다."
+    )
+
+def _show_compaction_stats(compaction: dict):
+    """diff 압축(컨텍스트 축소, 공백 변경·블록 이동 생략)으로 줄인 입력 토큰 수를 표시합니다."""
+    if not compaction or not compaction["original_tokens"]:
+        return
+    saved = compaction["original_tokens"] - compaction["compacted_tokens"]
+    if saved <= 0:
+        return
+    st.caption(
+        f"✂️ diff 압축: 입력 토큰 {compaction['original_tokens']:,}개 → {compaction['compacted_tokens']:,}개 "
+        f"({saved / compaction['original_tokens']:.0%} 감소 · 공백 변경 {compaction['whitespace_blocks']}곳, "
+        f"이동 블록 {compaction['moved_blocks']}개 생략)"
+    )
+
+def _show_dedup_stats(dedup: dict):
+    """여러 파일에 같은 수정을 적용한 변경을 한 번만 리뷰해 아낀 요청 수를 표시합니다."""
+    if not dedup or not dedup["units"]:
+        return
+    st.caption(
+        f"♻️ 같은 변경 {dedup['groups']}묶음을 대표 파일만 리뷰해 리뷰 단위 {dedup['units']}개"
+        f"(diff 토큰 약 {dedup['tokens_saved']:,}개)를 다른 파일과 공유했습니다."
+    )
+
+def _show_detection_stats(delta: dict):
+    """이번 작업에서 언어 감지가 LLM 폴백을 사용한 빈도를 표시합니다."""
+    if not delta:
+        return
+    local = delta["local"] + delta["memo"]
+    fallback = delta["llm_fallback"]
+    total = local + fallback
+    if total:
+        st.caption(f"🔎 언어 감지: 로컬 {local}건, LLM 폴백 {fallback}건 (폴백 비율 {fallback / total:.0%})")
+
+def _show_review_cache_stats(delta: dict):
+    """이번 작업의 청크 리뷰 캐시 적중률을 표시합니다."""
+    if not delta:
+        return
+    hits = delta["hits"]
+    misses = delta["misses"]
+    total = hits + misses
+    if total:
+        st.caption(f"♻️ 리뷰 캐시: {total}개 청크 중 {hits}개 재사용 (적중률 {hits / total:.0%})")
+
+def _show_scheduler_stats():
+    """사이드바에 프로세스 전역 LLM 스케줄러의 현재 상태(대기열 길이, 대기 시간)를 표시합니다."""
+    stats = get_scheduler().get_stats()
+    with st.sidebar:
+        st.subheader("⏱️ LLM 요청 스케줄러")
+        st.caption(
+            f"대기 {stats['queued']}건 · 처리 중 {stats['in_flight']}건 · "
+            f"평균 대기 {stats['wait_avg']:.1f}초 (최대 {stats['wait_max']:.1f}초)"
+        )
+        if stats["paused_for"] > 0:
+            st.caption(f"🚦 요청 한도 초과로 {stats['paused_for']:.0f}초 동안 전송을 멈췄습니다.")
+
+def _show_github_stats():
+    """사이드바에 GitHub API 요청 지연 시간, 캐시 재검증(304) 횟수, 남은 rate limit을 표시합니다."""
+    stats = get_github_stats()
+    if not stats["requests"]:
+        return
+    with st.sidebar:
+        st.subheader("🐙 GitHub API")
+        st.caption(
+            f"요청 {stats['requests']}건 (304 캐시 재사용 {stats['not_modified']}건) · "
+            f"평균 {stats['latency_avg'] * 1000:.0f}ms · 마지막 {stats['last_latency'] * 1000:.0f}ms"
+        )
+        if stats["rate_limit_remaining"] is not None:
+            reset_in = max(0, (stats["rate_limit_reset"] or 0) - int(time.time()))
+            st.caption(
+                f"남은 rate limit {stats['rate_limit_remaining']}/{stats['rate_limit_limit']} "
+                f"(약 {reset_in // 60}분 후 초기화)"
+            )
+
+def _show_scheduler_run_stats(delta: dict):
+    """이번 작업에서 LLM 요청이 큐에서 기다린 시간과 재시도 횟수를 표시합니다."""
+    if not delta or not delta["dispatched"]:
+        return
+    dispatched = delta["dispatched"]
+    wait_avg = delta["wait_total"] / dispatched
+    retries = delta["retries"]
+    rate_limited = delta["rate_limited"]
+    st.caption(
+        f"⏱️ LLM 요청 {dispatched}건 · 평균 대기 {wait_avg:.1f}초 · 재시도 {retries}건 (요청 한도 초과 {rate_limited}건)"
+    )
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,293 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, Optional
+
+from github_util import extract_github_info
+from telemetry import merge_breakdown, render_prometheus
+
+# 기본 워커 프로세스 수와 프로세스당 동시 LLM 요청 수
+DEFAULT_PROCESSES = 2
+DEFAULT_CONCURRENCY = 8
+
+# 워커 프로세스마다 하나씩 만드는 리뷰 단위 실행 풀 (_init_worker에서 생성)
+_worker_executor = None
+
+
+def _init_worker(concurrency: int, rate_share: float):
+    """워커 프로세스 초기화: LLM 한도를 프로세스 수만큼 나누고, 프로세스당 동시 요청 수를 제한합니다."""
+    global _worker_executor
+    from llm_scheduler import init_scheduler
+    from task_pool import PriorityThreadPool
+    init_scheduler(rate_share)
+    _worker_executor = PriorityThreadPool(concurrency)
+
+
+def review_url(pr_url: str, use_cache: bool = True) -> dict:
+    """
+    PR 하나를 리뷰하여 JSON으로 직렬화할 수 있는 결과를 반환합니다. (워커 프로세스에서 실행)
+
+    Args:
+        pr_url (str): GitHub Pull Request URL.
+        use_cache (bool): 청크 리뷰 캐시 및 이전 PR 리뷰 결과 재사용 여부.
+
+    Returns:
+        dict: 'url', 'owner', 'repo', 'pr_number', 'head_sha', 'summary', 'files', 'skipped', 'stop_reason',
+              'usage', 'triage', 'compaction', 'dedup', 'trace', 'warnings', 'elapsed', 'error'.
+    """
+    info = extract_github_info(pr_url)
+    if not info:
+        return {"url": pr_url, "error": "유효하지 않은 GitHub Pull Request URL입니다."}
+    try:
+        from config import GITHUB_TOKEN
+        from review_pipeline import review_pull_request
+        report = review_pull_request(
+            *info, GITHUB_TOKEN, use_cache=use_cache, executor=_worker_executor, session_id=pr_url,
+        )
+    except Exception as e:
+        traceback.print_exc()
+        return {"url": pr_url, "error": f"{type(e).__name__}: {e}"}
+    return _to_record(pr_url, report)
+
+
+def _to_record(pr_url: str, report: dict) -> dict:
+    error = report["fetch_error"]
+    if error is None and report["file_count"] == 0:
+        error = "분석할 코드 변경사항을 찾지 못했습니다."
+    return {
+        "url": pr_url,
+        "owner": report["owner"],
+        "repo": report["repo"],
+        "pr_number": report["pr_number"],
+        "head_sha": report["head_sha"],
+        "summary": report["summary"],
+        "files": [
+            {
+                "filename": f["filename"],
+                "language": f.get("language"),
+                "review": f.get("review"),
+                "error": bool(f.get("error")),
+                "reused": bool(f.get("reused")),
+                "skipped": bool(f.get("skipped")),
+                "triage": (f.get("triage") or {}).get("reason"),
+                "duplicate_of": f.get("duplicate_of"),
+            }
+            for f in sorted(report["files"], key=lambda f: f["filename"])
+        ],
+        "skipped": report["skipped"],
+        "stop_reason": report["stop_reason"],
+        "triage": report["triage"],
+        "compaction": report["compaction"],
+        "dedup": report["dedup"],
+        "trace": report["trace"],
+        "warnings": report["warnings"],
+        "usage": report["usage"],
+        "elapsed": round(report["elapsed"], 3),
+        "error": error,
+    }
+
+
+class BatchReviewer:
+    """
+    여러 PR을 워커 프로세스 풀에서 병렬로 리뷰합니다.
+
+    프로세스마다 LLM 스케줄러와 리뷰 단위 실행 풀이 따로 있으므로, 배포의 RPM/TPM 한도는
+    프로세스 수로 나누어 각 프로세스에 배정합니다. 처리량은 한도에 닿을 때까지 프로세스 수에 비례합니다.
+    """
+
+    def __init__(self, processes: int = DEFAULT_PROCESSES, concurrency: int = DEFAULT_CONCURRENCY):
+        if processes <= 0 or concurrency <= 0:
+            raise ValueError("processes and concurrency must be greater than 0")
+        # 부모 프로세스의 스레드/이벤트 루프를 복제하지 않도록 spawn 사용
+        self._pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(concurrency, 1.0 / processes),
+        )
+
+    def review(self, pr_urls: Iterable[str], use_cache: bool = True) -> Iterator[dict]:
+        """PR들을 제출하고, 끝나는 순서대로 결과를 반환합니다."""
+        futures = {self._pool.submit(review_url, url, use_cache): url for url in pr_urls}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"url": futures[future], "error": f"{type(e).__name__}: {e}"}
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def read_pr_urls(path: str) -> list[str]:
+    """
+    JSONL 파일에서 PR URL 목록을 읽습니다.
+    각 줄은 URL 문자열(JSON 문자열 또는 그대로), 또는 'url'/'pr_url' 키를 가진 객체입니다.
+    URL이 없는 줄은 경고를 출력하고 건너뜁니다.
+    """
+    urls = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                item = line
+            url = (item.get("url") or item.get("pr_url")) if isinstance(item, dict) else item
+            if isinstance(url, str) and url.strip():
+                urls.append(url.strip())
+            else:
+                print(f"{path}:{lineno}: PR URL이 없어 건너뜁니다.", file=sys.stderr)
+    return urls
+
+
+def run_batch(pr_urls: list[str], output, processes: int, concurrency: int, use_cache: bool) -> int:
+    """PR들을 리뷰하여 결과를 JSONL로 `output`에 쓰고, 실패한 PR 수를 반환합니다."""
+    reviewer = BatchReviewer(processes, concurrency)
+    started = time.monotonic()
+    failed = 0
+    try:
+        for record in reviewer.review(pr_urls, use_cache=use_cache):
+            failed += 1 if record.get("error") else 0
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+    finally:
+        reviewer.close()
+    elapsed = time.monotonic() - started
+    rate = len(pr_urls) / elapsed * 60 if elapsed > 0 else 0.0
+    print(
+        f"PR {len(pr_urls)}개 리뷰 완료 (실패 {failed}개), {elapsed:.1f}초, {rate:.1f} PRs/분 "
+        f"[프로세스 {processes} × 동시 요청 {concurrency}]",
+        file=sys.stderr,
+    )
+    return failed
+
+
+class _ReviewRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /reviews: {"url": "..."} 또는 {"urls": [...], "use_cache": true}를 받아,
+    끝나는 순서대로 결과를 JSONL(application/x-ndjson)로 스트리밍합니다.
+    GET /healthz: 상태 확인.
+    GET /metrics: 처리한 리뷰의 LLM 호출 수·토큰·비용 등 Prometheus 형식 지표.
+    """
+
+    reviewer: Optional[BatchReviewer] = None
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            data = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/reviews":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            urls = body.get("urls") or ([body["url"]] if body.get("url") else [])
+            if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+                raise ValueError("'urls' must be a list of strings")
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {"error": f"잘못된 요청입니다: {e}"})
+            return
+        if not urls:
+            self._send_json(400, {"error": "'url' 또는 'urls'가 필요합니다."})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        for record in self.reviewer.review(urls, use_cache=bool(body.get("use_cache", True))):
+            if record.get("trace"):
+                # 리뷰는 워커 프로세스에서 실행되므로, 결과에 담긴 트레이스 집계를 서버 프로세스 지표에 더함
+                merge_breakdown("failed" if record["error"] else "ok", record["trace"])
+            self.wfile.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(host: str, port: int, processes: int, concurrency: int):
+    """리뷰 HTTP API 서버를 실행합니다. 모든 요청이 하나의 워커 프로세스 풀을 공유합니다."""
+    reviewer = BatchReviewer(processes, concurrency)
+    handler = type("ReviewRequestHandler", (_ReviewRequestHandler,), {"reviewer": reviewer})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"리뷰 API 서버 실행 중: http://{host}:{port} (POST /reviews)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        reviewer.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="GitHub PR AI 리뷰어 (CLI / HTTP API)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    review_parser = subparsers.add_parser("review", help="PR들을 리뷰하여 결과를 JSONL로 출력합니다.")
+    review_parser.add_argument("urls", nargs="*", help="GitHub Pull Request URL")
+    review_parser.add_argument("-i", "--input", help="PR URL 목록 JSONL 파일")
+    review_parser.add_argument("-o", "--output", help="결과 JSONL 파일 (기본: 표준 출력)")
+    review_parser.add_argument("--no-cache", action="store_true", help="리뷰 캐시를 사용하지 않고 새로 생성")
+
+    serve_parser = subparsers.add_parser("serve", help="리뷰 HTTP API 서버를 실행합니다.")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+
+    for sub in (review_parser, serve_parser):
+        sub.add_argument("-p", "--processes", type=int, default=DEFAULT_PROCESSES, help="워커 프로세스 수")
+        sub.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="프로세스당 동시 LLM 요청 수")
+
+    args = parser.parse_args(argv)
+
+    # 워커를 띄우기 전에 환경 변수 설정을 확인
+    try:
+        import config  # noqa: F401
+    except ValueError as e:
+        print(f"환경 변수 설정 오류: {e}", file=sys.stderr)
+        return 2
+
+    if args.command == "serve":
+        serve(args.host, args.port, args.processes, args.concurrency)
+        return 0
+
+    urls = list(args.urls)
+    if args.input:
+        urls.extend(read_pr_urls(args.input))
+    if not urls:
+        parser.error("PR URL 또는 --input 파일이 필요합니다.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            failed = run_batch(urls, output, args.processes, args.concurrency, not args.no_cache)
+    else:
+        failed = run_batch(urls, sys.stdout, args.processes, args.concurrency, not args.no_cache)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
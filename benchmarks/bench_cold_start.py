@@ -0,0 +1,81 @@
+"""
+콜드 스타트 벤치마크.
+
+새 파이썬 프로세스에서 모듈 임포트와 공유 클라이언트 생성에 걸리는 시간을 측정합니다.
+App Service 콜드 스타트처럼 매번 빈 프로세스에서 시작하므로, 결과는 여러 번 실행한 중앙값입니다.
+외부 서비스에 연결하지 않도록 가짜 환경 변수를 사용합니다.
+
+측정 항목:
+    import config           환경 변수 로드
+    import app              Streamlit 페이지를 그리기 전까지의 임포트
+    import review_pipeline  리뷰 작업이 처음 실행될 때의 임포트
+    get_search_client / create_async_llm
+                            (config 임포트 뒤) SDK 임포트를 포함한 첫 클라이언트 생성
+
+사용법:
+    python benchmarks/bench_cold_start.py [--repeat 7]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_ENV = {
+    "GITHUB_TOKEN": "bench-token",
+    "AZ_OPENAI_ENDPOINT": "http://127.0.0.1:9", "AZ_OPENAI_KEY": "bench-key",
+    "AZ_OPENAI_ENGINE": "bench-deployment", "AZ_OPENAI_VERSION": "2024-06-01",
+    "AZ_SEARCH_ENDPOINT": "http://127.0.0.1:9", "AZ_SEARCH_KEY": "bench-key", "AZ_INDEX": "bench-index",
+}
+
+# (이름, 준비 코드, 측정할 코드)
+CASES = (
+    ("import config", "", "import config"),
+    ("import app", "", "import app"),
+    ("import review_pipeline", "", "import review_pipeline"),
+    ("config.get_search_client()", "import config", "config.get_search_client()"),
+    ("config.create_async_llm()", "import config", "config.create_async_llm()"),
+)
+
+_TEMPLATE = """
+import sys, time
+sys.path.insert(0, {root!r})
+{setup}
+start = time.perf_counter()
+{stmt}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(setup: str, stmt: str, repeat: int) -> list[float]:
+    """새 프로세스에서 `setup` 뒤 `stmt`를 실행하는 데 걸린 시간(초)을 `repeat`번 측정합니다."""
+    env = dict(os.environ, **FAKE_ENV)
+    code = _TEMPLATE.format(root=ROOT, setup=setup, stmt=stmt)
+    samples = []
+    for _ in range(repeat):
+        # 이미 설정된 환경 변수는 .env보다 우선하므로 실제 서비스 설정을 쓰지 않음
+        out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'case':<30} {'median':>10} {'min':>10} {'max':>10}")
+    for name, setup, stmt in CASES:
+        try:
+            samples = measure(setup, stmt, args.repeat)
+        except subprocess.CalledProcessError as e:
+            print(f"{name:<30} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            continue
+        print(f"{name:<30} {statistics.median(samples) * 1000:8.1f}ms {min(samples) * 1000:8.1f}ms "
+              f"{max(samples) * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+diff 파서 마이크로 벤치마크.
+
+대용량 합성 diff를 생성해 기존 정규식 기반 파서(re.split + re.search)와
+단일 패스 구조화 파서(diff_parser.parse_diff)의 처리 시간을 비교합니다.
+
+사용법:
+    python benchmarks/bench_diff_parser.py [--files 2000] [--hunks 8] [--lines 40] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from diff_parser import iter_parse_diff, parse_diff  # noqa: E402
+
+
+def make_synthetic_diff(files: int, hunks: int, lines: int) -> str:
+    """파일 수 × hunk 수 × hunk당 라인 수 크기의 합성 diff를 생성합니다."""
+    parts = []
+    for f in range(files):
+        path = f"src/module_{f // 100}/file_{f}.py"
+        parts.append(f"diff --git a/{path} b/{path}\nindex 1234567..89abcde 100644\n--- a/{path}\n+++ b/{path}\n")
+        for h in range(hunks):
+            start = h * (lines + 10) + 1
+            parts.append(f"@@ -{start},{lines} +{start},{lines} @@ def func_{h}():\n")
+            for i in range(lines):
+                if i % 5 == 0:
+                    parts.append(f"-    value_{i} = compute_old({i}, name='{path}')\n")
+                    parts.append(f"+    value_{i} = compute_new({i}, name='{path}')\n")
+                else:
+                    parts.append(f"     context_line_{i} = {i} * 2  # unchanged\n")
+    return "".join(parts)
+
+
+def legacy_parse_diff(diff_text: str) -> list[dict]:
+    """이전 구현: lookahead re.split 후 파일마다 re.search로 파일명을 찾습니다."""
+    files = []
+    for chunk in filter(None, re.split(r'(?=diff --git a/.*? b/.*?)', diff_text)):
+        m = re.search(r'\+\+\+ b/(.*?)\n', chunk)
+        if m:
+            files.append({"filename": m.group(1), "diff_content": chunk.strip()})
+    return files
+
+
+def bench(name: str, fn, repeat: int, size_mb: float):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<32} {best * 1000:9.1f} ms  {size_mb / best:8.1f} MB/s  ({len(result)} files)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--hunks", type=int, default=8)
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    diff_text = make_synthetic_diff(args.files, args.hunks, args.lines)
+    size_mb = len(diff_text.encode("utf-8")) / (1024 * 1024)
+    lines = diff_text.split("\n")
+    print(f"synthetic diff: {size_mb:.1f} MB, {args.files} files, {args.files * args.hunks} hunks\n")
+
+    bench("legacy re.split parser", lambda: legacy_parse_diff(diff_text), args.repeat, size_mb)
+    bench("diff_parser.parse_diff", lambda: parse_diff(diff_text), args.repeat, size_mb)
+    bench("diff_parser.iter_parse_diff", lambda: list(iter_parse_diff(lines)), args.repeat, size_mb)
+
+
+if __name__ == "__main__":
+    main()
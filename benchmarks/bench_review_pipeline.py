@@ -0,0 +1,336 @@
+"""
+리뷰 파이프라인 오프라인 벤치마크.
+
+로컬 가짜 서비스(benchmarks/fake_services.py)를 GitHub, Azure OpenAI, Azure AI Search 대신 띄우고,
+합성 PR diff로 실제 경로(fetch_pr_diff → parse_diff → generate_review_for_file → generate_final_summary)를
+실행해 전체 시간, 단계별 시간, 요청 수, 토큰 수, 최대 메모리를 측정합니다. 실제 할당량을 쓰지 않습니다.
+
+시나리오:
+    tiny      작은 파일 여러 개 (파일당 hunk 하나, 몇 줄)
+    huge      아주 큰 hunk를 가진 파일 몇 개 (청크 분할)
+    lockfile  큰 잠금 파일 몇 개와 코드 파일 몇 개 (사전 분류)
+    mixed     여러 언어의 코드·문서·설정 파일, 이름 변경·삭제·바이너리 포함
+
+사용법:
+    python benchmarks/bench_review_pipeline.py [--scenario all] [--scale 1.0] [--repeat 3]
+        [--workers 16] [--stream] [--llm-latency 0.4] [--llm-jitter 0.3] [--rate-limit-rate 0.05]
+        [--tracemalloc] [--output results.jsonl] [--baseline results.jsonl]
+
+--output으로 결과를 JSONL에 쌓아 두고, 다음 실행에서 --baseline으로 같은 시나리오·설정의 마지막 결과와 비교합니다.
+"""
+import argparse
+import contextvars
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_services import FakeServiceConfig, FakeServices  # noqa: E402
+
+SCENARIOS = ("tiny", "huge", "lockfile", "mixed")
+
+BENCH_OWNER = "bench"
+BENCH_REPO = "synthetic"
+
+# 비교할 때 같은 조건의 결과로 볼 설정 항목
+COMPARE_KEYS = ("scenario", "scale", "workers", "stream", "llm_latency", "llm_jitter", "rate_limit_rate",
+                "completion_tokens", "concurrency")
+
+# 비교 결과에 표시할 항목 (이름, 결과 키, 작을수록 좋은지 여부)
+COMPARE_METRICS = (
+    ("wall", "wall", True), ("review", "stage_review", True), ("llm calls", "llm_calls", True),
+    ("prompt tokens", "prompt_tokens", True), ("peak rss", "peak_rss_mb", True),
+)
+
+
+# --- 합성 PR diff ---
+
+def _file_header(path: str, status: str = "modified", old_path: str = None) -> str:
+    old_path = old_path or path
+    header = f"diff --git a/{old_path} b/{path}\n"
+    if status == "added":
+        return header + f"new file mode 100644\nindex 0000000..1234567\n--- /dev/null\n+++ b/{path}\n"
+    if status == "deleted":
+        return header + f"deleted file mode 100644\nindex 1234567..0000000\n--- a/{path}\n+++ /dev/null\n"
+    if status == "renamed":
+        return header + f"similarity index 100%\nrename from {old_path}\nrename to {path}\n"
+    return header + f"index 1234567..89abcde 100644\n--- a/{old_path}\n+++ b/{path}\n"
+
+
+def _code_line(lang: str, i: int, variant: str) -> str:
+    if lang == "py":
+        return f"    result_{i} = compute_{variant}(items[{i}], retries={i % 5})"
+    if lang in ("js", "ts"):
+        return f"  const result{i} = await compute{variant.title()}(items[{i}], {{ retries: {i % 5} }});"
+    if lang == "go":
+        return f"\tresult{i}, err := compute{variant.title()}(items[{i}], {i % 5})"
+    if lang == "java":
+        return f"        Result result{i} = service.compute{variant.title()}(items.get({i}), {i % 5});"
+    if lang == "md":
+        return f"- Step {i}: run the {variant} pipeline and check the output."
+    if lang == "yaml":
+        return f"  key_{i}: {variant}-{i}"
+    return f"line {i} {variant}"
+
+
+def _hunk(lang: str, start: int, lines: int, change_every: int = 4) -> str:
+    body = []
+    old_count = new_count = 0
+    for i in range(lines):
+        if i % change_every == 0:
+            body.append("-" + _code_line(lang, start + i, "old"))
+            body.append("+" + _code_line(lang, start + i, "new"))
+            old_count += 1
+            new_count += 1
+        else:
+            body.append(" " + _code_line(lang, start + i, "same"))
+            old_count += 1
+            new_count += 1
+    return f"@@ -{start},{old_count} +{start},{new_count} @@\n" + "\n".join(body) + "\n"
+
+
+def _modified_file(path: str, lang: str, hunks: int, lines: int, change_every: int = 4) -> str:
+    return _file_header(path) + "".join(
+        _hunk(lang, h * (lines + 20) + 1, lines, change_every) for h in range(hunks)
+    )
+
+
+def _lockfile(path: str, entries: int) -> str:
+    lines = []
+    for i in range(entries):
+        lines.append(f'+    "node_modules/package-{i}": {{')
+        lines.append(f'+      "version": "1.{i % 50}.{i % 7}",')
+        lines.append(f'+      "resolved": "https://registry.npmjs.org/package-{i}/-/package-{i}-1.{i % 50}.{i % 7}.tgz",')
+        lines.append(f'+      "integrity": "sha512-{(str(i) * 40)[:86]}=="')
+        lines.append("+    },")
+    return _file_header(path, "added") + f"@@ -0,0 +1,{len(lines)} @@\n" + "\n".join(lines) + "\n"
+
+
+def make_pr_diff(scenario: str, scale: float = 1.0) -> str:
+    """시나리오와 배율에 맞는 합성 PR diff를 생성합니다."""
+    n = lambda count: max(1, int(count * scale))  # noqa: E731
+    parts = []
+    if scenario == "tiny":
+        for i in range(n(200)):
+            lang = ("py", "js", "go", "java")[i % 4]
+            parts.append(_modified_file(f"src/pkg_{i // 20}/mod_{i}.{lang}", lang, hunks=1, lines=4, change_every=2))
+    elif scenario == "huge":
+        for i in range(n(3)):
+            lang = ("py", "ts", "java")[i % 3]
+            parts.append(_modified_file(f"core/engine_{i}.{lang}", lang, hunks=1, lines=3000, change_every=3))
+    elif scenario == "lockfile":
+        parts.append(_lockfile("package-lock.json", n(3000)))
+        parts.append(_lockfile("web/yarn.lock", n(2000)))
+        parts.append(_lockfile("poetry.lock", n(1000)))
+        for i in range(n(10)):
+            parts.append(_modified_file(f"src/app_{i}.py", "py", hunks=2, lines=20))
+    elif scenario == "mixed":
+        langs = ("py", "js", "ts", "go", "java", "md", "yaml")
+        for i in range(n(60)):
+            lang = langs[i % len(langs)]
+            parts.append(_modified_file(f"{lang}/dir_{i % 6}/file_{i}.{lang}", lang, hunks=3, lines=30))
+        parts.append(_file_header("legacy/old_util.py", "deleted") + "@@ -1,2 +0,0 @@\n-import os\n-print(os.name)\n")
+        parts.append(_file_header("lib/new_name.py", "renamed", "lib/old_name.py"))
+        parts.append("diff --git a/assets/logo.png b/assets/logo.png\nindex 1234567..89abcde 100644\n"
+                     "Binary files a/assets/logo.png and b/assets/logo.png differ\n")
+    else:
+        raise ValueError(f"unknown scenario: {scenario}")
+    return "".join(parts)
+
+
+# --- 실행 ---
+
+def _configure_environment(url: str, args):
+    """리포지토리 모듈을 임포트하기 전에, 모든 외부 서비스를 가짜 서버로 향하게 합니다. (.env보다 우선)"""
+    os.environ.update({
+        "GITHUB_TOKEN": "bench-token", "GITHUB_API_URL": url,
+        "AZ_OPENAI_ENDPOINT": url, "AZ_OPENAI_KEY": "bench-key", "AZ_OPENAI_ENGINE": "bench-deployment",
+        "AZ_OPENAI_VERSION": "2024-06-01",
+        "AZ_SEARCH_ENDPOINT": url, "AZ_SEARCH_KEY": "bench-key", "AZ_INDEX": "bench-index",
+        "AZ_OPENAI_EMBEDDING_ENGINE": "",
+        # 측정할 때마다 LLM을 실제로 호출하도록 디스크 캐시는 끔
+        "REVIEW_CACHE_ENABLED": "false",
+        "LLM_STREAMING": "true" if args.stream else "false",
+        "AZ_OPENAI_RPM": str(args.rpm), "AZ_OPENAI_TPM": str(args.tpm),
+        "LLM_MAX_CONCURRENCY": str(args.concurrency),
+        "TRACE_JSONL_PATH": "", "METRICS_PORT": "0",
+    })
+
+
+def run_once(pr_number: int, args) -> dict:
+    """PR 하나를 fetch → parse → 파일별 리뷰 → 최종 보고서 순서로 실행하고 측정값을 반환합니다."""
+    from diff_parser import parse_diff
+    from github_util import fetch_pr_diff
+    from llm_scheduler import get_scheduler
+    from review_generator import generate_final_summary, generate_review_for_file, invalidate_conventions_cache
+    from telemetry import Trace, trace_scope
+
+    # 매 실행이 같은 조건이 되도록 프로세스 캐시를 비움
+    invalidate_conventions_cache()
+    scheduler_before = get_scheduler().get_stats()
+    review_delta = (lambda filename, chunk_index, text: None) if args.stream else None
+    summary_delta = (lambda text: None) if args.stream else None
+    if args.tracemalloc:
+        tracemalloc.reset_peak()
+
+    trace = Trace("bench", pr_number=pr_number)
+    stages = {}
+    with trace_scope(trace):
+        started = time.perf_counter()
+        diff_text = fetch_pr_diff(BENCH_OWNER, BENCH_REPO, pr_number, "bench-token")
+        stages["fetch"] = time.perf_counter() - started
+
+        mark = time.perf_counter()
+        file_diffs = parse_diff(diff_text)
+        stages["parse"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            # 워커에서도 트레이스에 기록되도록 컨텍스트를 복사해서 실행
+            futures = [
+                executor.submit(contextvars.copy_context().run, generate_review_for_file, file_diff, True, review_delta)
+                for file_diff in file_diffs
+            ]
+            results = [future.result() for future in futures]
+        stages["review"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        generate_final_summary(results, on_delta=summary_delta)
+        stages["summary"] = time.perf_counter() - mark
+        wall = time.perf_counter() - started
+
+    breakdown = trace.finish()
+    scheduler_after = get_scheduler().get_stats()
+    llm = breakdown["llm"]
+    return {
+        "wall": wall,
+        **{f"stage_{name}": value for name, value in stages.items()},
+        "files": len(file_diffs),
+        "diff_mb": len(diff_text.encode("utf-8")) / (1024 * 1024),
+        "llm_calls": llm["calls"],
+        "llm_errors": llm["errors"],
+        "prompt_tokens": llm["prompt_tokens"],
+        "completion_tokens": llm["completion_tokens"],
+        "queue_wait": llm["queue_wait"],
+        "retries": scheduler_after["retries"] - scheduler_before["retries"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_heap_mb": tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.tracemalloc else None,
+    }
+
+
+def _median_run(runs: list[dict]) -> dict:
+    summary = {}
+    for key in runs[0]:
+        values = [run[key] for run in runs if run[key] is not None]
+        summary[key] = statistics.median(values) if values else None
+    return summary
+
+
+def _print_result(scenario: str, result: dict, services_stats: dict, repeat: int):
+    print(f"\n[{scenario}] {result['files']:.0f} files, diff {result['diff_mb']:.2f} MB (median of {repeat})")
+    print(f"  wall        {result['wall']:8.2f} s   "
+          f"(fetch {result['stage_fetch']:.2f} / parse {result['stage_parse']:.3f} / "
+          f"review {result['stage_review']:.2f} / summary {result['stage_summary']:.2f})")
+    print(f"  llm calls   {result['llm_calls']:8.0f}     errors {result['llm_errors']:.0f}, retries {result['retries']:.0f}, "
+          f"queue wait {result['queue_wait']:.2f} s (sum)")
+    print(f"  tokens      {result['prompt_tokens']:8.0f} in / {result['completion_tokens']:.0f} out")
+    print(f"  server      chat {services_stats['chat_requests']} (429 {services_stats['chat_rate_limited']}, "
+          f"streamed {services_stats['chat_streamed']}), search {services_stats['search_requests']}, "
+          f"github {services_stats['github_requests']} (last run)")
+    memory = f"  memory      peak RSS {result['peak_rss_mb']:.1f} MB (process)"
+    if result["peak_heap_mb"] is not None:
+        memory += f", peak Python heap {result['peak_heap_mb']:.1f} MB"
+    print(memory)
+
+
+def _load_baseline(path: str) -> list[dict]:
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _print_comparison(record: dict, baseline: list[dict]):
+    matches = [b for b in baseline if all(b.get(k) == record.get(k) for k in COMPARE_KEYS)]
+    if not matches:
+        print("  baseline    (no matching run)")
+        return
+    previous = matches[-1]
+    parts = []
+    for label, key, _ in COMPARE_METRICS:
+        old, new = previous["result"].get(key), record["result"].get(key)
+        if old:
+            parts.append(f"{label} {(new - old) / old:+.1%}")
+    print(f"  vs baseline {', '.join(parts)} (baseline from {previous.get('timestamp', '?')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--scale", type=float, default=1.0, help="시나리오 크기 배율")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=16, help="파일 리뷰 스레드 수")
+    parser.add_argument("--concurrency", type=int, default=32, help="LLM 스케줄러 동시 요청 수")
+    parser.add_argument("--rpm", type=int, default=100000)
+    parser.add_argument("--tpm", type=int, default=10 ** 9)
+    parser.add_argument("--stream", action="store_true", help="리뷰와 보고서를 스트리밍으로 받음")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="첫 토큰까지 지연 시간 중앙값(초)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="지연 시간 로그 정규 분포 표준편차")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--completion-tokens", type=int, default=300)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429를 돌려줄 Chat 요청 비율")
+    parser.add_argument("--retry-after-ms", type=int, default=200)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--github-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="Python 힙 최대 사용량도 측정 (실행이 느려짐)")
+    parser.add_argument("--output", help="결과를 한 줄씩 덧붙일 JSONL 파일")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSONL 파일")
+    args = parser.parse_args()
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    config = FakeServiceConfig(
+        llm_latency=args.llm_latency, llm_jitter=args.llm_jitter, llm_tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens, rate_limit_rate=args.rate_limit_rate,
+        retry_after_ms=args.retry_after_ms, search_latency=args.search_latency,
+        github_latency=args.github_latency, seed=args.seed,
+    )
+    baseline = _load_baseline(args.baseline)
+
+    with FakeServices(config) as services:
+        _configure_environment(services.url, args)
+        if args.tracemalloc:
+            tracemalloc.start()
+        print(f"fake services: {services.url}")
+        for pr_number, scenario in enumerate(scenarios, start=1):
+            services.register_diff(pr_number, make_pr_diff(scenario, args.scale))
+            runs = []
+            for _ in range(args.repeat):
+                services.reset()
+                runs.append(run_once(pr_number, args))
+            result = _median_run(runs)
+            _print_result(scenario, result, services.stats(), args.repeat)
+
+            record = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "scenario": scenario, "scale": args.scale,
+                "workers": args.workers, "stream": args.stream, "llm_latency": args.llm_latency,
+                "llm_jitter": args.llm_jitter, "rate_limit_rate": args.rate_limit_rate,
+                "completion_tokens": args.completion_tokens, "concurrency": args.concurrency,
+                "repeat": args.repeat, "result": result, "runs": runs,
+            }
+            if baseline:
+                _print_comparison(record, baseline)
+            if args.output:
+                with open(args.output, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
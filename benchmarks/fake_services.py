@@ -0,0 +1,321 @@
+"""
+벤치마크용 로컬 가짜 서비스.
+
+GitHub pulls API, Azure OpenAI Chat Completions API, Azure AI Search 검색 API를 흉내 내는 HTTP 서버를
+별도 프로세스에서 실행합니다. 응답 지연 시간 분포(로그 정규), 429 주입, SSE 스트리밍을 설정할 수 있으며,
+실제 할당량을 쓰지 않고 리뷰 파이프라인의 성능을 측정하는 데 사용합니다.
+
+서버 전용 경로:
+    PUT  /_fake/pulls/<번호>   요청 본문의 diff를 PR <번호>의 diff로 등록
+    GET  /_fake/stats          서비스별 요청 수, 429 수, 토큰 수
+    POST /_fake/reset          통계 초기화
+"""
+import json
+import math
+import multiprocessing
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# 토큰 수 근사 (chunk_planner의 tiktoken 미설치 시 근사와 같은 비율)
+APPROX_CHARS_PER_TOKEN = 4
+
+_PULL_PATH = re.compile(r"^/repos/[^/]+/[^/]+/pulls/(\d+)$")
+_FAKE_PULL_PATH = re.compile(r"^/_fake/pulls/(\d+)$")
+_LANGUAGE_FILTER = re.compile(r"language eq '([^']*)'")
+
+
+@dataclass
+class FakeServiceConfig:
+    """
+    가짜 서비스의 응답 특성.
+
+    Attributes:
+        llm_latency (float): Chat 응답의 첫 토큰까지 지연 시간 중앙값(초).
+        llm_jitter (float): 지연 시간 로그 정규 분포의 표준편차 (0이면 고정).
+        llm_tokens_per_second (float): 출력 토큰 생성 속도. 응답 길이에 비례해 지연 시간이 늘어납니다.
+        completion_tokens (int): 응답 하나의 출력 토큰 수 (max_tokens가 더 작으면 max_tokens).
+        rate_limit_rate (float): 429를 돌려줄 Chat 요청의 비율 (0~1).
+        retry_after_ms (int): 429 응답의 retry-after-ms 헤더 값.
+        search_latency (float), github_latency (float): 검색/GitHub 응답 지연 시간 중앙값(초).
+        seed (Optional[int]): 난수 시드 (지연 시간·429 주입 재현용).
+    """
+    llm_latency: float = 0.4
+    llm_jitter: float = 0.3
+    llm_tokens_per_second: float = 200.0
+    completion_tokens: int = 300
+    rate_limit_rate: float = 0.0
+    retry_after_ms: int = 200
+    search_latency: float = 0.05
+    github_latency: float = 0.05
+    seed: Optional[int] = None
+
+
+class _State:
+    def __init__(self, config: FakeServiceConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.diffs: dict[int, bytes] = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {
+                "github_requests": 0, "chat_requests": 0, "chat_streamed": 0, "chat_rate_limited": 0,
+                "search_requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            }
+
+    def count(self, **deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+    def latency(self, median: float, jitter: float) -> float:
+        if median <= 0:
+            return 0.0
+        with self.lock:
+            return median * math.exp(self.random.gauss(0.0, jitter)) if jitter > 0 else median
+
+    def rate_limited(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.config.rate_limit_rate
+
+
+def _approx_tokens(text: str) -> int:
+    return int(len(text) / APPROX_CHARS_PER_TOKEN) + 1
+
+
+def _completion_text(tokens: int) -> str:
+    # 리뷰 형식을 흉내 낸 응답. 단어 하나를 토큰 하나로 봄
+    words = [f"w{i}" for i in range(max(tokens - 8, 1))]
+    return "### 🛡️ 보안 검토\n특이사항 없음.\n\n### 💡 개선 제안\n" + " ".join(words)
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: _State = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- 라우팅 ---
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/_fake/stats":
+            with self.state.lock:
+                self._send_json(200, dict(self.state.stats))
+            return
+        match = _PULL_PATH.match(path)
+        if match:
+            self._github_pull(int(match.group(1)))
+            return
+        self._send_json(404, {"message": "Not Found"})
+
+    def do_PUT(self):
+        match = _FAKE_PULL_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {"message": "Not Found"})
+            return
+        self.state.diffs[int(match.group(1))] = self._read_body()
+        self._send_json(200, {"ok": True})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self._read_body()
+        if path == "/_fake/reset":
+            self.state.reset()
+            self._send_json(200, {"ok": True})
+        elif path.endswith("/chat/completions"):
+            self._chat(json.loads(body or b"{}"))
+        elif "/docs/search" in path:
+            self._search(json.loads(body or b"{}"))
+        else:
+            self._send_json(404, {"error": {"code": "404", "message": "Resource not found"}})
+
+    # --- GitHub ---
+
+    def _github_pull(self, pr_number: int):
+        state = self.state
+        state.count(github_requests=1)
+        time.sleep(state.latency(state.config.github_latency, 0.2))
+        diff = state.diffs.get(pr_number)
+        if diff is None:
+            self._send_json(404, {"message": "Not Found"})
+            return
+        if "diff" in (self.headers.get("Accept") or ""):
+            self._send(200, "text/plain; charset=utf-8", diff)
+        else:
+            self._send_json(200, {"number": pr_number, "head": {"sha": uuid.uuid5(uuid.NAMESPACE_OID, str(pr_number)).hex}})
+
+    # --- Azure AI Search ---
+
+    def _search(self, body: dict):
+        state = self.state
+        state.count(search_requests=1)
+        time.sleep(state.latency(state.config.search_latency, 0.2))
+        match = _LANGUAGE_FILTER.search(body.get("filter") or "")
+        language = match.group(1) if match else "text"
+        top = int(body.get("top") or 5)
+        documents = [
+            {
+                "@search.score": 1.0 - i * 0.1,
+                "language": language,
+                "sourcefile": f"conventions/{language}.md",
+                "content": f"{language} convention #{i}: prefer explicit names, handle errors close to their source.",
+            }
+            for i in range(top)
+        ]
+        self._send_json(200, {"@odata.count": len(documents), "value": documents})
+
+    # --- Azure OpenAI ---
+
+    def _chat(self, body: dict):
+        state, config = self.state, self.state.config
+        if state.rate_limited():
+            state.count(chat_rate_limited=1)
+            self._send_json(
+                429, {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                headers={"retry-after-ms": str(config.retry_after_ms), "retry-after": str(max(1, config.retry_after_ms // 1000))},
+            )
+            return
+        prompt_tokens = sum(_approx_tokens(m.get("content") or "") for m in body.get("messages", []))
+        completion_tokens = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        state.count(chat_requests=1, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        text = _completion_text(completion_tokens)
+        first_token = state.latency(config.llm_latency, config.llm_jitter)
+        generation = completion_tokens / config.llm_tokens_per_second if config.llm_tokens_per_second > 0 else 0.0
+        model = body.get("model") or "fake"
+        if body.get("stream"):
+            state.count(chat_streamed=1)
+            self._chat_stream(model, text, first_token, generation)
+            return
+        time.sleep(first_token + generation)
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _chat_stream(self, model: str, text: str, first_token: float, generation: float):
+        pieces = re.findall(r"\S+\s*", text)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(first_token)
+        # 조각을 몇 개씩 묶어 보내며 생성 시간을 나눠서 기다림
+        batch = max(1, len(pieces) // 20)
+        delay = generation / max(1, math.ceil(len(pieces) / batch))
+        created = int(time.time())
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        try:
+            for i in range(0, len(pieces), batch):
+                chunk = {
+                    "id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": "".join(pieces[i:i + batch])}, "finish_reason": None}],
+                }
+                self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                time.sleep(delay)
+            done = {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self._write_chunk(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 스트림을 취소함
+            self.close_connection = True
+
+    # --- 헬퍼 ---
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        self._send(status, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers)
+
+    def _send(self, status: int, content_type: str, data: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _serve(config: dict, conn):
+    handler = type("FakeHandler", (_FakeHandler,), {"state": _State(FakeServiceConfig(**config))})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    conn.send(server.server_address[1])
+    conn.close()
+    server.serve_forever()
+
+
+class FakeServices:
+    """
+    가짜 서비스 서버를 자식 프로세스에서 실행합니다. (벤치마크 프로세스의 메모리·CPU 측정에 섞이지 않도록)
+
+    사용법:
+        with FakeServices(FakeServiceConfig(llm_latency=0.2)) as services:
+            services.register_diff(1, diff_text)
+            ... services.url를 GITHUB_API_URL, AZ_OPENAI_ENDPOINT, AZ_SEARCH_ENDPOINT로 사용 ...
+            print(services.stats())
+    """
+
+    def __init__(self, config: Optional[FakeServiceConfig] = None):
+        self.config = config or FakeServiceConfig()
+        self.url: Optional[str] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    def start(self) -> "FakeServices":
+        parent, child = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=_serve, args=(asdict(self.config), child), daemon=True)
+        self._process.start()
+        child.close()
+        if not parent.poll(10):
+            raise RuntimeError("fake services did not start")
+        self.url = f"http://127.0.0.1:{parent.recv()}"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(5)
+            self._process = None
+
+    def __enter__(self) -> "FakeServices":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def register_diff(self, pr_number: int, diff_text: str):
+        """PR `pr_number`의 diff로 `diff_text`를 등록합니다."""
+        self._request("PUT", f"/_fake/pulls/{pr_number}", diff_text.encode("utf-8"))
+
+    def stats(self) -> dict:
+        """서비스별 요청 수, 429 수, 토큰 수를 반환합니다."""
+        return json.loads(self._request("GET", "/_fake/stats"))
+
+    def reset(self):
+        self._request("POST", "/_fake/reset", b"")
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> bytes:
+        import urllib.request
+        request = urllib.request.Request(self.url + path, data=body, method=method)
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read()
@@ -0,0 +1,228 @@
+import re
+from dataclasses import dataclass, field
+
+from diff_parser import FileDiff, Hunk
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 문자 수 기반 근사치를 사용
+    tiktoken = None
+
+# tiktoken이 없을 때 사용할 토큰당 평균 문자 수 (코드/diff 기준 보수적인 값)
+APPROX_CHARS_PER_TOKEN = 3.0
+
+# 분할된 hunk 앞에 이어 붙일 직전 컨텍스트 라인 수
+SPLIT_CONTEXT_LINES = 3
+
+# 스케줄링용 비용 추정 시 파일 하나당 예상 출력 토큰 수
+ESTIMATED_OUTPUT_TOKENS_PER_FILE = 500
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    텍스트의 토큰 수를 계산합니다. tiktoken이 없으면 문자 수로 근사합니다.
+
+    Args:
+        text (str): 토큰 수를 셀 텍스트.
+
+    Returns:
+        int: 토큰 수.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return int(len(text) / APPROX_CHARS_PER_TOKEN) + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass(slots=True)
+class ReviewUnit:
+    """
+    LLM 요청 하나에 해당하는 리뷰 작업 단위.
+    큰 파일의 한 부분(단일 파일)이거나, 같은 언어의 작은 파일 여러 개를 묶은 것(다중 파일)입니다.
+
+    Attributes:
+        language (str): 프로그래밍 언어.
+        filenames (list[str]): 포함된 파일 경로 (다중 파일이면 여러 개).
+        parts (list[str]): 파일별 diff 텍스트 (filenames와 같은 순서).
+        tokens (int): diff 텍스트의 토큰 수 합계.
+        chunk_index (int), chunk_count (int): 단일 파일을 나눈 경우 몇 번째 부분인지.
+        change_notes (list[str]): 파일별 변경 유형 설명 (추가/이름 변경 등).
+    """
+    language: str
+    filenames: list[str]
+    parts: list[str]
+    tokens: int
+    chunk_index: int = 0
+    chunk_count: int = 1
+    change_notes: list[str] = field(default_factory=list)
+
+    @property
+    def is_multi_file(self) -> bool:
+        return len(self.filenames) > 1
+
+    @property
+    def estimated_tokens(self) -> int:
+        """스케줄링에 사용할 예상 비용 (입력 diff 토큰 + 파일당 예상 출력 토큰)."""
+        return self.tokens + ESTIMATED_OUTPUT_TOKENS_PER_FILE * len(self.filenames)
+
+
+def split_file_diff(file_diff: FileDiff, max_tokens: int) -> list[str]:
+    """
+    파일 diff를 토큰 예산에 맞게 분할합니다.
+    여러 hunk를 예산 안에서 묶고, 예산을 넘는 단일 hunk는 라인 경계에서 나누어
+    각 조각에 파일 헤더와 다시 계산한 '@@' 헤더, 직전 컨텍스트 라인을 붙입니다.
+
+    Args:
+        file_diff (FileDiff): 파싱된 파일 diff.
+        max_tokens (int): 조각 하나의 최대 토큰 수.
+
+    Returns:
+        list[str]: 분할된 diff 텍스트 목록 (각각 파일 헤더 포함).
+    """
+    header = file_diff.header
+    header_tokens = count_tokens(header)
+    total_tokens = count_tokens(file_diff.diff_content)
+    if total_tokens <= max_tokens or not file_diff.hunks:
+        return [file_diff.diff_content]
+
+    budget = max(max_tokens - header_tokens, 1)
+    chunks: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append(header + "\n".join(current))
+        current, current_tokens = [], 0
+
+    for hunk in file_diff.hunks:
+        text = file_diff.hunk_text(hunk)
+        tokens = count_tokens(text)
+        if tokens > budget:
+            # 예산을 넘는 hunk는 단독으로 라인 단위 분할
+            flush()
+            for piece in _split_hunk(file_diff, hunk, budget):
+                chunks.append(header + piece)
+            continue
+        if current and current_tokens + tokens > budget:
+            flush()
+        current.append(text)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+_HUNK_SECTION_RE = re.compile(r"@@ [^@]* @@ ?(.*)")
+
+
+def _split_hunk(file_diff: FileDiff, hunk: Hunk, budget: int) -> list[str]:
+    """단일 hunk를 라인 경계에서 나누고, 조각마다 라인 범위를 다시 계산한 '@@' 헤더를 붙입니다."""
+    text = file_diff.hunk_text(hunk)
+    header_line, _, body = text.partition("\n")
+    section_match = _HUNK_SECTION_RE.match(header_line)
+    section = section_match.group(1) if section_match else ""
+    lines = body.split("\n")
+
+    pieces: list[str] = []
+    old_line, new_line = hunk.old_start, hunk.new_start
+    piece_lines: list[str] = []
+    piece_tokens = 0
+    piece_old_start, piece_new_start = old_line, new_line
+    # 직전 조각 끝의 컨텍스트(' ') 라인: 다음 조각 앞에 다시 붙여 맥락을 유지
+    carry: list[str] = []
+
+    def emit():
+        nonlocal piece_lines, piece_tokens, carry
+        # 변경 라인이 없는 조각(컨텍스트만 있는 경우)은 리뷰할 내용이 없으므로 버림
+        if any(l[:1] in ("+", "-") for l in piece_lines):
+            old_count = sum(1 for l in piece_lines if l[:1] in (" ", "-"))
+            new_count = sum(1 for l in piece_lines if l[:1] in (" ", "+"))
+            hdr = f"@@ -{piece_old_start},{old_count} +{piece_new_start},{new_count} @@"
+            if section:
+                hdr += f" {section}"
+            pieces.append(hdr + "\n" + "\n".join(piece_lines))
+        # 끝에서부터 연속된 컨텍스트 라인만 이어 붙여야 라인 번호가 맞음
+        carry = []
+        for l in reversed(piece_lines[-SPLIT_CONTEXT_LINES:]):
+            if l[:1] != " ":
+                break
+            carry.insert(0, l)
+        piece_lines, piece_tokens = [], 0
+
+    for line in lines:
+        tokens = count_tokens(line) + 1
+        if piece_lines and piece_tokens + tokens > budget:
+            emit()
+            # 이어 붙일 컨텍스트만큼 시작 라인을 앞당김
+            piece_old_start = old_line - len(carry)
+            piece_new_start = new_line - len(carry)
+            piece_lines = list(carry)
+            piece_tokens = sum(count_tokens(l) + 1 for l in carry)
+        elif not piece_lines:
+            piece_old_start, piece_new_start = old_line, new_line
+        piece_lines.append(line)
+        piece_tokens += tokens
+        kind = line[:1]
+        if kind in (" ", ""):
+            old_line += 1
+            new_line += 1
+        elif kind == "-":
+            old_line += 1
+        elif kind == "+":
+            new_line += 1
+    emit()
+    return pieces or [text]
+
+
+class FilePacker:
+    """
+    같은 언어의 작은 파일들을 토큰 예산과 파일 수 한도 안에서 하나의 다중 파일 요청으로 묶습니다.
+    언어별로 열린 묶음(bin)을 유지하다가 가득 차면 `add`가 완성된 ReviewUnit을 반환합니다.
+    """
+
+    def __init__(self, max_tokens: int, max_files: int):
+        self.max_tokens = max_tokens
+        self.max_files = max_files
+        self._open: dict[str, ReviewUnit] = {}
+
+    def add(self, language: str, filename: str, diff_text: str, tokens: int, change_note: str = "") -> list[ReviewUnit]:
+        """
+        파일을 해당 언어의 묶음에 추가합니다.
+
+        Returns:
+            list[ReviewUnit]: 추가로 인해 가득 차서 닫힌 묶음들 (없으면 빈 리스트).
+        """
+        closed = []
+        unit = self._open.get(language)
+        if unit is not None and unit.tokens + tokens > self.max_tokens:
+            closed.append(self._open.pop(language))
+            unit = None
+        if unit is None:
+            unit = ReviewUnit(language=language, filenames=[], parts=[], tokens=0)
+            self._open[language] = unit
+        unit.filenames.append(filename)
+        unit.parts.append(diff_text)
+        unit.change_notes.append(change_note)
+        unit.tokens += tokens
+        if len(unit.filenames) >= self.max_files:
+            closed.append(self._open.pop(language))
+        return closed
+
+    def flush(self) -> list[ReviewUnit]:
+        """열려 있는 모든 묶음을 닫아 반환합니다."""
+        units = list(self._open.values())
+        self._open.clear()
+        return units
@@ -1,7 +1,6 @@
 import os
-from openai import AzureOpenAI
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+import threading
+import traceback
 from dotenv import load_dotenv
 
 # .env 파일에서 환경 변수 로드
@@ -15,6 +14,25 @@ def get_env_variable(name: str) -> str:
         raise ValueError(f"'{name}' 환경 변수가 설정되지 않았습니다.")
     return value
 
+def parse_bool(value: str) -> bool:
+    """'true', '1', 'yes', 'on' 등의 문자열을 bool로 변환합니다."""
+    normalized = value.strip().lower()
+    if normalized in ("1", "true", "yes", "on"):
+        return True
+    if normalized in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(value)
+
+def get_optional_env(name: str, default, cast=str):
+    """선택적 환경 변수를 가져오고, 없으면 기본값을 반환합니다."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"'{name}' 환경 변수의 값이 올바르지 않습니다: {value}")
+
 try:
     # GitHub 환경 변수
     GITHUB_TOKEN = get_env_variable("GITHUB_TOKEN")
@@ -30,25 +48,170 @@ try:
     AZ_SEARCH_KEY = get_env_variable("AZ_SEARCH_KEY")
     AZ_INDEX = get_env_variable("AZ_INDEX")
 
+    # 코딩 컨벤션 검색 결과 캐시 (선택)
+    CONVENTIONS_CACHE_TTL = get_optional_env("CONVENTIONS_CACHE_TTL", 3600.0, float)
+    CONVENTIONS_CACHE_MAX_SIZE = get_optional_env("CONVENTIONS_CACHE_MAX_SIZE", 128, int)
+
+    # diff 기반 컨벤션 검색: 임베딩 배포 이름(비우면 키워드 검색 사용), 로컬 JSON 덤프 경로,
+    # 인덱스 갱신 주기(초), 청크당 컨벤션 수, 임베딩 요청 하나의 최대 텍스트 수 (선택)
+    AZ_OPENAI_EMBEDDING_ENGINE = get_optional_env("AZ_OPENAI_EMBEDDING_ENGINE", "")
+    CONVENTION_INDEX_DUMP = get_optional_env("CONVENTION_INDEX_DUMP", "")
+    CONVENTION_INDEX_REFRESH_SECONDS = get_optional_env("CONVENTION_INDEX_REFRESH_SECONDS", 3600.0, float)
+    CONVENTION_INDEX_TOP_K = get_optional_env("CONVENTION_INDEX_TOP_K", 5, int)
+    EMBEDDING_BATCH_SIZE = get_optional_env("EMBEDDING_BATCH_SIZE", 64, int)
+
+    # 청크 리뷰 결과 영구 캐시 (선택)
+    REVIEW_CACHE_ENABLED = get_optional_env("REVIEW_CACHE_ENABLED", True, parse_bool)
+    REVIEW_CACHE_PATH = get_optional_env("REVIEW_CACHE_PATH", os.path.join(".cache", "review_cache.sqlite3"))
+    REVIEW_CACHE_MAX_ENTRIES = get_optional_env("REVIEW_CACHE_MAX_ENTRIES", 20000, int)
+    REVIEW_CACHE_MAX_AGE_DAYS = get_optional_env("REVIEW_CACHE_MAX_AGE_DAYS", 14.0, float)
+
+    # PR diff 스트리밍 다운로드 사용 여부 (선택)
+    DIFF_STREAMING = get_optional_env("DIFF_STREAMING", True, parse_bool)
+
+    # LLM 배포의 토큰 한도 및 리뷰 요청 분할/묶음 설정 (선택)
+    AZ_OPENAI_CONTEXT_TOKENS = get_optional_env("AZ_OPENAI_CONTEXT_TOKENS", 128000, int)
+    AZ_OPENAI_MAX_OUTPUT_TOKENS = get_optional_env("AZ_OPENAI_MAX_OUTPUT_TOKENS", 4096, int)
+    REVIEW_CHUNK_MAX_TOKENS = get_optional_env("REVIEW_CHUNK_MAX_TOKENS", 6000, int)
+    REVIEW_PACK_FILE_MAX_TOKENS = get_optional_env("REVIEW_PACK_FILE_MAX_TOKENS", 600, int)
+    REVIEW_PACK_MAX_FILES = get_optional_env("REVIEW_PACK_MAX_FILES", 6, int)
+    # 리뷰 프롬프트에 남길 변경 라인 주위의 컨텍스트 라인 수. 음수이면 diff의 컨텍스트를 그대로 사용 (선택)
+    REVIEW_DIFF_CONTEXT_LINES = get_optional_env("REVIEW_DIFF_CONTEXT_LINES", 2, int)
+    # 여러 파일에 같은 수정을 적용한 변경은 한 번만 리뷰: 사용 여부, 변경 라인이 같을 때 같은 변경으로 볼
+    # 컨텍스트 포함 MinHash 유사도, 비교할 최소 정규화 토큰 수 (선택)
+    REVIEW_DEDUP_ENABLED = get_optional_env("REVIEW_DEDUP_ENABLED", True, parse_bool)
+    REVIEW_DEDUP_THRESHOLD = get_optional_env("REVIEW_DEDUP_THRESHOLD", 0.8, float)
+    REVIEW_DEDUP_MIN_TOKENS = get_optional_env("REVIEW_DEDUP_MIN_TOKENS", 20, int)
+
+    # 최종 요약 요청 하나의 최대 입력 토큰 수와, 파일 리뷰를 그룹별 부분 요약으로 미리 압축할 기준 토큰 수 (선택)
+    SUMMARY_INPUT_MAX_TOKENS = get_optional_env("SUMMARY_INPUT_MAX_TOKENS", 24000, int)
+    SUMMARY_BATCH_MAX_TOKENS = get_optional_env("SUMMARY_BATCH_MAX_TOKENS", 8000, int)
+
+    # 리뷰 요청을 동시에 보낼 워커 수 (LLM 호출은 I/O 대기이므로 CPU 수와 무관하게 설정)
+    REVIEW_MAX_WORKERS = get_optional_env("REVIEW_MAX_WORKERS", 16, int)
+
+    # 프로세스 전역 LLM 스케줄러: 배포의 분당 요청/토큰 한도, 동시 요청 수, 재시도 횟수 (선택)
+    AZ_OPENAI_RPM = get_optional_env("AZ_OPENAI_RPM", 300, int)
+    AZ_OPENAI_TPM = get_optional_env("AZ_OPENAI_TPM", 150000, int)
+    # 임베딩 배포의 분당 요청/토큰 한도. 채팅 배포와 따로 적용됩니다 (선택)
+    AZ_OPENAI_EMBEDDING_RPM = get_optional_env("AZ_OPENAI_EMBEDDING_RPM", 300, int)
+    AZ_OPENAI_EMBEDDING_TPM = get_optional_env("AZ_OPENAI_EMBEDDING_TPM", 120000, int)
+    LLM_MAX_CONCURRENCY = get_optional_env("LLM_MAX_CONCURRENCY", 32, int)
+    LLM_MAX_RETRIES = get_optional_env("LLM_MAX_RETRIES", 6, int)
+
+    # 파일 리뷰와 최종 보고서를 토큰 단위로 스트리밍하여 표시할지 여부 (선택)
+    LLM_STREAMING = get_optional_env("LLM_STREAMING", True, parse_bool)
+
+    # 백그라운드 리뷰 작업: 작업 저장소 경로, 동시에 실행할 작업 수, 끝난 작업 보관 기간(일) (선택)
+    JOB_STORE_PATH = get_optional_env("JOB_STORE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+    JOB_MAX_CONCURRENT = get_optional_env("JOB_MAX_CONCURRENT", 2, int)
+    JOB_RETENTION_DAYS = get_optional_env("JOB_RETENTION_DAYS", 7.0, float)
+    # 실행 중인 작업의 heartbeat 주기(초). 4주기 넘게 끊긴 다른 프로세스의 작업은 중단된 것으로 정리합니다 (선택)
+    JOB_HEARTBEAT_SECONDS = get_optional_env("JOB_HEARTBEAT_SECONDS", 15.0, float)
+
+    # PR 하나의 리뷰 시간 제한(초)과 토큰/비용 예산. 0이면 제한하지 않음 (선택)
+    # 예산의 일부는 최종 보고서용으로 남겨 두고, 넘으면 남은 파일은 건너뛰고 부분 보고서를 만듭니다.
+    REVIEW_DEADLINE_SECONDS = get_optional_env("REVIEW_DEADLINE_SECONDS", 0.0, float)
+    REVIEW_MAX_TOKENS = get_optional_env("REVIEW_MAX_TOKENS", 0, int)
+    REVIEW_MAX_COST = get_optional_env("REVIEW_MAX_COST", 0.0, float)
+    # 비용 계산에 사용할 배포의 1천 토큰당 입력/출력 가격 (REVIEW_MAX_COST를 쓰려면 설정)
+    AZ_OPENAI_INPUT_COST_PER_1K = get_optional_env("AZ_OPENAI_INPUT_COST_PER_1K", 0.0, float)
+    AZ_OPENAI_OUTPUT_COST_PER_1K = get_optional_env("AZ_OPENAI_OUTPUT_COST_PER_1K", 0.0, float)
+
+    # 리뷰 트레이스(단계별 구간, LLM 호출)를 한 줄씩 기록할 JSONL 파일 경로. 비우면 기록하지 않음 (선택)
+    TRACE_JSONL_PATH = get_optional_env("TRACE_JSONL_PATH", "")
+    # Prometheus 형식 지표(/metrics)를 제공할 포트. 0이면 서버를 띄우지 않음 (선택)
+    METRICS_PORT = get_optional_env("METRICS_PORT", 0, int)
+    METRICS_HOST = get_optional_env("METRICS_HOST", "127.0.0.1")
+
 except ValueError as e:
     # 환경 변수 설정에 문제가 있을 경우, 사용자에게 명확한 에러 메시지를 보여주고 실행 중단
     import streamlit as st
+    if not st.runtime.exists():
+        # Streamlit 밖(CLI, HTTP 서버 등)에서는 예외를 그대로 전달
+        raise
     st.error(f"환경 변수 설정 오류: {e}")
     st.info("애플리케이션을 실행하기 전에 .env 파일을 올바르게 설정했는지 확인해주세요.")
     st.stop()
 
 
-# --- Azure 클라이언트 초기화 ---
-# Azure OpenAI 클라이언트 초기화
-llm = AzureOpenAI(
-    api_version=AZ_OPENAI_VERSION,
-    azure_endpoint=AZ_OPENAI_ENDPOINT,
-    api_key=AZ_OPENAI_KEY
-)
-
-# Azure AI Search 클라이언트 초기화
-search_client = SearchClient(
-    AZ_SEARCH_ENDPOINT,
-    AZ_INDEX,
-    AzureKeyCredential(AZ_SEARCH_KEY)
-)
+# --- Azure 클라이언트 (지연 생성) ---
+# SDK 임포트와 클라이언트 생성은 수백 ms가 걸리므로, 처음 사용할 때 프로세스당 한 번만 만들어 공유합니다.
+# (페이지를 그리거나 스크립트를 다시 실행할 때는 이 비용을 치르지 않음)
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_client(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+    return client
+
+
+def create_async_llm():
+    """
+    LLM 스케줄러가 사용할 비동기 Azure OpenAI 클라이언트(`AsyncAzureOpenAI`)를 생성합니다.
+    재시도는 스케줄러가 한도 헤더를 보고 직접 처리하므로 SDK 자체 재시도는 끕니다.
+    연결 풀은 스케줄러의 동시 요청 수(`LLM_MAX_CONCURRENCY`)만큼 연결을 유지하도록 맞춥니다.
+    """
+    import httpx
+    from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+    return AsyncAzureOpenAI(
+        api_version=AZ_OPENAI_VERSION,
+        azure_endpoint=AZ_OPENAI_ENDPOINT,
+        api_key=AZ_OPENAI_KEY,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY),
+        ),
+    )
+
+
+def get_search_client():
+    """
+    Azure AI Search 클라이언트(`SearchClient`)를 반환합니다. 프로세스당 하나를 공유합니다.
+    동시에 실행되는 리뷰 워커(`REVIEW_MAX_WORKERS` × `JOB_MAX_CONCURRENT`)가 연결을 기다리지 않도록 연결 풀 크기를 맞춥니다.
+    """
+    def create():
+        import requests
+        from requests.adapters import HTTPAdapter
+        from azure.core.credentials import AzureKeyCredential
+        from azure.core.pipeline.transport import RequestsTransport
+        from azure.search.documents import SearchClient
+
+        pool_size = REVIEW_MAX_WORKERS * max(1, JOB_MAX_CONCURRENT)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return SearchClient(
+            AZ_SEARCH_ENDPOINT, AZ_INDEX, AzureKeyCredential(AZ_SEARCH_KEY),
+            transport=RequestsTransport(session=session, session_owner=False),
+        )
+    return _shared_client("search", create)
+
+
+def prewarm_clients():
+    """
+    SDK 임포트와 클라이언트 생성(LLM 스케줄러와 그 비동기 클라이언트, 검색 클라이언트)을 백그라운드 스레드에서
+    미리 해 둡니다. 첫 리뷰가 이 비용을 기다리지 않게 합니다.
+    여러 번 호출해도 한 번만 실행합니다.
+    """
+    with _clients_lock:
+        if _clients.get("prewarm"):
+            return
+        _clients["prewarm"] = True
+
+    def run():
+        try:
+            from llm_scheduler import get_scheduler
+            get_scheduler().prewarm()
+            get_search_client()
+        except Exception:
+            traceback.print_exc()
+
+    threading.Thread(target=run, name="prewarm-clients", daemon=True).start()
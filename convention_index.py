@@ -0,0 +1,381 @@
+import contextvars
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import numpy as np
+
+from chunk_planner import count_tokens
+from review_budget import current_budget, token_cost
+from telemetry import count, record_llm_call
+
+# 임베딩 요청 하나에 넣을 쿼리(diff) 최대 길이(문자). 임베딩 모델의 입력 한도(약 8천 토큰) 안으로 자릅니다.
+QUERY_MAX_CHARS = 6000
+# 쿼리 임베딩을 묶을 때 다른 워커의 쿼리를 기다리는 최대 시간(초)
+QUERY_LINGER_SECONDS = 0.02
+# 언어별로 적재할 최대 컨벤션 문서 수
+MAX_DOCUMENTS_PER_LANGUAGE = 5000
+
+_stats = {"queries": 0, "embedding_calls": 0, "embedded_texts": 0, "loads": 0, "load_errors": 0}
+_stats_lock = threading.Lock()
+
+
+def _record(**deltas):
+    with _stats_lock:
+        for key, value in deltas.items():
+            _stats[key] += value
+
+
+class EmbeddingBatcher:
+    """
+    여러 워커 스레드의 쿼리 임베딩 요청을 모아 한 번의 임베딩 API 호출로 보냅니다.
+    전용 스레드가 첫 요청 후 `linger`초 동안(또는 `batch_size`개가 모일 때까지) 기다렸다가 묶어서 보냅니다.
+
+    묶음에는 여러 리뷰의 쿼리가 섞이므로 API 호출은 어느 리뷰에도 속하지 않은 채로 보내고
+    (한 리뷰를 중단해도 다른 리뷰의 쿼리는 취소되지 않음), 예산과 트레이스에는 요청한 리뷰가 자기 쿼리의 토큰만큼 기록합니다.
+    """
+
+    def __init__(self, embed: Callable[[list[str]], np.ndarray], batch_size: int, linger: float = QUERY_LINGER_SECONDS):
+        self._embed = embed
+        self._batch_size = max(1, batch_size)
+        self._linger = linger
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """텍스트들의 임베딩(정규화된 행렬)을 반환합니다. 다른 스레드의 요청과 묶여 전송될 수 있습니다."""
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        vectors = np.vstack([future.result() for future in futures])
+        _charge_current_run(sum(count_tokens(text) for text in texts))
+        return vectors
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._linger
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                vectors = self._embed([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class ConventionIndex:
+    """
+    언어별 코딩 컨벤션 문서를 메모리의 임베딩 행렬(NumPy)로 보관하고, diff와 가장 관련 있는 문서를
+    코사인 유사도 top-k로 찾습니다.
+
+    - 문서는 로컬 JSON 덤프(`dump_path`)가 있으면 그 파일에서, 없으면 `load_documents`(Azure AI Search)로 가져옵니다.
+      덤프에 임베딩이 함께 있고 모델이 같으면 다시 임베딩하지 않습니다.
+    - 언어별 인덱스는 처음 조회할 때 적재하고, `refresh_seconds`가 지나면 기존 인덱스로 응답하면서
+      백그라운드에서 다시 적재합니다.
+    - 쿼리(diff) 임베딩은 `EmbeddingBatcher`로 여러 워커의 요청을 묶어 보냅니다.
+    - 인덱스 적재는 여러 리뷰가 함께 기다리는 공유 작업이므로, 적재를 시작한 리뷰의 예산·중단 범위 밖에서 실행합니다.
+    """
+
+    def __init__(self, embed: Callable[[list[str]], np.ndarray], model: str,
+                 load_documents: Optional[Callable[[str], list[dict]]] = None, dump_path: str = "",
+                 refresh_seconds: float = 3600.0, batch_size: int = 64):
+        self._embed = embed
+        self.model = model
+        self._load_documents = load_documents
+        self._dump_path = dump_path
+        self._refresh_seconds = refresh_seconds
+        self._batch_size = max(1, batch_size)
+        self._batcher = EmbeddingBatcher(self._embed_batch, self._batch_size)
+        self._lock = threading.Lock()
+        # 언어 → (문서 목록, 정규화된 임베딩 행렬, 적재 시각)
+        self._languages: dict[str, tuple[list[dict], np.ndarray, float]] = {}
+        self._loading: dict[str, threading.Event] = {}
+
+    def search(self, language: str, queries: list[str], top_k: int) -> list[dict]:
+        """
+        쿼리(diff)들과 가장 관련 있는 컨벤션 문서를 찾습니다. 여러 쿼리는 문서별로 가장 높은 유사도를 사용합니다.
+
+        Args:
+            language (str): 프로그래밍 언어.
+            queries (list[str]): diff 텍스트 목록 (다중 파일 리뷰 단위는 파일별 diff).
+            top_k (int): 반환할 문서 수.
+
+        Returns:
+            list[dict]: 유사도가 높은 순의 문서 ({'sourcefile', 'content', 'score'}). 문서가 없으면 빈 목록.
+
+        Raises:
+            Exception: 문서 적재나 임베딩 호출이 실패한 경우.
+        """
+        documents, matrix = self._get(language)
+        if not documents or not queries:
+            return []
+        query_vectors = self._batcher.embed([_query_text(q) for q in queries])
+        _record(queries=len(queries))
+
+        # (쿼리 수 × 문서 수) 유사도에서 문서별 최댓값으로 top-k 선택
+        scores = (query_vectors @ matrix.T).max(axis=0)
+        k = min(top_k, len(documents))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(documents[i], score=float(scores[i])) for i in top]
+
+    def invalidate(self, language: Optional[str] = None) -> int:
+        """적재한 인덱스를 버립니다. 다음 조회에서 다시 적재합니다. 버린 언어 수를 반환합니다."""
+        with self._lock:
+            if language is None:
+                count = len(self._languages)
+                self._languages.clear()
+                return count
+            return 1 if self._languages.pop(language, None) is not None else 0
+
+    def export_dump(self, path: str, languages: list[str]):
+        """
+        언어별 문서와 임베딩을 JSON 덤프로 저장합니다. (오프라인 테스트나 빠른 시작용)
+
+        Args:
+            path (str): 저장할 파일 경로.
+            languages (list[str]): 저장할 언어 목록.
+        """
+        documents = []
+        for language in languages:
+            docs, matrix = self._get(language)
+            for doc, vector in zip(docs, matrix):
+                documents.append({
+                    "language": language, "sourcefile": doc["sourcefile"], "content": doc["content"],
+                    "embedding": [round(float(x), 6) for x in vector],
+                })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "documents": documents}, f, ensure_ascii=False)
+
+    def _get(self, language: str) -> tuple[list[dict], np.ndarray]:
+        with self._lock:
+            entry = self._languages.get(language)
+            if entry is not None:
+                if time.monotonic() - entry[2] > self._refresh_seconds and language not in self._loading:
+                    # 오래된 인덱스로 응답하면서 백그라운드에서 다시 적재
+                    self._loading[language] = threading.Event()
+                    threading.Thread(target=self._reload, args=(language,), daemon=True).start()
+                return entry[0], entry[1]
+            event = self._loading.get(language)
+            leader = event is None
+            if leader:
+                event = self._loading[language] = threading.Event()
+        if leader:
+            self._reload(language)
+        else:
+            event.wait()
+        with self._lock:
+            entry = self._languages.get(language)
+        if entry is None:
+            raise RuntimeError(f"'{language}' 컨벤션 인덱스를 적재하지 못했습니다.")
+        return entry[0], entry[1]
+
+    def _reload(self, language: str):
+        try:
+            # 빈 컨텍스트: 세션·중단 표식·예산·트레이스가 없는 상태
+            documents, matrix = contextvars.Context().run(self._build, language)
+            with self._lock:
+                self._languages[language] = (documents, matrix, time.monotonic())
+            _record(loads=1)
+        except Exception:
+            traceback.print_exc()
+            _record(load_errors=1)
+        finally:
+            with self._lock:
+                self._loading.pop(language).set()
+
+    def _build(self, language: str) -> tuple[list[dict], np.ndarray]:
+        if self._dump_path:
+            documents, vectors = _read_dump(self._dump_path, language, self.model)
+        else:
+            documents, vectors = self._load_documents(language)[:MAX_DOCUMENTS_PER_LANGUAGE], None
+        if not documents:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        if vectors is None:
+            texts = [doc["content"] for doc in documents]
+            vectors = np.vstack([
+                self._embed_batch(texts[i:i + self._batch_size]) for i in range(0, len(texts), self._batch_size)
+            ])
+        return documents, _normalize(np.asarray(vectors, dtype=np.float32))
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        vectors = _normalize(np.asarray(self._embed(texts), dtype=np.float32))
+        _record(embedding_calls=1, embedded_texts=len(texts))
+        return vectors
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _query_text(diff: str) -> str:
+    """diff에서 검색에 쓸 텍스트를 만듭니다. 변경된 라인을 앞에 두고 길이를 제한합니다."""
+    changed = [line[1:] for line in diff.split("\n") if line[:1] in ("+", "-") and not line.startswith(("+++", "---"))]
+    text = "\n".join(changed) or diff
+    return text[:QUERY_MAX_CHARS]
+
+
+def _read_dump(path: str, language: str, model: str) -> tuple[list[dict], Optional[np.ndarray]]:
+    """
+    JSON 덤프에서 언어의 문서를 읽습니다. 덤프 형식은 `{"model": ..., "documents": [...]}` 또는 문서 목록이며,
+    문서는 'language', 'sourcefile', 'content'와 선택적으로 'embedding'을 가집니다.
+    모든 문서에 임베딩이 있고 덤프의 모델이 `model`과 같을 때만 임베딩을 함께 반환합니다.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    dump_model = data.get("model") if isinstance(data, dict) else None
+    entries = data["documents"] if isinstance(data, dict) else data
+    documents, vectors = [], []
+    for entry in entries:
+        if entry.get("language") != language:
+            continue
+        documents.append({"sourcefile": entry.get("sourcefile", ""), "content": entry["content"]})
+        vectors.append(entry.get("embedding"))
+        if len(documents) >= MAX_DOCUMENTS_PER_LANGUAGE:
+            break
+    if documents and dump_model == model and all(v is not None for v in vectors):
+        return documents, np.asarray(vectors, dtype=np.float32)
+    return documents, None
+
+
+def get_convention_index_stats() -> dict:
+    """
+    프로세스 전역 컨벤션 인덱스 통계를 반환합니다.
+
+    Returns:
+        dict: 'queries'(검색한 diff 수), 'embedding_calls'(임베딩 API 호출 수), 'embedded_texts'(임베딩한 텍스트 수),
+              'loads'(언어별 인덱스 적재 횟수), 'load_errors'(적재 실패 횟수).
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+_index: Optional[ConventionIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_convention_index() -> Optional[ConventionIndex]:
+    """
+    프로세스 전역 컨벤션 인덱스를 반환합니다. 임베딩 배포(`AZ_OPENAI_EMBEDDING_ENGINE`)가 설정되지 않았으면 None.
+    """
+    global _index
+    if _index is None:
+        from config import (
+            AZ_OPENAI_EMBEDDING_ENGINE, CONVENTION_INDEX_DUMP, CONVENTION_INDEX_REFRESH_SECONDS, EMBEDDING_BATCH_SIZE,
+        )
+        if not AZ_OPENAI_EMBEDDING_ENGINE:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = ConventionIndex(
+                    _azure_embed, AZ_OPENAI_EMBEDDING_ENGINE, load_documents=_search_all_documents,
+                    dump_path=CONVENTION_INDEX_DUMP, refresh_seconds=CONVENTION_INDEX_REFRESH_SECONDS,
+                    batch_size=EMBEDDING_BATCH_SIZE,
+                )
+    return _index
+
+
+def _azure_embed(texts: list[str]) -> np.ndarray:
+    """
+    Azure OpenAI 임베딩 배포로 텍스트들을 한 번에 임베딩합니다.
+    요청은 프로세스 전역 LLM 스케줄러로 보내 채팅 요청과 같은 RPM/TPM 한도와 재시도를 따르고,
+    호출은 `telemetry`에, 사용량은 현재 `budget_scope`의 예산에 입력 토큰으로 기록합니다.
+    """
+    from config import AZ_OPENAI_EMBEDDING_ENGINE, AZ_OPENAI_INPUT_COST_PER_1K
+    from llm_scheduler import RequestCancelled, get_scheduler
+
+    estimated = sum(count_tokens(text) for text in texts)
+    timing: dict = {}
+    started = time.perf_counter()
+
+    def record(status: str, tokens: int, estimated_usage: bool):
+        record_llm_call(
+            time.perf_counter() - started, timing.get("queue_wait", 0.0), tokens, 0,
+            token_cost(tokens, 0, AZ_OPENAI_INPUT_COST_PER_1K, 0.0),
+            status=status, estimated=estimated_usage, retries=timing.get("retries", 0),
+        )
+
+    try:
+        response = get_scheduler().embed(
+            estimated_prompt_tokens=estimated, timing=timing, model=AZ_OPENAI_EMBEDDING_ENGINE, input=texts,
+        )
+    except RequestCancelled:
+        record("cancelled", estimated, True)
+        raise
+    except Exception:
+        record("error", 0, True)
+        raise
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None):
+        tokens, estimated_usage = usage.prompt_tokens, False
+    else:
+        tokens, estimated_usage = estimated, True
+    budget = current_budget()
+    if budget is not None:
+        budget.charge(tokens, 0)
+    record("ok", tokens, estimated_usage)
+    ordered = sorted(response.data, key=lambda item: item.index)
+    return np.asarray([item.embedding for item in ordered], dtype=np.float32)
+
+
+def _charge_current_run(tokens: int):
+    """어느 리뷰에도 속하지 않은 채 보낸 임베딩 중 현재 리뷰 몫의 토큰을 예산과 트레이스에 기록합니다."""
+    budget = current_budget()
+    if budget is not None:
+        budget.charge(tokens, 0)
+    count("embedding.prompt_tokens", tokens)
+
+
+def _search_all_documents(language: str) -> list[dict]:
+    """Azure AI Search 인덱스에서 언어의 컨벤션 문서를 모두 가져옵니다."""
+    from config import get_search_client
+    results = get_search_client().search(
+        search_text="*",
+        filter=f"language eq '{language}'",
+        select=["sourcefile", "content"],
+        top=MAX_DOCUMENTS_PER_LANGUAGE,
+    )
+    return [{"sourcefile": r["sourcefile"], "content": r["content"]} for r in results]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Azure AI Search의 컨벤션 문서를 임베딩하여 JSON 덤프로 저장합니다. (`CONVENTION_INDEX_DUMP`로 사용)"""
+    import argparse
+    parser = argparse.ArgumentParser(description="코딩 컨벤션 인덱스를 JSON 덤프로 저장합니다.")
+    parser.add_argument("output", help="저장할 JSON 파일 경로")
+    parser.add_argument("languages", nargs="+", help="저장할 언어 (예: python java)")
+    args = parser.parse_args(argv)
+
+    index = get_convention_index()
+    if index is None:
+        print("AZ_OPENAI_EMBEDDING_ENGINE 환경 변수가 설정되지 않았습니다.", file=sys.stderr)
+        return 2
+    if os.path.abspath(args.output) == os.path.abspath(index._dump_path or ""):
+        print("읽고 있는 덤프 파일에 덮어쓸 수 없습니다.", file=sys.stderr)
+        return 2
+    index.export_dump(args.output, args.languages)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
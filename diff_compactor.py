@@ -0,0 +1,308 @@
+import bisect
+from dataclasses import dataclass, field
+
+from chunk_planner import count_tokens
+from diff_parser import FileDiff, Hunk
+
+# 압축 규칙을 바꾸면 올려주세요. 이전 규칙으로 저장한 PR 리뷰 결과를 재사용하지 않습니다.
+COMPACTION_VERSION = "3"
+
+# 들여쓰기가 의미를 가지는 언어: 앞쪽 공백 변경은 공백 변경으로 보지 않음
+INDENT_SENSITIVE_LANGUAGES = {
+    "python", "yaml", "makefile", "haskell", "coffeescript", "fsharp", "nim", "elm", "pug", "sass",
+}
+
+# 안의 공백을 그대로 비교할 문자열 리터럴의 따옴표
+_QUOTES = "\"'`"
+
+# 이동으로 판단할 최소 블록 길이(라인). 짧은 블록은 우연히 같은 경우가 많아 제외합니다.
+MOVE_MIN_LINES = 3
+
+# 변경 노트에 나열할 최대 이동 블록 수
+MAX_MOVE_NOTES = 3
+
+_HUNK_SECTION_SEPARATOR = " @@"
+
+
+@dataclass(slots=True)
+class CompactedDiff:
+    """
+    리뷰 프롬프트용으로 압축한 파일 diff.
+
+    Attributes:
+        file_diff (FileDiff): 압축된 diff (변경이 없으면 원본 그대로). hunk가 없으면 리뷰할 변경이 남지 않은 것입니다.
+        notes (list[str]): 생략한 변경을 설명하는 한 줄 노트 (공백 변경, 이동한 블록).
+        original_tokens (int), compacted_tokens (int): 압축 전후 diff 토큰 수.
+        whitespace_blocks (int): 생략한 공백·들여쓰기 변경 블록 수.
+        moved_blocks (int): 원래 위치(삭제 쪽)를 생략한 이동 블록 수.
+        trimmed_context_lines (int): 반경 밖이라 잘라낸 컨텍스트 라인 수.
+    """
+    file_diff: FileDiff
+    notes: list[str] = field(default_factory=list)
+    original_tokens: int = 0
+    compacted_tokens: int = 0
+    whitespace_blocks: int = 0
+    moved_blocks: int = 0
+    trimmed_context_lines: int = 0
+
+    @property
+    def note(self) -> str:
+        """프롬프트의 변경 유형 설명에 덧붙일 문자열. 생략한 변경이 없으면 빈 문자열."""
+        return "".join(f" ({note})" for note in self.notes)
+
+
+@dataclass(slots=True)
+class _Line:
+    kind: str       # ' ', '+', '-', '\\'
+    text: str       # 원본 라인 (접두 문자 포함)
+    old: int        # 변경 전 라인 번호 (' ', '-')
+    new: int        # 변경 후 라인 번호 (' ', '+')
+    keep: bool = True
+
+
+def compact_file_diff(file_diff: FileDiff, lang: str, context_lines: int) -> CompactedDiff:
+    """
+    파일 diff에서 리뷰에 필요 없는 부분을 덜어냅니다.
+
+    1. 공백·들여쓰기만 바뀐 변경 블록은 생략하고 한 줄 노트로 남깁니다.
+       `git diff -b`처럼 연속된 공백의 길이와 줄 끝 공백만 무시하며, 공백이 생기거나 없어진 변경과
+       문자열 리터럴 안의 공백 변경은 공백 변경으로 보지 않습니다.
+       (들여쓰기가 의미를 가지는 언어는 앞쪽 공백 변경도 공백 변경으로 보지 않습니다.)
+    2. 파일 안에서 내용 그대로 옮겨진 블록(`MOVE_MIN_LINES`줄 이상)은 원래 위치의 삭제 라인만 생략하고 노트로 남깁니다.
+       옮겨간 위치의 추가 라인은 새 위치에서 맞는지 리뷰할 수 있도록 남겨 두므로, 이동이 있는 파일은 항상 리뷰합니다.
+    3. 남은 변경 라인에서 `context_lines`보다 먼 컨텍스트 라인을 잘라내고, 끊긴 구간마다 '@@' 헤더를 다시 계산합니다.
+
+    Args:
+        file_diff (FileDiff): 파싱된 파일 diff.
+        lang (str): 프로그래밍 언어.
+        context_lines (int): 변경 라인 주위에 남길 컨텍스트 라인 수. 음수이면 자르지 않습니다.
+
+    Returns:
+        CompactedDiff: 압축 결과. 덜어낸 것이 없으면 원본 `file_diff`를 그대로 담습니다.
+    """
+    original_tokens = count_tokens(file_diff.diff_content)
+    if not file_diff.hunks:
+        return CompactedDiff(file_diff, original_tokens=original_tokens, compacted_tokens=original_tokens)
+
+    normalize = _normalize_inner if lang in INDENT_SENSITIVE_LANGUAGES else _normalize_all
+    hunks = [(_hunk_section(file_diff, hunk), _hunk_lines(file_diff, hunk)) for hunk in file_diff.hunks]
+    blocks = [block for _, lines in hunks for block in _change_blocks(lines)]
+
+    result = CompactedDiff(file_diff, original_tokens=original_tokens)
+    notes = []
+
+    # 1. 공백·들여쓰기만 바뀐 블록
+    whitespace_lines = 0
+    for block in blocks:
+        removed = [normalize(l.text[1:]) for l in block if l.kind == "-"]
+        added = [normalize(l.text[1:]) for l in block if l.kind == "+"]
+        if removed and added and removed == added:
+            for line in block:
+                line.keep = False
+            result.whitespace_blocks += 1
+            whitespace_lines += len(added)
+    if result.whitespace_blocks:
+        notes.append(f"공백·들여쓰기만 바뀐 변경 {result.whitespace_blocks}곳({whitespace_lines}줄)은 생략함")
+
+    # 2. 파일 안에서 옮겨진 블록: 삭제된 연속 라인과 추가된 연속 라인의 내용이 같으면 이동으로 봄
+    removed_runs: dict[tuple, list[list[_Line]]] = {}
+    for run in _runs(blocks, "-"):
+        removed_runs.setdefault(tuple(normalize(l.text[1:]) for l in run), []).append(run)
+    moves = []
+    for run in _runs(blocks, "+"):
+        key = tuple(normalize(l.text[1:]) for l in run)
+        candidates = removed_runs.get(key)
+        if not candidates or not any(key):
+            continue
+        source = candidates.pop(0)
+        # 삭제 쪽만 생략: 새 위치의 코드는 주변 문맥과 함께 리뷰해야 함
+        for line in source:
+            line.keep = False
+        moves.append((source[0].old, source[-1].old, run[0].new, run[-1].new))
+    result.moved_blocks = len(moves)
+    if moves:
+        described = ", ".join(f"L{a}-{b} → L{c}-{d}" for a, b, c, d in moves[:MAX_MOVE_NOTES])
+        if len(moves) > MAX_MOVE_NOTES:
+            described += f" 외 {len(moves) - MAX_MOVE_NOTES}건"
+        notes.append(f"내용 변경 없이 옮겨진 블록 {len(moves)}개({described})는 원래 위치의 삭제 라인을 생략함")
+
+    # 3. 컨텍스트 반경 밖의 라인
+    for _, lines in hunks:
+        result.trimmed_context_lines += _trim_context(lines, context_lines)
+
+    if not (result.whitespace_blocks or result.moved_blocks or result.trimmed_context_lines):
+        result.compacted_tokens = original_tokens
+        return result
+
+    result.file_diff = _rebuild(file_diff, hunks)
+    result.notes = notes
+    result.compacted_tokens = count_tokens(result.file_diff.diff_content)
+    return result
+
+
+def _normalize_all(text: str) -> str:
+    return _collapse_whitespace(text.strip())
+
+
+def _normalize_inner(text: str) -> str:
+    # 앞쪽 들여쓰기는 유지하고, 그 뒤의 공백 차이만 무시
+    stripped = text.lstrip()
+    return text[:len(text) - len(stripped)] + _collapse_whitespace(stripped.rstrip())
+
+
+def _collapse_whitespace(text: str) -> str:
+    """따옴표로 감싼 문자열 밖의 연속된 공백을 한 칸으로 줄입니다. (닫히지 않은 문자열은 줄 끝까지 그대로 둠)"""
+    out = []
+    quote = None
+    in_space = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if quote is not None:
+            out.append(ch)
+            if ch == "\\" and i + 1 < len(text):
+                out.append(text[i + 1])
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch.isspace():
+            if not in_space:
+                out.append(" ")
+            in_space = True
+            i += 1
+            continue
+        else:
+            out.append(ch)
+            if ch in _QUOTES:
+                quote = ch
+        in_space = False
+        i += 1
+    return "".join(out)
+
+
+def _hunk_section(file_diff: FileDiff, hunk: Hunk) -> str:
+    header = file_diff.hunk_text(hunk).partition("\n")[0]
+    _, found, section = header[2:].partition(_HUNK_SECTION_SEPARATOR)
+    return section.strip() if found else ""
+
+
+def _hunk_lines(file_diff: FileDiff, hunk: Hunk) -> list[_Line]:
+    lines = []
+    old, new = hunk.old_start, hunk.new_start
+    for text in file_diff.hunk_text(hunk).split("\n")[1:]:
+        kind = text[:1] or " "
+        if kind == "\\":
+            lines.append(_Line(kind, text, old, new))
+            continue
+        if kind not in ("+", "-"):
+            kind = " "
+        lines.append(_Line(kind, text, old, new))
+        if kind != "+":
+            old += 1
+        if kind != "-":
+            new += 1
+    return lines
+
+
+def _change_blocks(lines: list[_Line]) -> list[list[_Line]]:
+    """컨텍스트 라인으로 나뉜 연속 변경(-/+) 블록들."""
+    blocks, current = [], []
+    for line in lines:
+        if line.kind in ("+", "-", "\\"):
+            current.append(line)
+        elif current:
+            blocks.append(current)
+            current = []
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def _runs(blocks: list[list[_Line]], kind: str) -> list[list[_Line]]:
+    """아직 생략되지 않은, 같은 종류(kind)의 연속 라인 중 `MOVE_MIN_LINES`줄 이상인 것."""
+    runs = []
+    for block in blocks:
+        current = []
+        for line in block:
+            if line.kind == "\\":
+                continue
+            if line.kind == kind and line.keep:
+                current.append(line)
+                continue
+            if len(current) >= MOVE_MIN_LINES:
+                runs.append(current)
+            current = []
+        if len(current) >= MOVE_MIN_LINES:
+            runs.append(current)
+    return runs
+
+
+def _trim_context(lines: list[_Line], radius: int) -> int:
+    """남은 변경 라인에서 `radius`보다 먼 컨텍스트 라인을 생략하고, 생략한 수를 반환합니다."""
+    changed = [i for i, line in enumerate(lines) if line.keep and line.kind in ("+", "-")]
+    trimmed = 0
+    for i, line in enumerate(lines):
+        if line.kind != " " or not line.keep:
+            continue
+        if not changed:
+            # 변경이 모두 생략된 hunk는 통째로 빠지므로 잘라낸 컨텍스트로 세지 않음
+            line.keep = False
+        elif radius >= 0 and min(abs(i - j) for j in _nearest(changed, i)) > radius:
+            line.keep = False
+            trimmed += 1
+    # '\ No newline at end of file'은 바로 앞 라인을 따라감
+    for prev, line in zip(lines, lines[1:]):
+        if line.kind == "\\":
+            line.keep = prev.keep
+    return trimmed
+
+
+def _nearest(sorted_indices: list[int], i: int) -> list[int]:
+    pos = bisect.bisect_left(sorted_indices, i)
+    return sorted_indices[max(pos - 1, 0):pos + 1]
+
+
+def _rebuild(file_diff: FileDiff, hunks: list[tuple[str, list[_Line]]]) -> FileDiff:
+    """남은 라인으로 diff를 다시 만듭니다. 생략한 라인으로 끊긴 구간마다 라인 범위를 다시 계산한 hunk가 됩니다."""
+    header = file_diff.header
+    parts = [header]
+    offset = len(header)
+    new_hunks = []
+
+    def emit(section: str, piece: list[_Line]):
+        nonlocal offset
+        if not any(l.kind in ("+", "-") for l in piece):
+            return
+        first = next(l for l in piece if l.kind != "\\")
+        old_count = sum(1 for l in piece if l.kind in (" ", "-"))
+        new_count = sum(1 for l in piece if l.kind in (" ", "+"))
+        added = sum(1 for l in piece if l.kind == "+")
+        removed = sum(1 for l in piece if l.kind == "-")
+        hunk_header = f"@@ -{first.old},{old_count} +{first.new},{new_count} @@"
+        if section:
+            hunk_header += f" {section}"
+        text = "\n".join([hunk_header] + [l.text for l in piece])
+        if new_hunks:
+            parts.append("\n")
+            offset += 1
+        new_hunks.append(Hunk(offset, offset + len(text), first.old, old_count, first.new, new_count, added, removed))
+        parts.append(text)
+        offset += len(text)
+
+    for section, lines in hunks:
+        piece: list[_Line] = []
+        for line in lines:
+            if line.keep:
+                piece.append(line)
+            elif piece:
+                emit(section, piece)
+                piece = []
+        if piece:
+            emit(section, piece)
+
+    source = "".join(parts)
+    return FileDiff(
+        source=source, start=0, end=len(source), header_end=len(header),
+        filename=file_diff.filename, old_filename=file_diff.old_filename, status=file_diff.status,
+        is_binary=file_diff.is_binary, hunks=new_hunks,
+    )
@@ -0,0 +1,244 @@
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+_HUNK_HEADER_RE = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+FILE_HEADER_PREFIX = "diff --git "
+
+
+@dataclass(slots=True)
+class Hunk:
+    """
+    diff의 hunk 하나. 텍스트를 복사하지 않고 원본 버퍼의 오프셋만 보관합니다.
+
+    Attributes:
+        start (int): '@@' 헤더 라인의 시작 오프셋.
+        end (int): hunk의 끝 오프셋 (마지막 라인의 줄바꿈 제외).
+        old_start (int), old_lines (int): 변경 전 파일의 라인 범위.
+        new_start (int), new_lines (int): 변경 후 파일의 라인 범위.
+        added (int), removed (int): 추가/삭제된 라인 수.
+    """
+    start: int
+    end: int
+    old_start: int
+    old_lines: int
+    new_start: int
+    new_lines: int
+    added: int
+    removed: int
+
+
+@dataclass(slots=True)
+class FileDiff:
+    """
+    파일 하나의 diff 정보. `source` 버퍼의 [start, end) 구간을 가리킵니다.
+
+    Attributes:
+        source (str): diff 원본 버퍼 (여러 파일이 공유).
+        start (int), end (int): 이 파일 구간의 오프셋.
+        header_end (int): 헤더(diff --git ~ +++ 라인)의 끝이자 첫 hunk의 시작 오프셋.
+        filename (str): 변경 후 경로 (삭제된 파일은 변경 전 경로).
+        old_filename (Optional[str]): 변경 전 경로 (추가된 파일은 None).
+        status (str): 'added', 'deleted', 'modified', 'renamed', 'copied' 중 하나.
+        is_binary (bool): 바이너리 파일 여부.
+        hunks (list[Hunk]): hunk 목록.
+    """
+    source: str
+    start: int
+    end: int
+    header_end: int
+    filename: str
+    old_filename: Optional[str]
+    status: str
+    is_binary: bool
+    hunks: list[Hunk] = field(default_factory=list)
+
+    @property
+    def diff_content(self) -> str:
+        """이 파일의 전체 diff 텍스트."""
+        return self.source[self.start:self.end]
+
+    @property
+    def header(self) -> str:
+        """첫 hunk 이전의 헤더 텍스트 (줄바꿈 포함)."""
+        return self.source[self.start:self.header_end]
+
+    @property
+    def added(self) -> int:
+        return sum(h.added for h in self.hunks)
+
+    @property
+    def removed(self) -> int:
+        return sum(h.removed for h in self.hunks)
+
+    def hunk_text(self, hunk: Hunk) -> str:
+        """hunk의 텍스트 ('@@' 헤더 포함)."""
+        return self.source[hunk.start:hunk.end]
+
+
+def parse_diff(diff_text: str) -> list[FileDiff]:
+    """
+    Git diff 텍스트를 한 번의 선형 스캔으로 파일별 구조화된 레코드로 분리합니다.
+    추가/삭제/이름 변경/바이너리 파일을 모두 포함하며, 각 레코드는 원본 버퍼의 오프셋만 보관합니다.
+
+    Args:
+        diff_text (str): 전체 Git diff 텍스트.
+
+    Returns:
+        list[FileDiff]: 파일별 diff 레코드 리스트.
+    """
+    return list(_iter_files(diff_text))
+
+
+def iter_parse_diff(lines: Iterable[str]) -> Iterator[FileDiff]:
+    """
+    줄 단위로 들어오는 Git diff를 파일별로 분리하여, 각 파일의 diff가 끝나는 즉시 반환합니다.
+    스트리밍 다운로드(`github_util.stream_pr_diff`)와 함께 사용하면 전체 diff를 기다리지 않고 리뷰를 시작할 수 있습니다.
+
+    Args:
+        lines (Iterable[str]): 줄바꿈 문자를 제외한 diff의 각 줄.
+
+    Yields:
+        FileDiff: 파일별 diff 레코드. (각 레코드는 자기 파일 구간만 담은 버퍼를 가집니다.)
+    """
+    current: list[str] = []
+    for line in lines:
+        if line.startswith(FILE_HEADER_PREFIX) and current:
+            buf = "\n".join(current)
+            yield _parse_file(buf, 0, len(buf))
+            current = []
+        current.append(line)
+    if current:
+        buf = "\n".join(current)
+        if buf.startswith(FILE_HEADER_PREFIX):
+            yield _parse_file(buf, 0, len(buf))
+
+
+def _iter_files(buf: str) -> Iterator[FileDiff]:
+    """버퍼에서 'diff --git' 라인을 경계로 파일 구간을 찾아 파싱합니다."""
+    start = 0 if buf.startswith(FILE_HEADER_PREFIX) else buf.find("\n" + FILE_HEADER_PREFIX)
+    if start < 0:
+        return
+    if start > 0:
+        start += 1
+    while start >= 0:
+        nxt = buf.find("\n" + FILE_HEADER_PREFIX, start)
+        end = len(buf) if nxt < 0 else nxt
+        yield _parse_file(buf, start, end)
+        start = nxt + 1 if nxt >= 0 else -1
+
+
+def _strip_prefix(path: str, prefix: str) -> Optional[str]:
+    """'a/', 'b/' 접두어를 제거합니다. '/dev/null'은 None을 반환합니다."""
+    path = path.rstrip("\t")
+    if len(path) >= 2 and path[0] == '"' and path[-1] == '"':
+        path = path[1:-1]
+    if path == "/dev/null":
+        return None
+    return path[len(prefix):] if path.startswith(prefix) else path
+
+
+def _paths_from_git_header(line: str) -> tuple[Optional[str], Optional[str]]:
+    """'diff --git a/X b/Y' 라인에서 (X, Y)를 추출합니다. 경로에 공백이 있어도 가능한 한 복원합니다."""
+    rest = line[len(FILE_HEADER_PREFIX):]
+    # 이름이 같은 경우(가장 흔함): "a/<p> b/<p>"
+    n = (len(rest) - 5) // 2
+    if n > 0 and rest.startswith("a/") and rest[2 + n:5 + n] == " b/" and rest[2:2 + n] == rest[5 + n:]:
+        return rest[2:2 + n], rest[5 + n:]
+    old, sep, new = rest.rpartition(" b/")
+    if not sep:
+        return None, None
+    return _strip_prefix(old, "a/"), new
+
+
+def _parse_file(buf: str, start: int, end: int) -> FileDiff:
+    """버퍼의 [start, end) 구간(파일 하나)을 파싱합니다."""
+    # 끝의 줄바꿈은 파일 구간에서 제외
+    while end > start and buf[end - 1] in "\r\n":
+        end -= 1
+
+    line_end = buf.find("\n", start, end)
+    if line_end < 0:
+        line_end = end
+    old_path, new_path = _paths_from_git_header(buf[start:line_end])
+    status = "modified"
+    is_binary = False
+    minus_path = plus_path = None
+    has_minus = has_plus = False
+
+    # --- 헤더: 첫 '@@' 라인 전까지 ---
+    pos = line_end + 1
+    header_end = end
+    while pos < end:
+        line_end = buf.find("\n", pos, end)
+        if line_end < 0:
+            line_end = end
+        if buf.startswith("@@", pos):
+            header_end = pos
+            break
+        line = buf[pos:line_end]
+        if line.startswith("--- "):
+            has_minus = True
+            minus_path = _strip_prefix(line[4:], "a/")
+        elif line.startswith("+++ "):
+            has_plus = True
+            plus_path = _strip_prefix(line[4:], "b/")
+        elif line.startswith("new file mode"):
+            status = "added"
+        elif line.startswith("deleted file mode"):
+            status = "deleted"
+        elif line.startswith("rename from "):
+            status = "renamed"
+            old_path = line[len("rename from "):]
+        elif line.startswith("rename to "):
+            new_path = line[len("rename to "):]
+        elif line.startswith("copy from "):
+            status = "copied"
+            old_path = line[len("copy from "):]
+        elif line.startswith("copy to "):
+            new_path = line[len("copy to "):]
+        elif line.startswith("Binary files ") or line.startswith("GIT binary patch"):
+            is_binary = True
+        pos = line_end + 1
+
+    # '---'/'+++' 라인이 있으면 가장 정확한 경로이므로 우선 사용
+    if has_minus:
+        old_path = minus_path
+    if has_plus:
+        new_path = plus_path
+    if status == "modified" and has_minus and minus_path is None:
+        status = "added"
+    elif status == "modified" and has_plus and plus_path is None:
+        status = "deleted"
+    if status == "added":
+        old_path = None
+    elif status == "deleted":
+        new_path = None
+
+    filename = new_path or old_path or ""
+    record = FileDiff(
+        source=buf, start=start, end=end, header_end=min(header_end, end),
+        filename=filename, old_filename=old_path, status=status, is_binary=is_binary,
+    )
+
+    # --- hunk: '\n@@'를 경계로 분할하고, 추가/삭제 라인 수는 C 레벨 count로 집계 ---
+    pos = header_end
+    while pos < end:
+        nxt = buf.find("\n@@", pos + 2, end)
+        hunk_end = end if nxt < 0 else nxt
+        m = _HUNK_HEADER_RE.match(buf, pos, hunk_end)
+        if m:
+            old_start, old_lines, new_start, new_lines = m.groups()
+            record.hunks.append(Hunk(
+                start=pos,
+                end=hunk_end,
+                old_start=int(old_start),
+                old_lines=int(old_lines) if old_lines is not None else 1,
+                new_start=int(new_start),
+                new_lines=int(new_lines) if new_lines is not None else 1,
+                added=buf.count("\n+", pos, hunk_end),
+                removed=buf.count("\n-", pos, hunk_end),
+            ))
+        pos = hunk_end + 1
+    return record
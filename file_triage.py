@@ -0,0 +1,289 @@
+import fnmatch
+import math
+import posixpath
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from chunk_planner import APPROX_CHARS_PER_TOKEN, ESTIMATED_OUTPUT_TOKENS_PER_FILE, count_tokens
+from diff_parser import FileDiff
+
+# 분류 규칙을 바꾸면 올려주세요. 이전 규칙으로 저장한 PR 리뷰 결과를 재사용하지 않습니다.
+TRIAGE_RULES_VERSION = "1"
+
+# 분류 사유
+REASON_GITATTRIBUTES = "gitattributes"
+REASON_LOCKFILE = "lockfile"
+REASON_VENDORED = "vendored"
+REASON_GENERATED = "generated"
+REASON_MINIFIED = "minified"
+REASON_SNAPSHOT = "snapshot"
+REASON_BINARY = "binary"
+REASON_DATA = "data"
+
+REASON_LABELS = {
+    REASON_GITATTRIBUTES: ".gitattributes에서 생성/외부 코드로 지정된 파일",
+    REASON_LOCKFILE: "의존성 잠금 파일",
+    REASON_VENDORED: "외부(vendored) 코드",
+    REASON_GENERATED: "자동 생성 파일",
+    REASON_MINIFIED: "압축(minified) 파일",
+    REASON_SNAPSHOT: "테스트 스냅샷",
+    REASON_BINARY: "바이너리 데이터",
+    REASON_DATA: "인코딩된 데이터",
+}
+
+LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "poetry.lock", "pipfile.lock", "pdm.lock", "uv.lock", "cargo.lock", "gemfile.lock", "composer.lock",
+    "go.sum", "mix.lock", "pubspec.lock", "podfile.lock", "packages.lock.json", "flake.lock", "gradle.lockfile",
+}
+VENDORED_PATTERNS = (
+    "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*", "third_party/*", "*/third_party/*",
+    "third-party/*", "*/third-party/*", "bower_components/*", "*/bower_components/*",
+)
+GENERATED_PATTERNS = (
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.pb.cc", "*.pb.h", "*_generated.*", "*.generated.*", "*.g.dart",
+    "*.designer.cs", "dist/*", "*/dist/*", "*.map",
+)
+MINIFIED_PATTERNS = ("*.min.js", "*.min.css", "*.min.mjs", "*-min.js", "*.bundle.js")
+SNAPSHOT_PATTERNS = ("*.snap", "*/__snapshots__/*", "*.ambr")
+
+# 파일 첫머리(변경 후 파일의 처음 몇 줄)에서 찾는 자동 생성 표식
+GENERATED_MARKERS = (
+    "@generated", "code generated by", "this file is auto-generated", "this file was auto-generated",
+    "this file is automatically generated", "this file was automatically generated",
+    "autogenerated file", "generated by the protocol buffer compiler",
+)
+GENERATED_MARKER_LINES = 10
+
+# 압축 파일 판단: 추가된 라인 중 가장 긴 라인과 평균 라인 길이(문자)
+MINIFIED_MAX_LINE_LENGTH = 1000
+MINIFIED_AVG_LINE_LENGTH = 200
+
+# 인코딩된 데이터(base64 등) 판단: 문자당 엔트로피(bit)와 공백 비율, 평균 라인 길이
+DATA_MIN_ENTROPY = 5.0
+DATA_MAX_WHITESPACE_RATIO = 0.02
+DATA_MIN_AVG_LINE_LENGTH = 60
+
+# 휴리스틱 검사에 사용할 추가 라인 최대 길이(문자). 큰 파일도 앞부분만 보고 판단합니다.
+SAMPLE_MAX_CHARS = 64 * 1024
+# 이보다 큰 diff는 토큰 수를 세지 않고 문자 수로 근사 (절감량 계산용)
+EXACT_TOKEN_COUNT_MAX_CHARS = 256 * 1024
+
+_stats = {"files": 0, "calls_saved": 0, "tokens_saved": 0}
+_lock = threading.Lock()
+
+
+class GitAttributes:
+    """
+    `.gitattributes`의 패턴별 속성입니다. 같은 속성은 뒤에 나온 패턴이 우선합니다.
+    패턴 매칭은 gitignore 규칙을 단순화하여, 슬래시가 없는 패턴은 파일 이름에, 있으면 저장소 루트 기준 경로에 적용합니다.
+    """
+
+    def __init__(self, rules: list[tuple[str, dict]]):
+        self.rules = rules
+
+    @classmethod
+    def parse(cls, text: str) -> "GitAttributes":
+        """
+        `.gitattributes` 내용을 파싱합니다.
+
+        Args:
+            text (str): 파일 내용.
+
+        Returns:
+            GitAttributes: 파싱된 규칙. 내용이 비어 있으면 규칙이 없는 객체.
+        """
+        rules = []
+        for line in (text or "").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            pattern, *tokens = line.split()
+            attrs = {}
+            for token in tokens:
+                if token.startswith("-"):
+                    attrs[token[1:]] = False
+                elif token.startswith("!"):
+                    attrs[token[1:]] = None
+                elif "=" in token:
+                    name, value = token.split("=", 1)
+                    attrs[name] = False if value.lower() in ("false", "0") else value
+                else:
+                    attrs[token] = True
+            if attrs:
+                rules.append((pattern, attrs))
+        return cls(rules)
+
+    def attributes_for(self, path: str) -> dict:
+        """경로에 적용되는 속성을 반환합니다. (값: True/False/문자열, 해제된 속성은 None)"""
+        result = {}
+        for pattern, attrs in self.rules:
+            if _match_gitattributes(pattern, path):
+                result.update(attrs)
+        return result
+
+
+@dataclass(slots=True)
+class TriageResult:
+    """
+    LLM 리뷰 전 분류 결과.
+
+    Attributes:
+        reason (str): 분류 사유 (`REASON_*`).
+        detail (str): 판단 근거 (예: 일치한 패턴, 평균 라인 길이).
+        tokens_saved (int): 리뷰하지 않아 아낀 예상 토큰 수 (입력 + 출력).
+        calls_saved (int): 리뷰하지 않아 아낀 예상 LLM 요청 수 (청크 수).
+    """
+    reason: str
+    detail: str
+    tokens_saved: int
+    calls_saved: int
+
+    def summary(self, file_diff: FileDiff) -> str:
+        """리뷰 대신 보여줄 한 줄 요약."""
+        return (
+            f"🧹 {REASON_LABELS[self.reason]}로 판단되어 리뷰를 건너뜁니다 ({self.detail}). "
+            f"+{file_diff.added}/-{file_diff.removed} 라인"
+        )
+
+
+def triage_file(file_diff: FileDiff, attributes: Optional[GitAttributes] = None,
+                chunk_max_tokens: int = 6000) -> Optional[TriageResult]:
+    """
+    경로 패턴, `.gitattributes`의 linguist 속성, 라인 길이·엔트로피 휴리스틱, 바이너리 표식으로
+    LLM 리뷰가 필요 없는 파일(잠금 파일, 자동 생성·vendored·압축 파일, 스냅샷, 인코딩된 데이터)을 골라냅니다.
+
+    Args:
+        file_diff (FileDiff): 파싱된 파일 diff.
+        attributes (Optional[GitAttributes]): PR head의 `.gitattributes` 규칙.
+        chunk_max_tokens (int): 청크 하나의 최대 토큰 수 (아낀 요청 수 계산용).
+
+    Returns:
+        Optional[TriageResult]: 리뷰를 건너뛸 파일이면 분류 결과, 아니면 None.
+    """
+    classified = _classify(file_diff, attributes)
+    if classified is None:
+        return None
+    reason, detail = classified
+
+    content = file_diff.diff_content
+    if len(content) <= EXACT_TOKEN_COUNT_MAX_CHARS:
+        tokens = count_tokens(content)
+    else:
+        tokens = int(len(content) / APPROX_CHARS_PER_TOKEN) + 1
+    calls = max(1, math.ceil(tokens / max(chunk_max_tokens, 1)))
+    result = TriageResult(reason, detail, tokens + ESTIMATED_OUTPUT_TOKENS_PER_FILE * calls, calls)
+    with _lock:
+        _stats["files"] += 1
+        _stats["calls_saved"] += result.calls_saved
+        _stats["tokens_saved"] += result.tokens_saved
+    return result
+
+
+def get_triage_stats() -> dict:
+    """
+    프로세스 전역 분류 통계를 반환합니다.
+
+    Returns:
+        dict: 'files'(건너뛴 파일 수), 'calls_saved'(아낀 LLM 요청 수), 'tokens_saved'(아낀 토큰 수).
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def _classify(file_diff: FileDiff, attributes: Optional[GitAttributes]) -> Optional[tuple[str, str]]:
+    path = file_diff.filename
+    lower = path.lower()
+    basename = posixpath.basename(lower)
+
+    if attributes is not None:
+        attrs = attributes.attributes_for(path)
+        for name in ("linguist-generated", "linguist-vendored"):
+            if attrs.get(name) not in (None, False):
+                return REASON_GITATTRIBUTES, name
+        if attrs.get("binary") is True or attrs.get("diff") is False:
+            return REASON_BINARY, ".gitattributes: binary"
+
+    if basename in LOCKFILE_NAMES or basename.endswith(".lock"):
+        return REASON_LOCKFILE, basename
+    for reason, patterns in (
+        (REASON_VENDORED, VENDORED_PATTERNS),
+        (REASON_SNAPSHOT, SNAPSHOT_PATTERNS),
+        (REASON_MINIFIED, MINIFIED_PATTERNS),
+        (REASON_GENERATED, GENERATED_PATTERNS),
+    ):
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(lower, pattern):
+                return reason, f"`{pattern}`"
+
+    lines = _sample_added_lines(file_diff)
+    if not lines:
+        return None
+    sample = "\n".join(lines)
+    if "\x00" in sample:
+        return REASON_BINARY, "NUL 문자 포함"
+
+    head = _file_head(file_diff).lower()
+    for marker in GENERATED_MARKERS:
+        if marker in head:
+            return REASON_GENERATED, f"'{marker}' 표식"
+
+    longest = max(len(line) for line in lines)
+    average = sum(len(line) for line in lines) / len(lines)
+    if longest >= MINIFIED_MAX_LINE_LENGTH and average >= MINIFIED_AVG_LINE_LENGTH:
+        return REASON_MINIFIED, f"평균 라인 길이 {average:.0f}자"
+
+    if average >= DATA_MIN_AVG_LINE_LENGTH:
+        whitespace = sum(1 for ch in sample if ch.isspace()) / len(sample)
+        entropy = _shannon_entropy(sample)
+        if entropy >= DATA_MIN_ENTROPY and whitespace <= DATA_MAX_WHITESPACE_RATIO:
+            return REASON_DATA, f"엔트로피 {entropy:.1f}bit/문자"
+    return None
+
+
+def _sample_added_lines(file_diff: FileDiff) -> list[str]:
+    """추가된 라인을 `SAMPLE_MAX_CHARS`까지 모읍니다. ('+' 제외)"""
+    lines, total = [], 0
+    for hunk in file_diff.hunks:
+        for line in file_diff.hunk_text(hunk).split("\n"):
+            if line.startswith("+") and not line.startswith("+++"):
+                lines.append(line[1:])
+                total += len(line)
+                if total >= SAMPLE_MAX_CHARS:
+                    return lines
+    return lines
+
+
+def _file_head(file_diff: FileDiff) -> str:
+    """첫 hunk가 파일 맨 앞을 포함하면, 변경 후 파일의 처음 `GENERATED_MARKER_LINES`줄을 반환합니다."""
+    if not file_diff.hunks or file_diff.hunks[0].new_start > 1:
+        return ""
+    head = []
+    for line in file_diff.hunk_text(file_diff.hunks[0]).split("\n")[1:]:
+        if line.startswith(("+", " ")):
+            head.append(line[1:])
+            if len(head) >= GENERATED_MARKER_LINES:
+                break
+    return "\n".join(head)
+
+
+def _shannon_entropy(text: str) -> float:
+    counts = Counter(text)
+    total = len(text)
+    return -sum(n / total * math.log2(n / total) for n in counts.values())
+
+
+def _match_gitattributes(pattern: str, path: str) -> bool:
+    if pattern.startswith("/"):
+        return fnmatch.fnmatchcase(path, pattern[1:]) or fnmatch.fnmatchcase(path, pattern[1:].rstrip("/") + "/*")
+    if pattern.startswith("**/"):
+        pattern = pattern[3:]
+    if "/" not in pattern.rstrip("/"):
+        # 슬래시가 없는 패턴은 어느 디렉터리의 파일 이름(또는 디렉터리 이름)과도 일치
+        name = pattern.rstrip("/")
+        return any(fnmatch.fnmatchcase(part, name) for part in path.split("/"))
+    if pattern.endswith("/**"):
+        return fnmatch.fnmatchcase(path, pattern[:-3] + "/*")
+    return fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(path, pattern.rstrip("/") + "/*")
@@ -1,5 +1,168 @@
 import re, requests
-from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from telemetry import record_span
+
+# GitHub Enterprise나 로컬 가짜 서버(benchmarks/bench_review_pipeline.py)를 쓰려면 GITHUB_API_URL로 바꿉니다.
+GITHUB_API_URL = (os.getenv("GITHUB_API_URL") or "https://api.github.com").rstrip("/")
+
+# 스트리밍 다운로드 시 한 번에 읽을 바이트 수
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 요청 타임아웃 (연결, 읽기) 초
+REQUEST_TIMEOUT = (5, 30)
+
+# 연결 재사용 풀 크기와 일시적 오류(5xx 등) 재시도 설정
+POOL_MAXSIZE = 16
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+
+# ETag로 재검증하는 응답 캐시의 최대 항목 수와 최대 크기(바이트). 큰 diff는 크기 한도로 제한됩니다.
+RESPONSE_CACHE_MAX_ENTRIES = 64
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    GitHub API 호출에 사용할 프로세스 공용 `requests.Session`을 반환합니다.
+    keep-alive 연결 풀을 재사용하여 매 요청의 TLS 핸드셰이크를 줄이고,
+    연결 오류와 일시적인 5xx 응답은 지수 백오프로 재시도합니다.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRY_TOTAL,
+                    backoff_factor=RETRY_BACKOFF_FACTOR,
+                    status_forcelist=(500, 502, 503, 504),
+                    allowed_methods=frozenset({"GET"}),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                session = requests.Session()
+                session.mount("https://", HTTPAdapter(pool_maxsize=POOL_MAXSIZE, max_retries=retry))
+                session.mount("http://", HTTPAdapter(pool_maxsize=POOL_MAXSIZE, max_retries=retry))
+                _session = session
+    return _session
+
+
+class _ResponseCache:
+    """
+    (URL, Accept, 쿼리) → (ETag, 본문) LRU 캐시입니다. 항목 수와 전체 크기로 제한됩니다.
+    캐시된 본문은 GitHub가 `If-None-Match`에 304로 응답한 경우에만 사용하므로, 항상 최신 내용과 같습니다.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple[str, str, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: tuple) -> Optional[tuple[str, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key: tuple, etag: str, body: str):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (etag, body, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[2]
+
+
+_response_cache = _ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0, "not_modified": 0, "latency_total": 0.0, "last_latency": None,
+    "rate_limit_remaining": None, "rate_limit_limit": None, "rate_limit_reset": None,
+}
+
+
+def get_github_stats() -> dict:
+    """
+    GitHub API 호출 통계를 반환합니다.
+
+    Returns:
+        dict: 요청 수, 304(캐시 재사용) 수, 평균/마지막 지연 시간(초), 남은 rate limit과 초기화 시각(epoch 초).
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["latency_avg"] = stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+    return stats
+
+
+def _record_response(r: requests.Response, latency: float):
+    """응답의 지연 시간과 rate limit 헤더를 통계에 반영하고, 지연 시간을 'github' 단계 구간으로 기록합니다."""
+    record_span("github", latency, status=r.status_code)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["latency_total"] += latency
+        _stats["last_latency"] = latency
+        if r.status_code == 304:
+            _stats["not_modified"] += 1
+        for header, key in (
+            ("X-RateLimit-Remaining", "rate_limit_remaining"),
+            ("X-RateLimit-Limit", "rate_limit_limit"),
+            ("X-RateLimit-Reset", "rate_limit_reset"),
+        ):
+            value = r.headers.get(header)
+            if value is not None and value.isdigit():
+                _stats[key] = int(value)
+
+
+def _headers(github_token: str, accept: str) -> dict:
+    return {"Authorization": f"token {github_token}", "Accept": accept}
+
+
+def _cached_get(url: str, github_token: str, accept: str, params: Optional[dict] = None) -> str:
+    """
+    ETag 조건부 요청으로 GET을 보냅니다. 304이면 캐시된 본문을, 200이면 새 본문을 캐시에 저장하여 반환합니다.
+
+    Raises:
+        requests.exceptions.RequestException: API 요청 실패 시 발생.
+    """
+    key = (url, accept, tuple(sorted((params or {}).items())))
+    headers = _headers(github_token, accept)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+
+    start = time.perf_counter()
+    r = get_session().get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+    _record_response(r, time.perf_counter() - start)
+    if r.status_code == 304 and cached is not None:
+        return cached[1]
+    r.raise_for_status()
+    etag = r.headers.get("ETag")
+    if etag:
+        _response_cache.put(key, etag, r.text)
+    return r.text
 
 def extract_github_info(pr_url: str) -> Optional[tuple]:
     """
@@ -36,11 +199,151 @@ def fetch_pr_diff(owner: str, repo: str, pr_number: int, github_token: str) -> s
     Raises:
         requests.exceptions.RequestException: API 요청 실패 시 발생.
     """
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3.diff"
-    }
-    url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return r.text
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+    return _cached_get(url, github_token, "application/vnd.github.v3.diff")
+
+def stream_pr_diff(owner: str, repo: str, pr_number: int, github_token: str) -> Iterator[str]:
+    """
+    Pull Request의 diff를 스트리밍으로 내려받아 한 줄씩 반환합니다.
+    다운로드가 끝나기 전에 파싱과 리뷰를 시작할 수 있습니다.
+    이전에 받은 diff가 있으면 ETag로 재검증하여, 바뀌지 않았으면(304) 캐시된 diff를 반환합니다.
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        github_token (str): GitHub 개인 접근 토큰(PAT).
+
+    Yields:
+        str: 줄바꿈 문자를 제외한 diff의 각 줄.
+
+    Raises:
+        requests.exceptions.RequestException: API 요청 실패 시 발생.
+    """
+    accept = "application/vnd.github.v3.diff"
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+    key = (url, accept, ())
+    headers = _headers(github_token, accept)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+
+    start = time.perf_counter()
+    with get_session().get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as r:
+        # 스트리밍 응답은 헤더 도착까지의 시간을 지연 시간으로 기록
+        _record_response(r, time.perf_counter() - start)
+        if r.status_code == 304 and cached is not None:
+            lines = cached[1].split("\n")
+            # 아래 스트리밍 경로와 같게, 마지막 줄바꿈 뒤의 빈 줄은 반환하지 않음
+            if lines[-1] == "":
+                lines.pop()
+            yield from lines
+            return
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        etag = r.headers.get("ETag")
+        # 캐시 한도보다 커지면 본문 보관을 중단 (메모리 제한)
+        received: Optional[list[str]] = [] if etag else None
+        received_size = 0
+        # Response.iter_lines()는 '\r' 등에서도 줄을 나누고 청크 경계에서 빈 줄을 만들 수 있어,
+        # diff 원문을 보존하도록 '\n' 기준으로 직접 분할합니다.
+        # 아직 줄바꿈을 만나지 못한 줄의 조각들. 줄바꿈이 없는 아주 긴 줄(압축된 번들 등)도
+        # 청크마다 다시 복사하지 않도록 조각을 모아 두었다가 줄이 끝날 때 한 번만 합칩니다.
+        partial: list[str] = []
+        for chunk in r.iter_content(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True):
+            if received is not None:
+                received.append(chunk)
+                received_size += len(chunk)
+                if received_size > _response_cache.max_bytes:
+                    received = None
+            lines = chunk.split("\n")
+            if len(lines) == 1:
+                partial.append(chunk)
+                continue
+            partial.append(lines[0])
+            yield "".join(partial)
+            yield from lines[1:-1]
+            partial = [lines[-1]]
+        pending = "".join(partial)
+        if pending:
+            yield pending
+        if received is not None:
+            _response_cache.put(key, etag, "".join(received))
+
+def fetch_pr_head_sha(owner: str, repo: str, pr_number: int, github_token: str) -> str:
+    """
+    Pull Request의 현재 head 커밋 SHA를 가져옵니다.
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        github_token (str): GitHub 개인 접근 토큰(PAT).
+
+    Returns:
+        str: head 커밋 SHA.
+
+    Raises:
+        requests.exceptions.RequestException: API 요청 실패 시 발생.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+    return json.loads(_cached_get(url, github_token, "application/vnd.github.v3+json"))["head"]["sha"]
+
+def fetch_pr_files(owner: str, repo: str, pr_number: int, github_token: str) -> dict[str, dict]:
+    """
+    Pull Request에서 변경된 파일 목록과 파일별 blob SHA를 가져옵니다. (페이지네이션 처리)
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        github_token (str): GitHub 개인 접근 토큰(PAT).
+
+    Returns:
+        dict[str, dict]: 파일 경로 → {'sha', 'status', 'previous_filename', 'patch_sha'} 딕셔너리.
+            'patch_sha'는 base 대비 파일 patch의 SHA-256입니다. (GitHub가 patch를 주지 않는 큰·바이너리 파일은 None)
+
+    Raises:
+        requests.exceptions.RequestException: API 요청 실패 시 발생.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}/files"
+    files = {}
+    page = 1
+    while True:
+        body = _cached_get(url, github_token, "application/vnd.github.v3+json", {"per_page": 100, "page": page})
+        items = json.loads(body)
+        for item in items:
+            files[item["filename"]] = {
+                "sha": item.get("sha"),
+                "status": item.get("status"),
+                "previous_filename": item.get("previous_filename"),
+                "patch_sha": hashlib.sha256(item["patch"].encode("utf-8")).hexdigest() if item.get("patch") else None,
+            }
+        if len(items) < 100:
+            break
+        page += 1
+    return files
+
+def fetch_gitattributes(owner: str, repo: str, ref: str, github_token: str) -> str:
+    """
+    저장소 루트의 `.gitattributes` 내용을 가져옵니다. (파일 분류에 linguist 속성을 사용하기 위함)
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        ref (str): 읽을 커밋 SHA 또는 브랜치 (보통 PR head).
+        github_token (str): GitHub 개인 접근 토큰(PAT).
+
+    Returns:
+        str: `.gitattributes` 내용. 파일이 없으면 빈 문자열.
+
+    Raises:
+        requests.exceptions.RequestException: API 요청 실패 시 발생 (404 제외).
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/.gitattributes"
+    try:
+        return _cached_get(url, github_token, "application/vnd.github.raw", {"ref": ref})
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return ""
+        raise
@@ -0,0 +1,231 @@
+import hashlib
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+# MinHash 서명 길이와 LSH 밴드 수 (밴드당 NUM_PERM // LSH_BANDS개 값).
+# 16×4 구성은 유사도 0.5 안팎부터 후보로 잡고, 최종 판단은 추정 유사도로 합니다.
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# 유사도 계산에 사용할 토큰 shingle 길이
+SHINGLE_SIZE = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(20240601)
+# 프로세스마다 같은 서명이 나오도록 고정된 시드로 만든 해시 함수 계수 (a·x + b mod p)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+# 문자열 리터럴(한 줄 안), 식별자, 숫자, 그 밖의 문자 하나
+_TOKEN_RE = re.compile(r""""(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|[A-Za-z_$][\w$]*|\d[\w.]*|\S""")
+
+# 멤버·네임스페이스 접근 연산자. 앞뒤의 이름은 지역 변수가 아니라 API 이름으로 보고 그대로 둡니다.
+_QUALIFIERS = (".", "::", "->")
+
+# 이 단어로 시작하는 라인(import 등)의 이름은 모듈·패키지 이름이므로 그대로 둡니다.
+IMPORT_KEYWORDS = frozenset({"import", "from", "use", "using", "package", "require", "include"})
+
+# 이름 바꾸기와 무관하게 변경의 구조를 나타내므로 정규화하지 않는 단어 (주요 언어의 키워드·리터럴)
+KEYWORDS = frozenset("""
+    abstract and as assert async await break case catch class const continue def default defer del do elif else
+    enum except export extends final finally fn for from func function go goto if impl implements import in
+    instanceof interface is lambda let match mod module namespace new nonlocal not or package pass private
+    protected pub public raise return select static struct super switch template this throw throws trait try
+    type typeof union unsafe use using var void volatile where while with yield
+    true false True False null None nil undefined self
+    int long float double bool boolean char byte short string str unsigned signed
+""".split())
+
+
+@dataclass(slots=True)
+class HunkFingerprint:
+    """
+    리뷰 단위 diff의 정규화 결과와 유사도 서명.
+
+    Attributes:
+        normalized (str): 파일 헤더·라인 번호를 지우고 지역 변수 이름을 등장 순서대로 바꾼 diff 본문.
+        digest (str): `normalized`의 SHA-256 (완전히 같은 변경 판단용).
+        changes (str): 변경 라인('+', '-')만 따로 정규화한 텍스트의 SHA-256.
+        signature (np.ndarray): 컨텍스트를 포함한 토큰 shingle의 MinHash 서명 (`NUM_PERM`개).
+        tokens (int): 정규화된 토큰 수.
+    """
+    normalized: str
+    digest: str
+    changes: str
+    signature: np.ndarray
+    tokens: int
+
+    def similarity(self, other: "HunkFingerprint") -> float:
+        """두 서명으로 추정한 shingle 집합의 Jaccard 유사도."""
+        if self.digest == other.digest:
+            return 1.0
+        return float(np.count_nonzero(self.signature == other.signature)) / NUM_PERM
+
+
+def normalize_diff(diff_text: str) -> tuple[str, int]:
+    """
+    diff에서 파일마다 달라지는 부분을 지워, 같은 수정을 여러 파일에 적용한 변경이 같은 텍스트가 되도록 합니다.
+
+    - 첫 '@@' 이전의 파일 헤더(경로, index, 모드)를 버리고, '@@' 헤더의 라인 번호와 함수 문맥을 지웁니다.
+    - 지역 변수로 보이는 이름만 diff 안에서 처음 등장한 순서대로 `v0`, `v1`, ...로 바꿉니다.
+      같은 이름은 항상 같은 기호가 되므로, 정규화 결과가 같으면 두 변경은 지역 변수 이름을 일관되게 바꾼 것만 다릅니다.
+    - 키워드, 호출하는 함수 이름(뒤에 '('), 멤버·네임스페이스 이름('.', '::', '->'의 앞뒤), 키워드 인자 이름,
+      import 라인의 이름, 문자열·숫자 리터럴은 그대로 둡니다. (`total = compute_price(items)`와
+      `count = delete_all(users)`는 다른 변경입니다.)
+    - 공백은 토큰 사이 한 칸으로 맞춥니다.
+
+    Args:
+        diff_text (str): 파일 헤더를 포함한 diff 텍스트 (리뷰 단위 하나).
+
+    Returns:
+        tuple[str, int]: (정규화된 텍스트, 토큰 수).
+    """
+    return _normalize_lines(_hunk_lines(diff_text))
+
+
+def _hunk_lines(diff_text: str) -> list[str]:
+    """첫 '@@' 이후의 '@@' 헤더와 컨텍스트·변경 라인. (파일 헤더, '\\ No newline at end of file'는 제외)"""
+    lines = []
+    in_hunk = False
+    for line in diff_text.split("\n"):
+        if line.startswith("@@"):
+            in_hunk = True
+            lines.append("@@")
+        elif in_hunk and line[:1] in (" ", "+", "-"):
+            lines.append(line)
+    return lines
+
+
+def _normalize_lines(lines: list[str]) -> tuple[str, int]:
+    names: dict[str, str] = {}
+    normalized: list[str] = []
+    tokens = 0
+    for line in lines:
+        if line == "@@":
+            normalized.append(line)
+            continue
+        words = _TOKEN_RE.findall(line[1:])
+        keep_names = bool(words) and words[1 if words[0] == "#" and len(words) > 1 else 0] in IMPORT_KEYWORDS
+        out = []
+        depth = 0
+        for i, token in enumerate(words):
+            if token in ("(", "[", "{"):
+                depth += 1
+            elif token in (")", "]", "}"):
+                depth = max(0, depth - 1)
+            if keep_names or not _is_local_name(words, i, depth):
+                out.append(token)
+            else:
+                out.append(names.setdefault(token, f"v{len(names)}"))
+        tokens += len(out)
+        normalized.append(line[0] + " ".join(out))
+    return "\n".join(normalized), tokens
+
+
+def _is_local_name(words: list[str], i: int, depth: int) -> bool:
+    """`words[i]`가 바꿔도 되는 지역 변수 이름인지 판단합니다. (키워드·리터럴·호출·멤버·키워드 인자 이름은 False)"""
+    token = words[i]
+    if token in KEYWORDS or not (token[0].isalpha() or token[0] in "_$"):
+        return False
+    before = "".join(words[max(0, i - 2):i])
+    after = "".join(words[i + 1:i + 3])
+    if before.endswith(_QUALIFIERS) or after.startswith(_QUALIFIERS) or after.startswith("("):
+        return False
+    # 괄호 안의 'name=' (== 제외)는 키워드 인자 이름
+    if depth > 0 and after.startswith("=") and not after.startswith("=="):
+        return False
+    return True
+
+
+def fingerprint_diff(diff_text: str, min_tokens: int = 0) -> Optional[HunkFingerprint]:
+    """
+    diff를 정규화하고 MinHash 서명을 계산합니다.
+
+    Args:
+        diff_text (str): 파일 헤더를 포함한 diff 텍스트 (리뷰 단위 하나).
+        min_tokens (int): 정규화된 토큰이 이보다 적으면 None. 짧은 변경은 이름을 지우면 우연히 같아지기 쉽습니다.
+
+    Returns:
+        Optional[HunkFingerprint]: 지문. 너무 짧으면 None.
+    """
+    lines = _hunk_lines(diff_text)
+    normalized, tokens = _normalize_lines(lines)
+    if tokens == 0 or tokens < min_tokens:
+        return None
+    # 컨텍스트와 상관없이 같은 이름 바꾸기 규칙으로 비교하도록 변경 라인은 따로 정규화
+    changes, _ = _normalize_lines([line for line in lines if line[:1] in ("@", "+", "-")])
+    return HunkFingerprint(normalized, _sha256(normalized), _sha256(changes), _minhash(normalized), tokens)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _minhash(normalized: str) -> np.ndarray:
+    # 줄 경계('\n')도 토큰으로 남겨 라인 구조가 shingle에 반영되도록 함
+    words = normalized.replace("\n", " \n ").split(" ")
+    count = max(len(words) - SHINGLE_SIZE + 1, 1)
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(count)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # 32비트 해시 × 32비트 계수라 uint64 안에서 넘치지 않음
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % np.uint64(_MERSENNE_PRIME)
+    return permuted.min(axis=0)
+
+
+class DedupIndex:
+    """
+    대표 변경의 지문을 모아 두고, 새 변경과 거의 같은 대표를 찾는 색인입니다. (스레드 안전)
+
+    변경 라인은 정규화한 결과가 완전히 같아야 하고(지역 변수 이름을 일관되게 바꾼 것만 허용), 주변 컨텍스트만 다를 수 있습니다.
+    전체가 같으면 해시로 바로 찾고, 나머지는 MinHash 서명의 LSH 밴드가 하나라도 같은 대표만 후보로 골라
+    추정 유사도가 `threshold` 이상인 가장 비슷한 대표를 반환합니다.
+    `namespace`(예: 언어)가 다른 변경끼리는 비교하지 않습니다.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # 키의 namespace는 (namespace, 변경 라인 해시)
+        self._exact: dict[tuple, Any] = {}
+        # (namespace, 밴드 번호, 밴드 값) → [(지문, 값)]
+        self._buckets: dict[tuple, list[tuple[HunkFingerprint, Any]]] = {}
+
+    def find_or_add(self, namespace: str, fp: HunkFingerprint, value: Any) -> Optional[Any]:
+        """
+        `fp`와 거의 같은 대표가 있으면 그 값을 반환하고, 없으면 `fp`를 `value`의 대표로 등록합니다.
+
+        Args:
+            namespace (str): 비교 범위 (같은 namespace끼리만 비교).
+            fp (HunkFingerprint): 새 변경의 지문.
+            value (Any): 대표로 등록할 때 함께 저장할 값.
+
+        Returns:
+            Optional[Any]: 찾은 대표의 값. 새로 등록했으면 None.
+        """
+        namespace = (namespace, fp.changes)
+        bands = _bands(fp.signature)
+        with self._lock:
+            found = self._exact.get((namespace, fp.digest))
+            if found is not None:
+                return found
+            best, best_similarity = None, self.threshold
+            for i, band in enumerate(bands):
+                for other, other_value in self._buckets.get((namespace, i, band), ()):
+                    similarity = fp.similarity(other)
+                    if similarity >= best_similarity:
+                        best, best_similarity = other_value, similarity
+            if best is not None:
+                return best
+            self._exact[(namespace, fp.digest)] = value
+            for i, band in enumerate(bands):
+                self._buckets.setdefault((namespace, i, band), []).append((fp, value))
+            return None
+
+
+def _bands(signature: np.ndarray) -> list[bytes]:
+    return [band.tobytes() for band in np.split(signature, LSH_BANDS)]
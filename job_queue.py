@@ -0,0 +1,513 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from review_budget import ReviewBudget
+from review_cache import connect_sqlite
+from telemetry import Trace
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+SUMMARIZING = "summarizing"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+CANCELLED = "cancelled"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING, SUMMARIZING)
+FINISHED_STATUSES = (DONE, FAILED, INTERRUPTED, CANCELLED)
+
+# 이 프로세스를 나타내는 작업 실행자 정보. pid는 재사용될 수 있으므로 프로세스마다 새로 만드는 값(nonce)으로 구분합니다.
+WORKER_ID = uuid.uuid4().hex
+WORKER_HOST = socket.gethostname()
+WORKER_PID = os.getpid()
+
+# 이전 버전에서 만든 작업 테이블에 추가할 실행자 컬럼
+_WORKER_COLUMNS = (("worker_id", "TEXT"), ("worker_host", "TEXT"), ("worker_pid", "INTEGER"), ("heartbeat_at", "REAL"))
+
+
+class JobStore:
+    """
+    리뷰 작업과 파일별 진행 상황을 저장하는 SQLite 저장소입니다.
+    Streamlit 세션이 끊기거나 다시 실행되어도, 작업 ID로 진행 중이거나 끝난 작업의 결과를 다시 읽을 수 있습니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS review_jobs (
+                    id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    repo TEXT NOT NULL,
+                    pr_number INTEGER NOT NULL,
+                    head_sha TEXT,
+                    use_cache INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    summary TEXT,
+                    report_json TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    worker_id TEXT,
+                    worker_host TEXT,
+                    worker_pid INTEGER,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(review_jobs)")}
+            for name, sql_type in _WORKER_COLUMNS:
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE review_jobs ADD COLUMN {name} {sql_type}")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS review_job_files (
+                    job_id TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    result_json TEXT,
+                    PRIMARY KEY (job_id, filename)
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_review_jobs_pr ON review_jobs(owner, repo, pr_number)")
+            self._conn.commit()
+
+    def create(self, owner: str, repo: str, pr_number: int, head_sha: Optional[str], use_cache: bool) -> str:
+        """새 작업을 이 프로세스가 실행하는 'queued' 상태로 만들고 작업 ID를 반환합니다."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO review_jobs (id, owner, repo, pr_number, head_sha, use_cache, status, created_at, updated_at, "
+                "worker_id, worker_host, worker_pid, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, repo, pr_number, head_sha, int(use_cache), QUEUED, now, now,
+                 WORKER_ID, WORKER_HOST, WORKER_PID, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        작업 정보와 파일별 진행 상황을 반환합니다.
+
+        Returns:
+            Optional[dict]: 작업 필드와 'files'(제출 순서대로 {'filename', 'status', 'result'}), 'report'. 없으면 None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, owner, repo, pr_number, head_sha, use_cache, status, error, summary, report_json, "
+                "created_at, updated_at FROM review_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            files = self._conn.execute(
+                "SELECT filename, status, result_json FROM review_job_files WHERE job_id = ? ORDER BY seq",
+                (job_id,),
+            ).fetchall()
+        return {
+            "id": row[0], "owner": row[1], "repo": row[2], "pr_number": row[3], "head_sha": row[4],
+            "use_cache": bool(row[5]), "status": row[6], "error": row[7], "summary": row[8],
+            "report": json.loads(row[9]) if row[9] else None,
+            "created_at": row[10], "updated_at": row[11],
+            "files": [
+                {"filename": f[0], "status": f[1], "result": json.loads(f[2]) if f[2] else None}
+                for f in files
+            ],
+        }
+
+    def find_active(self, owner: str, repo: str, pr_number: int,
+                    head_sha: Optional[str] = None, use_cache: Optional[bool] = None) -> Optional[str]:
+        """같은 PR(과 head, 캐시 사용 여부)의 진행 중인 작업 ID를 반환합니다. 없으면 None."""
+        query = (
+            "SELECT id FROM review_jobs WHERE owner = ? AND repo = ? AND pr_number = ? "
+            f"AND status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})"
+        )
+        params = [owner, repo, pr_number, *ACTIVE_STATUSES]
+        if head_sha is not None:
+            query += " AND head_sha = ?"
+            params.append(head_sha)
+        if use_cache is not None:
+            query += " AND use_cache = ?"
+            params.append(int(use_cache))
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None, head_sha: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE review_jobs SET status = ?, error = COALESCE(?, error), head_sha = COALESCE(?, head_sha), "
+                "updated_at = ? WHERE id = ?",
+                (status, error, head_sha, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def set_file(self, job_id: str, filename: str, status: str, result: Optional[dict] = None):
+        """파일 진행 상황을 기록합니다. 처음 기록되는 파일은 제출 순서(seq)를 부여받습니다."""
+        result_json = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO review_job_files (job_id, filename, seq, status, result_json) "
+                "VALUES (?, ?, (SELECT COUNT(*) FROM review_job_files WHERE job_id = ?), ?, ?) "
+                "ON CONFLICT(job_id, filename) DO UPDATE SET status = excluded.status, result_json = excluded.result_json",
+                (job_id, filename, job_id, status, result_json),
+            )
+            self._conn.commit()
+
+    def finish(self, job_id: str, status: str, summary: Optional[str], report: dict, error: Optional[str] = None):
+        """작업을 끝난 상태로 기록하고 최종 보고서와 실행 정보를 저장합니다."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE review_jobs SET status = ?, summary = ?, report_json = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, summary, json.dumps(report, ensure_ascii=False), error, time.time(), job_id),
+            )
+            self._conn.commit()
+
+    def heartbeat(self) -> int:
+        """이 프로세스가 실행 중인 작업의 heartbeat 시각을 갱신합니다."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"UPDATE review_jobs SET heartbeat_at = ? "
+                f"WHERE worker_id = ? AND status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+                (time.time(), WORKER_ID, *ACTIVE_STATUSES),
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def interrupt_active(self, stale_seconds: float) -> int:
+        """
+        실행하던 프로세스가 사라진 작업을 'interrupted'로 표시합니다.
+        같은 저장소를 쓰는 다른 프로세스가 실행 중인 작업은 건드리지 않습니다.
+
+        - 실행자 정보가 없는 작업(이전 버전에서 만든 작업)과 heartbeat가 `stale_seconds`보다 오래된 작업은 중단된 것으로 봅니다.
+        - 같은 호스트의 작업은 실행하던 pid가 더 이상 없으면 heartbeat를 기다리지 않고 바로 중단된 것으로 봅니다.
+
+        Args:
+            stale_seconds (float): heartbeat가 이보다 오래되면 실행자가 사라진 것으로 봅니다.
+
+        Returns:
+            int: 'interrupted'로 바꾼 작업 수.
+        """
+        cutoff = time.time() - stale_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, worker_id, worker_host, worker_pid, heartbeat_at FROM review_jobs "
+                f"WHERE status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+                ACTIVE_STATUSES,
+            ).fetchall()
+            orphaned = [
+                job_id for job_id, worker_id, host, pid, heartbeat_at in rows
+                if worker_id != WORKER_ID and (
+                    worker_id is None or heartbeat_at is None or heartbeat_at < cutoff
+                    or (host == WORKER_HOST and not _pid_alive(pid))
+                )
+            ]
+            if not orphaned:
+                return 0
+            now = time.time()
+            self._conn.executemany(
+                f"UPDATE review_jobs SET status = ?, error = ?, updated_at = ? "
+                f"WHERE id = ? AND status IN ({', '.join('?' for _ in ACTIVE_STATUSES)})",
+                [(INTERRUPTED, "서버가 다시 시작되어 작업이 중단되었습니다.", now, job_id, *ACTIVE_STATUSES)
+                 for job_id in orphaned],
+            )
+            self._conn.commit()
+            return len(orphaned)
+
+    def prune(self, max_age_seconds: float) -> int:
+        """오래된 작업과 파일 기록을 삭제합니다."""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM review_job_files WHERE job_id IN (SELECT id FROM review_jobs WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            cur = self._conn.execute("DELETE FROM review_jobs WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+            return cur.rowcount
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """같은 호스트에서 `pid` 프로세스가 살아 있는지 확인합니다. (권한이 없어 신호를 못 보내도 살아 있는 것으로 봅니다)"""
+    if not pid:
+        return False
+    if os.name == "nt":
+        # Windows의 os.kill은 프로세스를 종료시키므로 heartbeat로만 판단
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class JobManager:
+    """
+    리뷰 작업을 백그라운드 스레드에서 실행하는 프로세스 전역 작업 큐입니다.
+
+    - 작업은 Streamlit 스크립트 실행과 무관하게 끝까지 진행되며, 진행 상황은 `JobStore`에 기록됩니다.
+    - 같은 PR head(와 캐시 사용 여부)에 대해 진행 중인 작업이 있으면 새로 만들지 않고 그 작업 ID를 반환합니다.
+    - 스트리밍 중인 중간 텍스트는 저장하지 않고 메모리에만 두어, 같은 프로세스의 화면에서만 보여줍니다.
+    - 작업마다 `ReviewBudget`을 두어 `cancel`로 대기 중이거나 전송 중인 LLM 요청을 중단할 수 있습니다.
+    - 여러 프로세스가 같은 저장소를 쓸 수 있도록, 이 프로세스의 작업에 주기적으로 heartbeat를 남기고
+      heartbeat가 끊긴 다른 프로세스의 작업만 'interrupted'로 정리합니다.
+    """
+
+    def __init__(self, store: JobStore, github_token: str, max_concurrent_jobs: int = 2,
+                 heartbeat_seconds: float = 15.0):
+        self.store = store
+        self._github_token = github_token
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="review-job")
+        self._lock = threading.Lock()
+        # 작업 ID → {'streams': {파일 경로: 중간 리뷰}, 'summary': 중간 보고서, 'budget': ReviewBudget 또는 None}
+        self._live: dict[str, dict] = {}
+        self._heartbeat_seconds = heartbeat_seconds
+        threading.Thread(target=self._heartbeat_loop, name="review-job-heartbeat", daemon=True).start()
+
+    @property
+    def stale_seconds(self) -> float:
+        """heartbeat가 이보다 오래된 작업은 실행하던 프로세스가 사라진 것으로 봅니다. (heartbeat 주기의 4배)"""
+        return self._heartbeat_seconds * 4
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self._heartbeat_seconds)
+            try:
+                self.store.heartbeat()
+                self.store.interrupt_active(self.stale_seconds)
+            except Exception:
+                traceback.print_exc()
+
+    def submit(self, owner: str, repo: str, pr_number: int, use_cache: bool = True) -> tuple[str, bool]:
+        """
+        PR 리뷰 작업을 제출합니다.
+
+        Args:
+            owner (str): 저장소 소유자.
+            repo (str): 저장소 이름.
+            pr_number (int): Pull Request 번호.
+            use_cache (bool): 청크 리뷰 캐시 및 이전 PR 리뷰 결과 재사용 여부.
+
+        Returns:
+            tuple[str, bool]: (작업 ID, 진행 중인 같은 작업에 합쳐졌는지 여부).
+        """
+        from github_util import fetch_pr_head_sha
+
+        try:
+            head_sha = fetch_pr_head_sha(owner, repo, pr_number, self._github_token)
+        except Exception:
+            # head를 모르면 합치지 않고 새 작업으로 실행 (작업 안에서 다시 시도)
+            traceback.print_exc()
+            head_sha = None
+
+        with self._lock:
+            if head_sha is not None:
+                existing = self.store.find_active(owner, repo, pr_number, head_sha, use_cache)
+                if existing is not None:
+                    return existing, True
+            job_id = self.store.create(owner, repo, pr_number, head_sha, use_cache)
+            self._live[job_id] = {"streams": {}, "summary": None, "budget": None, "trace": None}
+        self._executor.submit(self._run, job_id, owner, repo, pr_number, use_cache)
+        return job_id, False
+
+    def get_job(self, job_id: str) -> Optional[dict]:
+        """
+        저장된 작업 정보에 메모리의 스트리밍 중간 결과('live')를 더해 반환합니다.
+
+        Returns:
+            Optional[dict]: `JobStore.get` 결과와 'live' ({'streams', 'summary', 'usage', 'timing', 'warnings'}). 없으면 None.
+                'timing'은 지금까지의 단계별 시간 분석(`Trace.breakdown`), 'warnings'는 지금까지 모은 경고입니다.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is not None:
+                budget, trace = live["budget"], live["trace"]
+                job["live"] = {
+                    "streams": dict(live["streams"]), "summary": live["summary"],
+                    "usage": budget.snapshot() if budget is not None else None,
+                    "timing": trace.breakdown() if trace is not None else None,
+                    "warnings": trace.warnings if trace is not None else [],
+                }
+            else:
+                job["live"] = None
+        return job
+
+    def find_active(self, owner: str, repo: str, pr_number: int) -> Optional[str]:
+        """같은 PR에 대해 진행 중인 작업 ID를 반환합니다."""
+        return self.store.find_active(owner, repo, pr_number)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        진행 중인 작업을 중단합니다. 대기 중인 리뷰는 건너뛰고 전송 중인 LLM 요청은 끊으며, 최종 보고서는 만들지 않습니다.
+        이미 끝난 리뷰 결과는 작업에 남습니다.
+
+        Returns:
+            bool: 중단을 요청했으면 True. 이 프로세스에서 진행 중인 작업이 아니면 False.
+        """
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is None:
+                return False
+            if live["budget"] is None:
+                # 아직 실행을 기다리는 작업: 시작할 때 바로 중단되도록 표시
+                live["budget"] = ReviewBudget()
+            budget = live["budget"]
+        budget.cancel()
+        return True
+
+    def _run(self, job_id: str, owner: str, repo: str, pr_number: int, use_cache: bool):
+        from review_pipeline import review_pull_request
+
+        with self._lock:
+            live = self._live[job_id]
+            if live["budget"] is None:
+                live["budget"] = ReviewBudget.from_config()
+            budget = live["budget"]
+            trace = live["trace"] = Trace("review", job_id=job_id, owner=owner, repo=repo, pr_number=pr_number)
+        if budget.cancelled:
+            self.store.finish(job_id, CANCELLED, None, {})
+            with self._lock:
+                self._live.pop(job_id, None)
+            return
+
+        self.store.set_status(job_id, RUNNING)
+        observer = _JobObserver(self, job_id, trace)
+        try:
+            report = review_pull_request(
+                owner, repo, pr_number, self._github_token,
+                use_cache=use_cache, session_id=f"job:{job_id}", observer=observer, budget=budget, trace=trace,
+            )
+        except Exception as e:
+            traceback.print_exc()
+            self.store.finish(job_id, FAILED, None, {}, error=f"{type(e).__name__}: {e}")
+        else:
+            meta = {
+                k: report[k] for k in (
+                    "head_sha", "previous_head", "reused", "file_count", "map_count", "reduce_count",
+                    "summary_timing", "skipped", "stop_reason", "usage", "triage", "compaction", "dedup",
+                    "elapsed", "trace", "warnings",
+                )
+            }
+            meta["stats"] = observer.stats()
+            if report["cancelled"]:
+                self.store.finish(job_id, CANCELLED, None, meta)
+            elif report["fetch_error"]:
+                self.store.finish(job_id, FAILED, None, meta, error=f"GitHub PR 정보를 가져오는 중 오류 발생: {report['fetch_error']}")
+            else:
+                self.store.finish(job_id, DONE, report["summary"], meta)
+        finally:
+            with self._lock:
+                self._live.pop(job_id, None)
+
+    def _update_live(self, job_id: str, streams: Optional[dict] = None, summary: Optional[str] = None):
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is None:
+                return
+            if streams:
+                live["streams"].update(streams)
+            if summary is not None:
+                live["summary"] = summary
+
+    def _drop_stream(self, job_id: str, filename: str):
+        with self._lock:
+            live = self._live.get(job_id)
+            if live is not None:
+                live["streams"].pop(filename, None)
+
+
+# 작업 정보의 'stats'에 담는 리뷰별 횟수 통계 (`Trace.counters`의 '{그룹}.{이름}')
+_RUN_STATS = {
+    "detection": ("local", "memo", "llm_fallback"),
+    "cache": ("hits", "misses"),
+    "scheduler": ("dispatched", "wait_total", "retries", "rate_limited"),
+}
+
+
+class _JobObserver:
+    """리뷰 파이프라인의 진행 상황을 작업 저장소와 메모리의 중간 결과에 기록합니다."""
+
+    def __init__(self, manager: JobManager, job_id: str, trace: Trace):
+        self._manager = manager
+        self._job_id = job_id
+        self._trace = trace
+        self._counters: Optional[dict] = None
+
+    def stats(self) -> dict:
+        """
+        파일 리뷰 단계의 언어 감지·리뷰 캐시·LLM 스케줄러 통계.
+        작업의 트레이스에 기록된 값이라 동시에 실행 중인 다른 작업의 값은 섞이지 않습니다.
+        """
+        counters = self._counters if self._counters is not None else self._trace.counters()
+        return {
+            group: {name: counters.get(f"{group}.{name}", 0) for name in names}
+            for group, names in _RUN_STATS.items()
+        }
+
+    def on_start(self, report: dict):
+        self._manager.store.set_status(self._job_id, RUNNING, head_sha=report["head_sha"])
+
+    def on_file_started(self, filename: str):
+        self._manager.store.set_file(self._job_id, filename, RUNNING)
+
+    def on_streaming(self, updates: dict[str, str]):
+        self._manager._update_live(self._job_id, streams=updates)
+
+    def on_file_done(self, result: dict):
+        self._manager.store.set_file(self._job_id, result["filename"], DONE, result)
+        self._manager._drop_stream(self._job_id, result["filename"])
+
+    def on_fetch_error(self, error: Exception):
+        pass
+
+    def on_reviews_done(self, report: dict):
+        self._counters = self._trace.counters()
+        self._manager.store.set_status(self._job_id, SUMMARIZING)
+
+    def on_summary_progress(self, text: str):
+        self._manager._update_live(self._job_id, summary=text)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """
+    프로세스 전역 작업 큐를 반환합니다.
+    처음 호출될 때 실행하던 프로세스가 사라진 작업을 정리합니다. (다른 프로세스가 실행 중인 작업은 그대로 둡니다)
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                from config import (
+                    GITHUB_TOKEN, JOB_STORE_PATH, JOB_MAX_CONCURRENT, JOB_RETENTION_DAYS, JOB_HEARTBEAT_SECONDS,
+                )
+                store = JobStore(JOB_STORE_PATH)
+                manager = JobManager(
+                    store, GITHUB_TOKEN, max_concurrent_jobs=JOB_MAX_CONCURRENT, heartbeat_seconds=JOB_HEARTBEAT_SECONDS,
+                )
+                store.interrupt_active(manager.stale_seconds)
+                store.prune(JOB_RETENTION_DAYS * 86400)
+                _manager = manager
+    return _manager
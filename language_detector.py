@@ -0,0 +1,252 @@
+import hashlib
+import os
+import re
+import threading
+from typing import Optional
+
+from telemetry import count
+
+# --- 확장자 / 파일명 기반 언어 매핑 ---
+# 값은 Azure AI Search 인덱스의 language 필드와 동일한 소문자 이름을 사용합니다.
+EXTENSION_MAP = {
+    ".py": "python", ".pyi": "python", ".pyw": "python",
+    ".js": "javascript", ".mjs": "javascript", ".cjs": "javascript", ".jsx": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".mts": "typescript", ".cts": "typescript",
+    ".java": "java",
+    ".kt": "kotlin", ".kts": "kotlin",
+    ".scala": "scala",
+    ".go": "go",
+    ".rs": "rust",
+    ".c": "c",
+    ".cc": "c++", ".cpp": "c++", ".cxx": "c++", ".hpp": "c++", ".hh": "c++", ".hxx": "c++",
+    ".cs": "c#",
+    ".rb": "ruby",
+    ".php": "php",
+    ".swift": "swift",
+    ".m": "objective-c", ".mm": "objective-c",
+    ".dart": "dart",
+    ".lua": "lua",
+    ".pl": "perl", ".pm": "perl",
+    ".r": "r",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell",
+    ".ps1": "powershell",
+    ".sql": "sql",
+    ".vue": "vue",
+    ".svelte": "svelte",
+    ".html": "html", ".htm": "html",
+    ".css": "css", ".scss": "css", ".sass": "css", ".less": "css",
+    # 코드 리뷰 대상이 아닌 문서/설정/데이터 파일
+    ".md": "text", ".rst": "text", ".txt": "text", ".adoc": "text",
+    ".json": "text", ".yaml": "text", ".yml": "text", ".toml": "text",
+    ".ini": "text", ".cfg": "text", ".conf": "text", ".env": "text",
+    ".csv": "text", ".tsv": "text", ".xml": "text", ".lock": "text",
+    ".svg": "text", ".log": "text",
+}
+
+FILENAME_MAP = {
+    "dockerfile": "dockerfile",
+    "makefile": "makefile",
+    "gnumakefile": "makefile",
+    "cmakelists.txt": "cmake",
+    "jenkinsfile": "groovy",
+    "rakefile": "ruby",
+    "gemfile": "text",
+    "license": "text",
+    "readme": "text",
+    "changelog": "text",
+    "codeowners": "text",
+    ".gitignore": "text",
+    ".gitattributes": "text",
+    ".dockerignore": "text",
+    ".editorconfig": "text",
+    "requirements.txt": "text",
+}
+
+# C/C++/Objective-C가 공유하는 헤더(.h)처럼 확장자만으로는 결정할 수 없는 경우
+AMBIGUOUS_EXTENSIONS = {".h"}
+
+SHEBANG_MAP = {
+    "python": "python", "python2": "python", "python3": "python",
+    "node": "javascript", "deno": "typescript", "ts-node": "typescript",
+    "bash": "shell", "sh": "shell", "zsh": "shell", "dash": "shell", "ksh": "shell",
+    "ruby": "ruby", "perl": "perl", "php": "php", "lua": "lua", "pwsh": "powershell",
+    "rscript": "r",
+}
+
+# 내용 기반 휴리스틱: (언어, 정규식) 목록. 여러 언어가 동시에 매칭되면 모호한 것으로 판단합니다.
+CONTENT_HEURISTICS = [
+    ("python", re.compile(r"^\s*(def \w+\(.*\)\s*(->.*)?:|from [\w.]+ import |import \w+$|class \w+(\(.*\))?:)", re.MULTILINE)),
+    ("javascript", re.compile(r"^\s*(const|let|var) \w+ = |require\(['\"]|module\.exports|=> \{", re.MULTILINE)),
+    ("java", re.compile(r"^\s*(public|private|protected) (static )?(final )?(class|interface|void|[\w<>\[\]]+ \w+\()|^package [\w.]+;", re.MULTILINE)),
+    ("go", re.compile(r"^package \w+$|^func (\(\w+ \*?\w+\) )?\w+\(|:= ", re.MULTILINE)),
+    ("rust", re.compile(r"^\s*(pub )?fn \w+|^\s*(use|mod) [\w:]+;|let mut ", re.MULTILINE)),
+    ("c++", re.compile(r"^\s*#include <(iostream|vector|string|memory|map)>|std::|template\s*<", re.MULTILINE)),
+    ("c", re.compile(r"^\s*#include <(stdio|stdlib|string|unistd)\.h>|\bmalloc\(|\bprintf\(", re.MULTILINE)),
+    ("objective-c", re.compile(r"^\s*@(interface|implementation|property)\b|#import ", re.MULTILINE)),
+]
+
+_DIFF_HEADER_RE = re.compile(r"^diff --git a/(.*?) b/(.*?)$", re.MULTILINE)
+_NEW_FILE_RE = re.compile(r"^\+\+\+ b/(.*?)$", re.MULTILINE)
+
+# --- 프로세스 단위 메모이제이션 및 통계 ---
+# 키: (파일 경로, diff 내용 해시). LLM 폴백 결과도 함께 저장하여 같은 내용을 다시 묻지 않습니다.
+_MEMO_MAX_SIZE = 4096
+_memo: dict[tuple, str] = {}
+_stats = {"local": 0, "memo": 0, "llm_fallback": 0}
+_lock = threading.Lock()
+
+
+def extract_filename_from_diff(diff_content: str) -> Optional[str]:
+    """
+    diff 헤더(`+++ b/`, `diff --git`)에서 파일 경로를 추출합니다.
+
+    Args:
+        diff_content (str): 단일 파일의 diff 텍스트.
+
+    Returns:
+        Optional[str]: 파일 경로. 헤더가 없으면 None을 반환합니다.
+    """
+    m = _NEW_FILE_RE.search(diff_content)
+    if m:
+        return m.group(1).strip()
+    m = _DIFF_HEADER_RE.search(diff_content)
+    if m:
+        return m.group(2).strip()
+    return None
+
+
+def _detect_by_filename(filename: str) -> Optional[str]:
+    """파일명/확장자로 언어를 판단합니다. 모호하거나 알 수 없는 확장자는 None을 반환합니다."""
+    base = os.path.basename(filename).lower()
+    if base in FILENAME_MAP:
+        return FILENAME_MAP[base]
+    if base.startswith("dockerfile"):
+        return "dockerfile"
+    _, ext = os.path.splitext(base)
+    if ext in AMBIGUOUS_EXTENSIONS:
+        return None
+    return EXTENSION_MAP.get(ext)
+
+
+def _detect_by_shebang(code_lines: list[str]) -> Optional[str]:
+    """첫 줄의 shebang(#!)으로 인터프리터 언어를 판단합니다."""
+    if not code_lines or not code_lines[0].startswith("#!"):
+        return None
+    parts = code_lines[0][2:].strip().split()
+    if not parts:
+        return None
+    interpreter = os.path.basename(parts[0])
+    # '/usr/bin/env python3' 형태 처리
+    if interpreter == "env" and len(parts) > 1:
+        interpreter = os.path.basename(parts[-1] if parts[1].startswith("-") else parts[1])
+    interpreter = re.sub(r"[\d.]+$", "", interpreter.lower()) or interpreter.lower()
+    return SHEBANG_MAP.get(interpreter) or SHEBANG_MAP.get(interpreter + "3")
+
+
+def _detect_by_content(clean_code: str) -> Optional[str]:
+    """내용 휴리스틱으로 언어를 판단합니다. 정확히 한 언어만 매칭될 때만 결과를 반환합니다."""
+    matched = [lang for lang, pattern in CONTENT_HEURISTICS if pattern.search(clean_code)]
+    # c++ 패턴은 c 패턴을 포함하는 경우가 많으므로 c++를 우선합니다.
+    if "c++" in matched and "c" in matched:
+        matched.remove("c")
+    return matched[0] if len(matched) == 1 else None
+
+
+def extract_code_lines(diff_content: str) -> list[str]:
+    """diff에서 추가(+)되거나 변경되지 않은( ) 코드 라인만 추출합니다."""
+    return [
+        line[1:] for line in diff_content.split('\n')
+        if len(line) > 1 and line[0] in ('+', ' ') and not line.startswith('+++')
+    ]
+
+
+def _memo_key(diff_content: str, filename: str) -> tuple:
+    return (filename, hashlib.sha1(diff_content.encode("utf-8", "replace")).hexdigest())
+
+
+def _remember(key: tuple, language: str):
+    with _lock:
+        if len(_memo) >= _MEMO_MAX_SIZE:
+            # 가장 오래된 항목부터 제거 (dict는 삽입 순서를 유지)
+            _memo.pop(next(iter(_memo)))
+        _memo[key] = language
+
+
+def detect_language(diff_content: str, filename: Optional[str] = None) -> Optional[str]:
+    """
+    LLM 호출 없이 로컬에서 diff의 프로그래밍 언어를 감지합니다.
+    파일명/확장자 → shebang → 내용 휴리스틱 순서로 판단하며, 결과는 프로세스 단위로 메모이즈됩니다.
+
+    Args:
+        diff_content (str): 단일 파일의 diff 텍스트.
+        filename (Optional[str]): 파일 경로. 없으면 diff 헤더에서 추출합니다.
+
+    Returns:
+        Optional[str]: 감지된 언어(소문자) 또는 'text'. 로컬 판단이 모호하면 None을 반환합니다.
+    """
+    filename = filename or extract_filename_from_diff(diff_content) or ""
+
+    # 확장자/파일명으로 결정되는 경우가 대부분이므로 해시 계산 전에 먼저 확인합니다.
+    by_name = _detect_by_filename(filename)
+    if by_name is not None:
+        with _lock:
+            _stats["local"] += 1
+        count("detection.local")
+        return by_name
+
+    key = _memo_key(diff_content, filename)
+    with _lock:
+        language = _memo.get(key)
+        if language is not None:
+            _stats["memo"] += 1
+    if language is not None:
+        count("detection.memo")
+        return language
+
+    code_lines = extract_code_lines(diff_content)
+    clean_code = "\n".join(code_lines)
+    if not clean_code.strip():
+        language = "text"
+    else:
+        language = _detect_by_shebang(code_lines) or _detect_by_content(clean_code)
+
+    if language is None:
+        # .h 등 확장자가 모호하거나 내용으로도 판단되지 않는 경우 → 호출 측에서 LLM 폴백
+        return None
+
+    with _lock:
+        _stats["local"] += 1
+    count("detection.local")
+    _remember(key, language)
+    return language
+
+
+def get_detection_stats() -> dict:
+    """
+    언어 감지 통계를 반환합니다.
+
+    Returns:
+        dict: 'local'(로컬 판단), 'memo'(메모 적중), 'llm_fallback'(LLM 폴백) 횟수와
+              'fallback_rate'(전체 대비 LLM 폴백 비율).
+    """
+    with _lock:
+        stats = dict(_stats)
+    total = stats["local"] + stats["memo"] + stats["llm_fallback"]
+    stats["fallback_rate"] = (stats["llm_fallback"] / total) if total else 0.0
+    return stats
+
+
+def record_llm_fallback(diff_content: str, filename: Optional[str], language: str):
+    """
+    LLM 폴백으로 감지한 언어를 기록하고 메모에 저장합니다.
+
+    Args:
+        diff_content (str): 단일 파일의 diff 텍스트.
+        filename (Optional[str]): 파일 경로.
+        language (str): LLM이 판단한 언어.
+    """
+    filename = filename or extract_filename_from_diff(diff_content) or ""
+    with _lock:
+        _stats["llm_fallback"] += 1
+    count("detection.llm_fallback")
+    _remember(_memo_key(diff_content, filename), language)
@@ -0,0 +1,693 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import email.utils
+import inspect
+import random
+import re
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+
+from telemetry import Trace, current_trace
+
+
+# 현재 스레드(작업)가 속한 리뷰 세션. 공정 큐잉의 단위로 사용됩니다.
+_current_session: contextvars.ContextVar[str] = contextvars.ContextVar("llm_session", default="default")
+# 현재 스레드(작업)의 요청을 한꺼번에 취소할 때 사용하는 표식. (`cancel_scope`, `LLMScheduler.cancel` 참고)
+_current_cancel_tag: contextvars.ContextVar[Optional[object]] = contextvars.ContextVar("llm_cancel_tag", default=None)
+
+# 재시도할 HTTP 상태 코드
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+@contextlib.contextmanager
+def session_scope(session_id: str):
+    """블록 안에서 보내는 LLM 요청을 지정한 세션의 큐로 보냅니다."""
+    token = _current_session.set(session_id)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def current_session() -> str:
+    """현재 스레드(작업)의 세션 ID를 반환합니다."""
+    return _current_session.get()
+
+
+def run_in_session(session_id: str, fn: Callable, *args, **kwargs):
+    """`session_scope` 안에서 함수를 실행합니다. 워커 스레드에 작업을 제출할 때 사용합니다."""
+    with session_scope(session_id):
+        return fn(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def cancel_scope(tag: object):
+    """
+    블록 안에서 보내는 LLM 요청에 취소 표식을 붙입니다. `LLMScheduler.cancel(tag)`로 대기 중이거나
+    전송 중인 요청을 한꺼번에 취소할 수 있습니다. (`tag`는 약한 참조가 가능한 객체여야 합니다.)
+    """
+    token = _current_cancel_tag.set(tag)
+    try:
+        yield
+    finally:
+        _current_cancel_tag.reset(token)
+
+
+class RequestCancelled(Exception):
+    """`LLMScheduler.cancel`로 요청이 취소되었을 때 발생합니다."""
+
+
+class TokenBucket:
+    """
+    분당 한도를 초 단위로 보충하는 토큰 버킷입니다. 스케줄러 이벤트 루프 스레드에서만 사용합니다.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self, amount: float):
+        # 한 번에 용량보다 많이 요구하면 영원히 기다리게 되므로 용량으로 제한
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def observe_remaining(self, remaining: float):
+        """서버가 알려준 남은 한도(x-ratelimit-remaining-*)가 더 작으면 그 값에 맞춥니다."""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class _Request:
+    __slots__ = ("session_id", "kwargs", "tokens", "future", "enqueued_at", "attempt", "on_delta", "streamed",
+                 "tag", "task", "timing", "trace", "endpoint")
+
+    def __init__(self, session_id: str, kwargs: dict, tokens: int, future: asyncio.Future,
+                 on_delta: Optional[Callable[[str], None]] = None, tag: Optional[object] = None,
+                 timing: Optional[dict] = None, trace: Optional[Trace] = None, endpoint: str = "chat"):
+        self.session_id = session_id
+        self.kwargs = kwargs
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.attempt = 0
+        # 스트리밍 요청이면 받은 텍스트 조각마다 호출할 콜백과, 이미 조각을 전달했는지 여부
+        self.on_delta = on_delta
+        self.streamed = False
+        # 취소 표식과, 전송 중일 때 실행 중인 태스크
+        self.tag = tag
+        self.task: Optional[asyncio.Task] = None
+        # 호출한 쪽에 알려 줄 대기 시간/재시도 횟수 ('queue_wait', 'retries')
+        self.timing = timing
+        # 요청을 보낸 리뷰의 트레이스. 리뷰별 스케줄러 통계('scheduler.*')를 기록합니다.
+        self.trace = trace
+        # 보낼 API ('chat' 또는 'embeddings')
+        self.endpoint = endpoint
+
+
+class _Lane:
+    """
+    배포(deployment) 하나의 큐와 한도 상태입니다. 배포마다 분당 한도가 따로 있으므로 버킷, 429 일시 정지,
+    서버가 알려준 남은 한도를 배포별로 관리하고, 전송 루프(`LLMScheduler._dispatch`)도 배포마다 따로 돕니다.
+    """
+    __slots__ = ("name", "queues", "round_robin", "request_bucket", "token_bucket", "paused_until", "wakeup",
+                 "token_waiter")
+
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.name = name
+        self.queues: dict[str, collections.deque] = {}
+        self.round_robin: collections.deque = collections.deque()
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self.wakeup = asyncio.Event()
+        # TPM 버킷을 기다리는 요청과 대기 태스크 (취소되면 기다리지 않고 바로 깨움)
+        self.token_waiter: Optional[tuple[_Request, asyncio.Task]] = None
+
+
+class LLMScheduler:
+    """
+    프로세스 전역 LLM 요청 스케줄러입니다.
+
+    - 백그라운드 스레드의 asyncio 이벤트 루프에서 비동기 OpenAI 클라이언트로 모든 요청을 보냅니다.
+    - 배포별 RPM/TPM 토큰 버킷으로 배포의 분당 요청/토큰 한도를 넘지 않도록 조절합니다.
+      (채팅 배포와 임베딩 배포는 한도가 따로이므로 버킷, 429 일시 정지, 응답 헤더의 남은 한도를 배포별로 관리)
+    - 429/5xx 응답은 `Retry-After`/`x-ratelimit-reset-*` 헤더를 따르거나 지터가 있는 지수 백오프로 재시도하며,
+      429를 받으면 해당 배포로 가는 모든 세션의 전송을 함께 멈춥니다.
+    - 세션별 큐를 라운드 로빈으로 꺼내 큰 PR 하나가 다른 사용자의 요청을 굶기지 않도록 합니다.
+    - `cancel_scope`로 표식을 붙인 요청은 `cancel(tag)`로 대기 중인 것은 버리고, 전송 중인 것(스트리밍 포함)은 중단합니다.
+    """
+
+    def __init__(self, client_factory: Callable, rpm: int, tpm: int, max_concurrency: int, max_retries: int,
+                 default_output_tokens: int = 1000, embedding_rpm: Optional[int] = None,
+                 embedding_tpm: Optional[int] = None):
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._rpm = rpm
+        self._tpm = tpm
+        # 임베딩 배포의 한도 (없으면 채팅 배포와 같은 값)
+        self._embedding_rpm = embedding_rpm or rpm
+        self._embedding_tpm = embedding_tpm or tpm
+        self._max_concurrency = max_concurrency
+        self._max_retries = max_retries
+        self._default_output_tokens = default_output_tokens
+
+        # 아래 상태는 이벤트 루프 스레드에서만 접근합니다.
+        # 배포별 큐와 한도 상태 (처음 요청이 들어올 때 생성)
+        self._lanes: dict[tuple[str, str], _Lane] = {}
+        # 전송 중인 요청과, 취소된 표식 (취소 이후 들어오는 요청도 바로 거절)
+        self._in_flight: set[_Request] = set()
+        self._cancelled_tags: "weakref.WeakSet" = weakref.WeakSet()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "retries": 0, "rate_limited": 0,
+            "in_flight": 0, "queued": 0, "wait_total": 0.0, "wait_max": 0.0, "dispatched": 0, "cancelled": 0,
+        }
+
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="llm-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    # --- 공개 API (임의의 스레드에서 호출) ---
+
+    def chat(self, estimated_prompt_tokens: int = 0, session_id: Optional[str] = None,
+             timing: Optional[dict] = None, **kwargs):
+        """
+        Chat Completions 요청을 스케줄러 큐에 넣고 응답을 기다립니다.
+
+        Args:
+            estimated_prompt_tokens (int): TPM 버킷에서 차감할 예상 입력 토큰 수.
+            session_id (Optional[str]): 공정 큐잉 단위. 없으면 현재 `session_scope`의 세션을 사용합니다.
+            timing (Optional[dict]): 주어지면 마지막 전송까지 기다린 시간('queue_wait', 초)과 재시도 횟수('retries')를 기록합니다.
+            **kwargs: `chat.completions.create`에 전달할 인자 (model, messages 등).
+
+        Returns:
+            ChatCompletion: 응답 객체.
+
+        Raises:
+            RequestCancelled: 요청이 `cancel`로 취소된 경우.
+        """
+        session_id = session_id or _current_session.get()
+        output_tokens = kwargs.get("max_tokens") or self._default_output_tokens
+        future = asyncio.run_coroutine_threadsafe(
+            self._submit(session_id, kwargs, estimated_prompt_tokens + output_tokens, tag=_current_cancel_tag.get(),
+                         timing=timing, trace=current_trace()),
+            self._loop,
+        )
+        return future.result()
+
+    def chat_stream(self, on_delta: Callable[[str], None], estimated_prompt_tokens: int = 0,
+                    session_id: Optional[str] = None, timing: Optional[dict] = None, **kwargs) -> str:
+        """
+        Chat Completions 요청을 스트리밍으로 보내고, 받은 텍스트 조각마다 `on_delta`를 호출합니다.
+
+        `on_delta`는 스케줄러 스레드에서 호출되므로 스레드 안전하고 가벼워야 합니다 (UI를 직접 갱신하지 말 것).
+        이미 조각을 전달한 뒤에 연결이 끊기면 중복 출력을 막기 위해 재시도하지 않고 예외를 발생시킵니다.
+
+        Args:
+            on_delta (Callable[[str], None]): 텍스트 조각을 받을 콜백.
+            estimated_prompt_tokens (int): TPM 버킷에서 차감할 예상 입력 토큰 수.
+            session_id (Optional[str]): 공정 큐잉 단위. 없으면 현재 `session_scope`의 세션을 사용합니다.
+            timing (Optional[dict]): `chat`과 같습니다.
+            **kwargs: `chat.completions.create`에 전달할 인자 (model, messages 등).
+
+        Returns:
+            str: 전체 응답 텍스트.
+
+        Raises:
+            RequestCancelled: 요청이 `cancel`로 취소된 경우 (스트리밍 도중이면 받은 조각까지만 전달된 상태).
+        """
+        session_id = session_id or _current_session.get()
+        output_tokens = kwargs.get("max_tokens") or self._default_output_tokens
+        future = asyncio.run_coroutine_threadsafe(
+            self._submit(session_id, kwargs, estimated_prompt_tokens + output_tokens, on_delta,
+                         tag=_current_cancel_tag.get(), timing=timing, trace=current_trace()),
+            self._loop,
+        )
+        return future.result()
+
+    def embed(self, estimated_prompt_tokens: int = 0, session_id: Optional[str] = None,
+              timing: Optional[dict] = None, **kwargs):
+        """
+        Embeddings 요청을 스케줄러 큐에 넣고 응답을 기다립니다. 채팅 요청과 같은 재시도, 취소를 따르며,
+        한도(RPM/TPM 버킷, 429 일시 정지)는 임베딩 배포의 것을 따로 사용합니다.
+
+        Args:
+            estimated_prompt_tokens (int): 임베딩 배포의 TPM 버킷에서 차감할 예상 입력 토큰 수.
+            session_id (Optional[str]): 공정 큐잉 단위. 없으면 현재 `session_scope`의 세션을 사용합니다.
+            timing (Optional[dict]): `chat`과 같습니다.
+            **kwargs: `embeddings.create`에 전달할 인자 (model, input).
+
+        Returns:
+            CreateEmbeddingResponse: 응답 객체.
+
+        Raises:
+            RequestCancelled: 요청이 `cancel`로 취소된 경우.
+        """
+        session_id = session_id or _current_session.get()
+        future = asyncio.run_coroutine_threadsafe(
+            self._submit(session_id, kwargs, estimated_prompt_tokens, tag=_current_cancel_tag.get(),
+                         timing=timing, trace=current_trace(), endpoint="embeddings"),
+            self._loop,
+        )
+        return future.result()
+
+    def cancel(self, tag: object):
+        """
+        `cancel_scope(tag)` 안에서 보낸 요청을 모두 취소합니다. (임의의 스레드에서 호출 가능)
+        대기 중인 요청은 큐에서 빼고, 전송 중인 요청은 연결을 끊으며, 이후 같은 표식으로 들어오는 요청도 바로 거절합니다.
+        취소된 요청을 기다리던 쪽에는 `RequestCancelled`가 발생합니다.
+        """
+        self._loop.call_soon_threadsafe(self._cancel_tag, tag)
+
+    def prewarm(self):
+        """
+        비동기 클라이언트를 호출한 스레드에서 미리 만듭니다. SDK 임포트와 클라이언트 생성이 첫 요청을 보낼 때
+        이벤트 루프를 막지 않도록, 앱 시작 시 백그라운드 스레드에서 호출합니다. (`config.prewarm_clients`)
+        """
+        self._get_client()
+
+    def get_stats(self) -> dict:
+        """
+        스케줄러 상태를 반환합니다.
+
+        Returns:
+            dict: 대기 중/처리 중 요청 수, 재시도·429 횟수, 평균/최대 대기 시간(초) 등.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["wait_avg"] = (stats["wait_total"] / stats["dispatched"]) if stats["dispatched"] else 0.0
+        paused_until = max((lane.paused_until for lane in list(self._lanes.values())), default=0.0)
+        stats["paused_for"] = max(0.0, paused_until - time.monotonic())
+        return stats
+
+    # --- 이벤트 루프 내부 ---
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def _update_stats(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def _update_request_stats(self, request: _Request, **deltas):
+        """전역 통계와 함께 요청을 보낸 리뷰의 트레이스에도 기록합니다."""
+        self._update_stats(**deltas)
+        if request.trace is not None:
+            for key, value in deltas.items():
+                request.trace.add_count(f"scheduler.{key}", value)
+
+    async def _submit(self, session_id: str, kwargs: dict, tokens: int, on_delta: Optional[Callable] = None,
+                      tag: Optional[object] = None, timing: Optional[dict] = None, trace: Optional[Trace] = None,
+                      endpoint: str = "chat"):
+        if tag is not None and tag in self._cancelled_tags:
+            self._update_stats(cancelled=1)
+            raise RequestCancelled()
+        future = self._loop.create_future()
+        self._enqueue(_Request(session_id, kwargs, tokens, future, on_delta, tag, timing, trace, endpoint))
+        self._update_stats(submitted=1)
+        return await future
+
+    def _cancel_tag(self, tag: object):
+        self._cancelled_tags.add(tag)
+        # 대기 중인 요청은 큐에서 제거
+        removed = 0
+        for lane in self._lanes.values():
+            for session_id, q in list(lane.queues.items()):
+                kept = collections.deque(r for r in q if r.tag is not tag)
+                for request in q:
+                    if request.tag is tag and not request.future.done():
+                        request.future.set_exception(RequestCancelled())
+                removed += len(q) - len(kept)
+                # 비어도 큐를 남겨 둠: 세션은 라운드 로빈에 남아 있으므로 `_next_request`가 함께 정리
+                # (여기서 지우면 다음 `_enqueue`가 세션을 라운드 로빈에 한 번 더 넣어 몫이 두 배가 됨)
+                lane.queues[session_id] = kept
+            # TPM 버킷을 기다리는 요청은 대기를 끊어 바로 취소
+            if lane.token_waiter is not None and lane.token_waiter[0].tag is tag:
+                lane.token_waiter[1].cancel()
+        if removed:
+            self._update_stats(queued=-removed, cancelled=removed)
+        # 전송 중인 요청은 태스크를 취소하여 연결을 끊음 (_execute에서 정리)
+        for request in list(self._in_flight):
+            if request.tag is tag and request.task is not None:
+                request.task.cancel()
+
+    def _is_cancelled(self, request: _Request) -> bool:
+        return request.tag is not None and request.tag in self._cancelled_tags
+
+    def _get_client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    def _lane(self, request: _Request) -> _Lane:
+        """요청이 가는 배포의 큐와 한도 상태. 없으면 만들고 그 배포의 전송 루프를 시작합니다."""
+        key = (request.endpoint, request.kwargs.get("model") or "")
+        lane = self._lanes.get(key)
+        if lane is None:
+            if request.endpoint == "embeddings":
+                lane = _Lane(key[1], self._embedding_rpm, self._embedding_tpm)
+            else:
+                lane = _Lane(key[1], self._rpm, self._tpm)
+            self._lanes[key] = lane
+            self._loop.create_task(self._dispatch(lane))
+        return lane
+
+    def _enqueue(self, request: _Request, front: bool = False):
+        lane = self._lane(request)
+        q = lane.queues.get(request.session_id)
+        if q is None:
+            q = lane.queues[request.session_id] = collections.deque()
+            lane.round_robin.append(request.session_id)
+        if front:
+            q.appendleft(request)
+        else:
+            q.append(request)
+        self._update_stats(queued=1)
+        lane.wakeup.set()
+
+    def _next_request(self, lane: _Lane) -> Optional[_Request]:
+        """배포의 세션들을 라운드 로빈으로 돌며 다음 요청을 꺼냅니다."""
+        while lane.round_robin:
+            session_id = lane.round_robin.popleft()
+            q = lane.queues.get(session_id)
+            if not q:
+                lane.queues.pop(session_id, None)
+                continue
+            request = q.popleft()
+            if q:
+                lane.round_robin.append(session_id)
+            else:
+                del lane.queues[session_id]
+            return request
+        return None
+
+    async def _dispatch(self, lane: _Lane):
+        while True:
+            if not lane.round_robin:
+                lane.wakeup.clear()
+                await lane.wakeup.wait()
+                continue
+            await self._slots.acquire()
+            # 429로 배포의 전송이 멈춘 경우 재개 시각까지 대기
+            delay = lane.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await lane.request_bucket.acquire(1)
+            request = self._next_request(lane)
+            if request is None:
+                lane.request_bucket.refund(1)
+                self._slots.release()
+                continue
+            acquired = await self._acquire_tokens(lane, request)
+            if not acquired or self._is_cancelled(request):
+                # 큐에서 꺼낸 뒤 TPM 버킷을 기다리는 동안 취소된 요청: 보내지 않았으므로 전송 통계에 넣지 않음
+                if acquired:
+                    lane.token_bucket.refund(request.tokens)
+                lane.request_bucket.refund(1)
+                self._update_stats(queued=-1, cancelled=1)
+                self._slots.release()
+                if not request.future.done():
+                    request.future.set_exception(RequestCancelled())
+                continue
+            waited = time.monotonic() - request.enqueued_at
+            with self._stats_lock:
+                self._stats["queued"] -= 1
+                self._stats["in_flight"] += 1
+                self._stats["dispatched"] += 1
+                self._stats["wait_total"] += waited
+                self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+            if request.trace is not None:
+                request.trace.add_count("scheduler.dispatched")
+                request.trace.add_count("scheduler.wait_total", waited)
+            if request.timing is not None:
+                request.timing["queue_wait"] = waited
+                request.timing["retries"] = request.attempt
+            self._in_flight.add(request)
+            request.task = self._loop.create_task(self._execute(lane, request))
+
+    async def _acquire_tokens(self, lane: _Lane, request: _Request) -> bool:
+        """
+        배포의 TPM 버킷에서 요청의 토큰을 가져옵니다.
+
+        Returns:
+            bool: 가져왔으면 True. 기다리는 동안 요청이 취소되어(`_cancel_tag`) 가져오지 않았으면 False.
+        """
+        if self._is_cancelled(request):
+            return False
+        waiter = self._loop.create_task(lane.token_bucket.acquire(request.tokens))
+        lane.token_waiter = (request, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                raise
+            return False
+        finally:
+            lane.token_waiter = None
+        return True
+
+    async def _execute(self, lane: _Lane, request: _Request):
+        retry_delay = None
+        try:
+            client = self._client or self._get_client()
+            if request.endpoint == "embeddings":
+                raw = await client.embeddings.with_raw_response.create(**request.kwargs)
+                self._observe_headers(lane, raw.headers)
+                response = await _parse_raw(raw)
+            elif request.on_delta is None:
+                raw = await client.chat.completions.with_raw_response.create(**request.kwargs)
+                self._observe_headers(lane, raw.headers)
+                response = await _parse_raw(raw)
+            else:
+                raw = await client.chat.completions.with_raw_response.create(stream=True, **request.kwargs)
+                self._observe_headers(lane, raw.headers)
+                response = await self._consume_stream(request, await _parse_raw(raw))
+        except asyncio.CancelledError:
+            self._fail(request, RequestCancelled(), cancelled=True)
+            return
+        except _api_errors() as e:
+            status = getattr(e, "status_code", None)
+            retryable = (status is None or status in RETRYABLE_STATUS_CODES) and not request.streamed
+            if retryable and request.attempt < self._max_retries:
+                request.attempt += 1
+                response_obj = getattr(e, "response", None)
+                retry_delay = _retry_delay(response_obj.headers if response_obj is not None else {}, request.attempt)
+                if status == 429:
+                    # 배포 한도는 모든 세션이 공유하므로 그 배포로 가는 전송을 모두 멈춤 (다른 배포는 계속)
+                    self._update_request_stats(request, rate_limited=1)
+                    lane.paused_until = max(lane.paused_until, time.monotonic() + retry_delay)
+                    lane.token_bucket.observe_remaining(0)
+            else:
+                self._fail(request, e)
+                return
+        except Exception as e:
+            self._fail(request, e)
+            return
+
+        self._in_flight.discard(request)
+        self._update_stats(in_flight=-1)
+        self._slots.release()
+        if retry_delay is not None:
+            # 슬롯을 반납한 채로 기다린 뒤, 같은 세션 큐의 맨 앞에 다시 넣음
+            self._update_request_stats(request, retries=1)
+            await asyncio.sleep(retry_delay)
+            if request.tag is not None and request.tag in self._cancelled_tags:
+                self._update_stats(cancelled=1)
+                if not request.future.done():
+                    request.future.set_exception(RequestCancelled())
+                return
+            self._enqueue(request, front=True)
+            return
+
+        # 실제 사용량으로 TPM 버킷 보정
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            lane.token_bucket.refund(max(0, request.tokens - usage.total_tokens))
+        self._update_stats(completed=1)
+        if not request.future.done():
+            request.future.set_result(response)
+
+    async def _consume_stream(self, request: _Request, stream) -> str:
+        """스트리밍 응답을 읽으며 텍스트 조각을 콜백으로 전달하고, 전체 텍스트를 반환합니다."""
+        parts = []
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    request.streamed = True
+                    try:
+                        request.on_delta(delta)
+                    except Exception:
+                        # 표시용 콜백 오류로 응답 전체를 버리지 않음
+                        pass
+        except asyncio.CancelledError:
+            # 취소되면 연결을 바로 닫아 서버가 남은 토큰을 생성하지 않도록 함
+            close = getattr(stream, "close", None)
+            if close is not None:
+                with contextlib.suppress(Exception):
+                    await close()
+            raise
+        return "".join(parts)
+
+    def _fail(self, request: _Request, error: Exception, cancelled: bool = False):
+        self._in_flight.discard(request)
+        if cancelled:
+            self._update_stats(in_flight=-1, cancelled=1)
+        else:
+            self._update_stats(in_flight=-1, failed=1)
+        self._slots.release()
+        if not request.future.done():
+            request.future.set_exception(error)
+
+    def _observe_headers(self, lane: _Lane, headers):
+        """응답 헤더의 남은 한도를 응답을 보낸 배포의 버킷에만 반영합니다."""
+        remaining_requests = _to_float(headers.get("x-ratelimit-remaining-requests"))
+        if remaining_requests is not None:
+            lane.request_bucket.observe_remaining(remaining_requests)
+        remaining_tokens = _to_float(headers.get("x-ratelimit-remaining-tokens"))
+        if remaining_tokens is not None:
+            lane.token_bucket.observe_remaining(remaining_tokens)
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """'1s', '6m0s', '20ms' 형식의 기간을 초로 변환합니다."""
+    parts = _DURATION_RE.findall(value or "")
+    if not parts:
+        return _to_float(value)
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def _api_errors() -> tuple:
+    """재시도 여부를 판단할 SDK 예외 클래스. openai 임포트는 무거우므로 처음 실패한 요청에서 가져옵니다."""
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+    return APIStatusError, APIConnectionError, APITimeoutError
+
+
+async def _parse_raw(raw):
+    """
+    원시 응답을 파싱합니다. `with_raw_response`는 SDK 버전에 따라 `parse()`가 동기(LegacyAPIResponse)이거나
+    코루틴(AsyncAPIResponse)이므로 둘 다 처리합니다.
+    """
+    parsed = raw.parse()
+    if inspect.isawaitable(parsed):
+        parsed = await parsed
+    return parsed
+
+
+def _retry_delay(headers, attempt: int) -> float:
+    """
+    재시도 대기 시간을 계산합니다.
+    서버가 알려준 값(retry-after-ms, retry-after, x-ratelimit-reset-*)이 있으면 그 값에 작은 지터를 더하고,
+    없으면 full jitter 지수 백오프를 사용합니다.
+    """
+    server_delay = None
+    if headers:
+        ms = _to_float(headers.get("retry-after-ms"))
+        if ms is not None:
+            server_delay = ms / 1000.0
+        elif headers.get("retry-after"):
+            value = headers.get("retry-after")
+            server_delay = _to_float(value)
+            if server_delay is None:
+                parsed = email.utils.parsedate_to_datetime(value) if value else None
+                if parsed is not None:
+                    server_delay = max(0.0, parsed.timestamp() - time.time())
+        else:
+            resets = [
+                _parse_duration(headers.get(name))
+                for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+                if headers.get(name)
+            ]
+            resets = [r for r in resets if r is not None]
+            if resets:
+                server_delay = max(resets)
+    if server_delay is not None:
+        server_delay = min(server_delay, BACKOFF_MAX_SECONDS)
+        # 여러 요청이 같은 시각에 한꺼번에 재시도하지 않도록 약간의 지터를 더함
+        return server_delay + random.uniform(0, 0.25 * max(server_delay, 1.0))
+    cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+_scheduler: Optional[LLMScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """프로세스 전역 LLM 스케줄러를 반환합니다. 처음 호출될 때 생성됩니다."""
+    if _scheduler is None:
+        init_scheduler()
+    return _scheduler
+
+
+def init_scheduler(rate_share: float = 1.0) -> LLMScheduler:
+    """
+    프로세스 전역 LLM 스케줄러를 생성합니다. 이미 있으면 기존 스케줄러를 반환합니다.
+
+    Args:
+        rate_share (float): 이 프로세스가 사용할 RPM/TPM 한도(채팅·임베딩 배포 모두)의 비율.
+            여러 프로세스가 같은 배포를 나눠 쓰는 경우(예: 1/프로세스 수) 지정합니다.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from config import (
+                create_async_llm, AZ_OPENAI_RPM, AZ_OPENAI_TPM, AZ_OPENAI_EMBEDDING_RPM, AZ_OPENAI_EMBEDDING_TPM,
+                LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES,
+            )
+            _scheduler = LLMScheduler(
+                client_factory=create_async_llm,
+                rpm=max(1, int(AZ_OPENAI_RPM * rate_share)),
+                tpm=max(1, int(AZ_OPENAI_TPM * rate_share)),
+                max_concurrency=LLM_MAX_CONCURRENCY,
+                max_retries=LLM_MAX_RETRIES,
+                embedding_rpm=max(1, int(AZ_OPENAI_EMBEDDING_RPM * rate_share)),
+                embedding_tpm=max(1, int(AZ_OPENAI_EMBEDDING_TPM * rate_share)),
+            )
+    return _scheduler
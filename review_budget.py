@@ -0,0 +1,250 @@
+import contextlib
+import contextvars
+import fnmatch
+import threading
+import time
+from typing import Callable, Optional
+
+# 파일 리뷰에 쓰지 않고 최종 보고서용으로 남겨 두는 토큰/비용/시간 예산의 비율
+SUMMARY_RESERVE_SHARE = 0.2
+
+# 리뷰를 멈춘 사유 (파일 리뷰 단계)
+STOP_CANCELLED = "cancelled"
+STOP_DEADLINE = "deadline"
+STOP_BUDGET = "budget"
+
+STOP_REASON_LABELS = {
+    STOP_CANCELLED: "사용자가 리뷰를 중단함",
+    STOP_DEADLINE: "시간 제한 초과",
+    STOP_BUDGET: "토큰/비용 예산 소진",
+}
+
+# 예산이 부족할 때 먼저 리뷰할 파일을 고르는 경로 패턴 (앞에 있을수록 우선순위가 높음)
+HIGH_PRIORITY_PATTERNS = ("*auth*", "*security*", "*crypt*", "*password*", "*token*", "*permission*", "*secret*")
+LOW_PRIORITY_PATTERNS = (
+    "test/*", "tests/*", "*/test/*", "*/tests/*", "*_test.*", "test_*", "*/test_*", "*.test.*", "*.spec.*",
+    "docs/*", "*/docs/*", "examples/*", "*/examples/*", "*.md", "*.rst",
+    "*.lock", "*-lock.json", "*.min.js", "*.snap", "vendor/*", "*/vendor/*", "third_party/*",
+    "*/migrations/*", "*_pb2.py", "*.generated.*",
+)
+
+_current_budget: contextvars.ContextVar[Optional["ReviewBudget"]] = contextvars.ContextVar("review_budget", default=None)
+
+
+@contextlib.contextmanager
+def budget_scope(budget: Optional["ReviewBudget"]):
+    """블록 안에서 보내는 LLM 요청의 토큰 사용량을 지정한 예산에 기록합니다."""
+    token = _current_budget.set(budget)
+    try:
+        yield
+    finally:
+        _current_budget.reset(token)
+
+
+def current_budget() -> Optional["ReviewBudget"]:
+    """현재 스레드(작업)의 리뷰 예산을 반환합니다. 없으면 None."""
+    return _current_budget.get()
+
+
+class ReviewBudget:
+    """
+    PR 리뷰 하나의 취소 상태, 시간 제한, 토큰/비용 예산을 관리합니다. (모든 메서드는 스레드 안전)
+
+    - 파일 리뷰는 전체 예산에서 최종 보고서 몫(`SUMMARY_RESERVE_SHARE`)을 뺀 만큼만 사용합니다.
+      리뷰 단위는 시작 전에 예상 사용량을 예약하고(`try_reserve`), 예약할 수 없으면 건너뜁니다.
+      실제 사용량은 LLM 응답마다 `charge`로 기록합니다. 동시에 실행 중인 요청 때문에 약간 넘을 수 있습니다.
+    - 시간 제한도 같은 비율을 남겨 두고, 파일 리뷰 몫이 지나면 리뷰 단계를 멈춥니다(`stop`).
+      멈춘 뒤에도 이미 끝난 결과로 부분 보고서를 만들 수 있습니다.
+    - `cancel`은 최종 보고서까지 모두 멈춥니다.
+
+    값이 0 이하인 한도는 사용하지 않습니다.
+    """
+
+    def __init__(self, max_tokens: int = 0, max_cost: float = 0.0, deadline_seconds: float = 0.0,
+                 input_cost_per_1k: float = 0.0, output_cost_per_1k: float = 0.0):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.deadline_seconds = deadline_seconds
+        self.input_cost_per_1k = input_cost_per_1k
+        self.output_cost_per_1k = output_cost_per_1k
+        self.started_at = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._reserved_prompt = 0
+        self._reserved_completion = 0
+        self._stop_reason: Optional[str] = None
+        self._cancelled = False
+        self._listeners: list[Callable[[str], None]] = []
+
+        self._timer = None
+        if deadline_seconds > 0:
+            # 파일 리뷰 몫의 시간이 지나면 리뷰 단계를 멈춤
+            self._timer = threading.Timer(deadline_seconds * (1 - SUMMARY_RESERVE_SHARE), self.stop, (STOP_DEADLINE,))
+            self._timer.daemon = True
+            self._timer.start()
+
+    @classmethod
+    def from_config(cls) -> "ReviewBudget":
+        """환경 변수 설정(`REVIEW_MAX_TOKENS`, `REVIEW_MAX_COST`, `REVIEW_DEADLINE_SECONDS` 등)으로 예산을 만듭니다."""
+        from config import (
+            AZ_OPENAI_INPUT_COST_PER_1K, AZ_OPENAI_OUTPUT_COST_PER_1K,
+            REVIEW_DEADLINE_SECONDS, REVIEW_MAX_COST, REVIEW_MAX_TOKENS,
+        )
+        return cls(
+            max_tokens=REVIEW_MAX_TOKENS, max_cost=REVIEW_MAX_COST, deadline_seconds=REVIEW_DEADLINE_SECONDS,
+            input_cost_per_1k=AZ_OPENAI_INPUT_COST_PER_1K, output_cost_per_1k=AZ_OPENAI_OUTPUT_COST_PER_1K,
+        )
+
+    @property
+    def limited(self) -> bool:
+        """토큰 또는 비용 한도가 설정되어 있는지 여부."""
+        return self.max_tokens > 0 or (self.max_cost > 0 and self._has_prices())
+
+    @property
+    def stop_reason(self) -> Optional[str]:
+        """파일 리뷰 단계를 멈춘 사유 (`STOP_*`), 멈추지 않았으면 None."""
+        with self._lock:
+            return self._stop_reason
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_reason is not None
+
+    @property
+    def cancelled(self) -> bool:
+        """사용자가 리뷰 전체를 중단했는지 여부."""
+        with self._lock:
+            return self._cancelled
+
+    def add_stop_listener(self, listener: Callable[[str], None]):
+        """
+        리뷰 단계가 멈출 때 호출할 콜백을 등록합니다. 이미 멈춘 상태이면 바로 호출합니다.
+        콜백은 멈춘 사유(`STOP_*`)를 받으며, 타이머 스레드 등 임의의 스레드에서 호출될 수 있습니다.
+        """
+        with self._lock:
+            reason = self._stop_reason
+            if reason is None:
+                self._listeners.append(listener)
+        if reason is not None:
+            listener(reason)
+
+    def remove_stop_listener(self, listener: Callable[[str], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def stop(self, reason: str):
+        """파일 리뷰 단계를 멈춥니다. 대기 중인 리뷰는 건너뛰고 전송 중인 리뷰는 중단됩니다."""
+        with self._lock:
+            if self._stop_reason is not None:
+                return
+            self._stop_reason = reason
+            listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener(reason)
+
+    def cancel(self):
+        """리뷰 전체(최종 보고서 포함)를 중단합니다."""
+        with self._lock:
+            self._cancelled = True
+        self.stop(STOP_CANCELLED)
+        self.close()
+
+    def close(self):
+        """시간 제한 타이머를 정리합니다. 리뷰 단계가 끝나면 호출합니다."""
+        if self._timer is not None:
+            self._timer.cancel()
+
+    def try_reserve(self, prompt_tokens: int, completion_tokens: int) -> bool:
+        """
+        리뷰 단위 하나의 예상 사용량을 파일 리뷰 몫에서 예약합니다.
+
+        Returns:
+            bool: 예약했으면 True. 리뷰 단계가 멈췄거나 예산이 부족하면 False.
+        """
+        with self._lock:
+            if self._stop_reason is not None:
+                return False
+            prompt = self._prompt_tokens + self._reserved_prompt + prompt_tokens
+            completion = self._completion_tokens + self._reserved_completion + completion_tokens
+            if not self._fits(prompt, completion, 1 - SUMMARY_RESERVE_SHARE):
+                return False
+            self._reserved_prompt += prompt_tokens
+            self._reserved_completion += completion_tokens
+            return True
+
+    def release(self, prompt_tokens: int, completion_tokens: int):
+        """`try_reserve`로 예약한 사용량을 반납합니다. (실제 사용량은 `charge`로 따로 기록)"""
+        with self._lock:
+            self._reserved_prompt = max(0, self._reserved_prompt - prompt_tokens)
+            self._reserved_completion = max(0, self._reserved_completion - completion_tokens)
+
+    def charge(self, prompt_tokens: int, completion_tokens: int):
+        """LLM 요청 하나의 실제 사용량을 기록합니다."""
+        with self._lock:
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+
+    def snapshot(self) -> dict:
+        """
+        지금까지의 사용량을 반환합니다.
+
+        Returns:
+            dict: 'prompt_tokens', 'completion_tokens', 'total_tokens', 'cost', 'elapsed', 'stop_reason',
+                  'cancelled', 'max_tokens', 'max_cost', 'deadline_seconds'.
+        """
+        with self._lock:
+            prompt, completion = self._prompt_tokens, self._completion_tokens
+            stop_reason, cancelled = self._stop_reason, self._cancelled
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "cost": self._cost(prompt, completion),
+            "elapsed": time.monotonic() - self.started_at,
+            "stop_reason": stop_reason,
+            "cancelled": cancelled,
+            "max_tokens": self.max_tokens,
+            "max_cost": self.max_cost,
+            "deadline_seconds": self.deadline_seconds,
+        }
+
+    def _has_prices(self) -> bool:
+        return self.input_cost_per_1k > 0 or self.output_cost_per_1k > 0
+
+    def _cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        return token_cost(prompt_tokens, completion_tokens, self.input_cost_per_1k, self.output_cost_per_1k)
+
+    def _fits(self, prompt_tokens: int, completion_tokens: int, share: float) -> bool:
+        # self._lock 보유 상태에서 호출
+        if self.max_tokens > 0 and prompt_tokens + completion_tokens > self.max_tokens * share:
+            return False
+        if self.max_cost > 0 and self._has_prices() and self._cost(prompt_tokens, completion_tokens) > self.max_cost * share:
+            return False
+        return True
+
+
+def token_cost(prompt_tokens: int, completion_tokens: int, input_cost_per_1k: float, output_cost_per_1k: float) -> float:
+    """1K 토큰당 단가로 예상 비용을 계산합니다."""
+    return (prompt_tokens * input_cost_per_1k + completion_tokens * output_cost_per_1k) / 1000
+
+
+def file_priority(filename: str) -> int:
+    """
+    예산이 부족할 때 먼저 리뷰할 파일을 고르기 위한 우선순위를 반환합니다. 클수록 먼저 리뷰합니다.
+    보안 관련 경로가 가장 높고, 테스트·문서·생성/벤더 파일이 가장 낮습니다.
+
+    Args:
+        filename (str): 파일 경로.
+
+    Returns:
+        int: 0(낮음) ~ 2(높음).
+    """
+    path = filename.lower()
+    if any(fnmatch.fnmatch(path, pattern) for pattern in LOW_PRIORITY_PATTERNS):
+        return 0
+    if any(fnmatch.fnmatch(path, pattern) for pattern in HIGH_PRIORITY_PATTERNS):
+        return 2
+    return 1
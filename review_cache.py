@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from telemetry import count
+
+
+def make_review_key(chunk: str, language: str, conventions: str, prompt_version: str, engine: str) -> str:
+    """
+    리뷰 캐시 키를 생성합니다. 청크 내용, 언어, 컨벤션, 프롬프트 버전, 모델 중 하나라도 바뀌면 키가 달라집니다.
+
+    Args:
+        chunk (str): 리뷰 대상 diff 청크.
+        language (str): 프로그래밍 언어.
+        conventions (str): 프롬프트에 포함되는 코딩 컨벤션 텍스트.
+        prompt_version (str): 프롬프트 템플릿 버전.
+        engine (str): Azure OpenAI 배포(모델) 이름.
+
+    Returns:
+        str: SHA-256 16진수 문자열.
+    """
+    conventions_digest = hashlib.sha256(conventions.encode("utf-8")).hexdigest()
+    # 'index <base>..<head>' 라인은 rebase 등으로 내용과 무관하게 바뀌므로 키에서 제외합니다.
+    normalized_chunk = "\n".join(line for line in chunk.split("\n") if not line.startswith("index "))
+    h = hashlib.sha256()
+    for part in (prompt_version, engine, language, conventions_digest, normalized_chunk):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """여러 스레드/프로세스에서 공유할 SQLite 연결을 엽니다."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class ReviewCache:
+    """
+    청크 리뷰 결과를 저장하는 SQLite 기반 내용 주소(content-addressed) 캐시입니다.
+    여러 스레드와 프로세스에서 동시에 사용할 수 있으며, 오래되었거나 용량을 넘은 항목은 자동으로 제거됩니다.
+    """
+
+    # put이 이 횟수만큼 호출될 때마다 만료/용량 정리를 수행합니다.
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 20000, max_age_seconds: float = 14 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._puts_since_evict = 0
+
+        self._conn = connect_sqlite(path)
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_reviews (
+                    key TEXT PRIMARY KEY,
+                    review TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_reviews_last_used ON chunk_reviews(last_used_at)")
+            self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        캐시된 리뷰를 반환합니다.
+
+        Args:
+            key (str): `make_review_key`로 생성한 키.
+
+        Returns:
+            Optional[str]: 캐시된 리뷰 텍스트. 없거나 만료되었으면 None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT review, created_at FROM chunk_reviews WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self._misses += 1
+                count("cache.misses")
+                return None
+            self._conn.execute("UPDATE chunk_reviews SET last_used_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._hits += 1
+            count("cache.hits")
+            return row[0]
+
+    def put(self, key: str, review: str):
+        """
+        리뷰를 캐시에 저장합니다.
+
+        Args:
+            key (str): `make_review_key`로 생성한 키.
+            review (str): 리뷰 텍스트.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_reviews (key, review, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, review, now, now),
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= self.EVICT_EVERY
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        만료된 항목과 `max_entries`를 넘는 가장 오래 사용되지 않은 항목을 제거합니다.
+
+        Returns:
+            int: 제거된 항목 수.
+        """
+        with self._lock:
+            self._puts_since_evict = 0
+            cur = self._conn.execute(
+                "DELETE FROM chunk_reviews WHERE created_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            removed = cur.rowcount
+            cur = self._conn.execute(
+                """
+                DELETE FROM chunk_reviews WHERE key IN (
+                    SELECT key FROM chunk_reviews ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            removed += cur.rowcount
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> dict:
+        """
+        이 프로세스에서의 캐시 적중 통계를 반환합니다.
+
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate'.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": (self._hits / total) if total else 0.0,
+            }
+
+
+class PRReviewStore:
+    """
+    PR별로 마지막으로 리뷰한 head SHA와 파일별 결과(blob SHA 포함)를 저장합니다.
+    재실행 시 blob SHA가 바뀌지 않은 파일은 이전 결과를 그대로 재사용하는 데 사용됩니다.
+    `ReviewCache`와 같이 오래되었거나 용량을 넘은 PR 상태는 자동으로 제거됩니다.
+    """
+
+    # save가 이 횟수만큼 호출될 때마다 만료/용량 정리를 수행합니다.
+    EVICT_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 20000, max_age_seconds: float = 14 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._saves_since_evict = 0
+        self._conn = connect_sqlite(path)
+        with self._lock:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pr_reviews (
+                    pr_key TEXT PRIMARY KEY,
+                    head_sha TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    files_json TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pr_reviews_updated ON pr_reviews(updated_at)")
+            self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def _pr_key(owner: str, repo: str, pr_number: int) -> str:
+        return f"{owner.lower()}/{repo.lower()}#{pr_number}"
+
+    def load(self, owner: str, repo: str, pr_number: int, version: str) -> Optional[dict]:
+        """
+        마지막으로 저장된 PR 리뷰 상태를 불러옵니다.
+
+        Args:
+            owner (str): 저장소 소유자.
+            repo (str): 저장소 이름.
+            pr_number (int): Pull Request 번호.
+            version (str): 프롬프트 버전/모델 등 결과 호환성을 나타내는 문자열. 다르면 무시합니다.
+
+        Returns:
+            Optional[dict]: {'head_sha', 'files': {파일 경로: {'sha', 'result'}}} 또는 None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT head_sha, version, files_json, updated_at FROM pr_reviews WHERE pr_key = ?",
+                (self._pr_key(owner, repo, pr_number),),
+            ).fetchone()
+        if row is None or row[1] != version:
+            return None
+        if time.time() - row[3] > self.max_age_seconds:
+            return None
+        return {"head_sha": row[0], "files": json.loads(row[2])}
+
+    def save(self, owner: str, repo: str, pr_number: int, head_sha: str, version: str, files: dict):
+        """
+        PR 리뷰 상태를 저장합니다.
+
+        Args:
+            owner (str): 저장소 소유자.
+            repo (str): 저장소 이름.
+            pr_number (int): Pull Request 번호.
+            head_sha (str): 리뷰한 head 커밋 SHA.
+            version (str): 프롬프트 버전/모델 등 결과 호환성을 나타내는 문자열.
+            files (dict): 파일 경로 → {'sha', 'result'} 딕셔너리.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pr_reviews (pr_key, head_sha, version, files_json, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self._pr_key(owner, repo, pr_number), head_sha, version, json.dumps(files, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+            self._saves_since_evict += 1
+            should_evict = self._saves_since_evict >= self.EVICT_EVERY
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        만료된 PR 상태와 `max_entries`를 넘는 가장 오래 갱신되지 않은 PR 상태를 제거합니다.
+
+        Returns:
+            int: 제거된 항목 수.
+        """
+        with self._lock:
+            self._saves_since_evict = 0
+            cur = self._conn.execute(
+                "DELETE FROM pr_reviews WHERE updated_at < ?", (time.time() - self.max_age_seconds,)
+            )
+            removed = cur.rowcount
+            cur = self._conn.execute(
+                """
+                DELETE FROM pr_reviews WHERE pr_key IN (
+                    SELECT pr_key FROM pr_reviews ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            removed += cur.rowcount
+            self._conn.commit()
+            return removed
@@ -0,0 +1,612 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterator, Optional
+
+from config import (
+    REVIEW_DEDUP_ENABLED, REVIEW_DEDUP_MIN_TOKENS, REVIEW_DEDUP_THRESHOLD, REVIEW_PACK_FILE_MAX_TOKENS,
+    REVIEW_PACK_MAX_FILES, SUMMARY_BATCH_MAX_TOKENS,
+)
+from chunk_planner import ESTIMATED_OUTPUT_TOKENS_PER_FILE, FilePacker, ReviewUnit, count_tokens
+from diff_compactor import CompactedDiff
+from diff_parser import FileDiff
+from file_triage import GitAttributes
+from hunk_dedup import DedupIndex, fingerprint_diff
+from llm_scheduler import RequestCancelled, cancel_scope, get_scheduler, run_in_session
+from review_budget import STOP_BUDGET, STOP_CANCELLED, ReviewBudget, budget_scope, file_priority
+from task_pool import PriorityThreadPool
+from telemetry import current_trace, trace_scope
+from review_generator import (
+    CONVENTIONS_TOKEN_RESERVE, assemble_file_result, compacted_file_result, format_partial_section, format_review_section,
+    generate_final_summary, get_chunk_token_budget, get_summary_token_budget, plan_file_units, prepare_file_review,
+    review_unit, shared_chunk_review, skipped_chunk_review, summarize_partial,
+)
+
+
+class ReviewRun:
+    """
+    PR 하나의 파일 리뷰를 계획·실행·조립합니다. (UI와 무관)
+
+    - 큰 파일은 토큰 예산에 맞춘 여러 리뷰 단위로 나누어 제출합니다.
+    - 같은 언어의 작은 파일은 묶어서 하나의 다중 파일 요청으로 제출합니다.
+    - 여러 파일에 같은 수정을 적용한 변경(이름·경로만 다른 변경 포함, `hunk_dedup`)은 처음 본 파일만 리뷰하고,
+      그 결과를 나머지 파일에 대표 파일을 가리키는 안내와 함께 나눠 줍니다.
+    - 리뷰 단위가 모두 끝난 파일은 청크 순서대로 조립되어 완료 큐에 들어갑니다.
+    - executor가 `PriorityThreadPool`이면 예상 토큰이 큰 단위부터 실행되도록(LPT) 우선순위를 줍니다.
+
+    작업은 워커 스레드에서 실행되므로, 결과 표시는 `poll_completed`/`iter_completed`로
+    호출한 스레드(예: Streamlit 스크립트 스레드)에서 처리합니다.
+    워커에서 보내는 LLM 요청은 `session_id`의 큐로 들어가 다른 세션과 공정하게 스케줄링됩니다.
+
+    리뷰 응답은 스트리밍으로 받아 파일별로 모아두며, 호출한 스레드가 `poll_streaming`으로
+    마지막 조회 이후 바뀐 파일의 중간 결과만 가져가 표시합니다. (UI 갱신은 조회 주기로 합쳐짐)
+
+    `budget`이 주어지면 리뷰 단위마다 예상 사용량을 예약한 뒤 제출하고, 예약할 수 없는 단위는 보류합니다.
+    실행 중인 단위가 끝나 예산이 남으면 보류한 단위를 파일 우선순위(`file_priority`) 순으로 다시 시도하고,
+    끝까지 들어가지 못한 단위는 건너뛴 것으로 표시합니다. 예산의 리뷰 단계가 멈추면(중단/시간 제한)
+    대기 중인 단위는 건너뛰고 전송 중인 요청은 스케줄러에서 취소합니다.
+
+    `attributes`(PR head의 `.gitattributes`)의 linguist 속성은 파일 분류(`file_triage`)에 사용합니다.
+    `repository`('owner/repo')가 주어지면 이전 PR에서 리뷰한 같은 변경을 같은 저장소 안에서만 재사용합니다.
+    """
+
+    def __init__(self, executor: Executor, use_cache: bool = True, session_id: str = "default",
+                 budget: Optional[ReviewBudget] = None, attributes: Optional[GitAttributes] = None,
+                 repository: Optional[str] = None):
+        self._executor = executor
+        self._repository = repository
+        self._attributes = attributes
+        self._use_cache = use_cache
+        self._session_id = session_id
+        self._budget = budget
+        # 워커 스레드에서도 만든 쪽의 트레이스에 구간을 기록
+        self._trace = current_trace()
+        self._packers: dict[str, FilePacker] = {}
+        self._lock = threading.Lock()
+        # 파일 경로 → {'language', 'expected', 'chunks'}
+        self._files: dict[str, dict] = {}
+        self._completed: "queue.Queue[dict]" = queue.Queue()
+        self._outstanding_files = 0
+        self._closed = False
+        self.unit_count = 0
+        # 예산이 부족해 보류한 리뷰 단위와, 제출되어 아직 끝나지 않은 단위 수
+        self._deferred: list[ReviewUnit] = []
+        self._running = 0
+        # 리뷰 단위를 처음 건너뛴 사유 (`review_budget.STOP_*`)
+        self.skip_reason: Optional[str] = None
+        # diff 압축(`diff_compactor`)으로 줄인 프롬프트 토큰 통계
+        self.compaction = {
+            "files": 0, "original_tokens": 0, "compacted_tokens": 0,
+            "whitespace_blocks": 0, "moved_blocks": 0, "trimmed_context_lines": 0,
+        }
+        # 같은 변경 묶음: 대표 (파일 경로, 청크 번호) →
+        # {'representative', 'followers': [결과를 기다리는 (파일 경로, 청크 번호)], 'chunk': 대표 결과, 'shared'}
+        self._dedup = DedupIndex(REVIEW_DEDUP_THRESHOLD) if REVIEW_DEDUP_ENABLED else None
+        self._groups: dict[tuple[str, int], dict] = {}
+        # 중복 제거: 다른 파일과 결과를 나눈 묶음 수, 리뷰하지 않은 단위 수와 그 diff 토큰 수
+        self.dedup = {"groups": 0, "units": 0, "tokens_saved": 0}
+        if budget is not None:
+            budget.add_stop_listener(self._on_budget_stop)
+
+    def add_file(self, file_diff: FileDiff) -> Optional[dict]:
+        """
+        파일을 리뷰 대상으로 추가합니다.
+
+        Args:
+            file_diff (FileDiff): 파싱된 파일 diff.
+
+        Returns:
+            Optional[dict]: LLM 리뷰가 필요 없는 파일이면 즉시 결과, 아니면 None (결과는 완료 큐로 전달).
+        """
+        immediate, lang = prepare_file_review(file_diff, self._attributes)
+        if immediate is not None:
+            return immediate
+
+        units, compacted = plan_file_units(file_diff, lang)
+        self._record_compaction(compacted)
+        if not units:
+            return compacted_file_result(file_diff.filename, lang, compacted)
+        with self._lock:
+            self._files[file_diff.filename] = {
+                "language": lang, "expected": len(units), "chunks": [],
+                # 스트리밍 중인 청크별 텍스트 조각, 변경 버전, 시간 측정
+                "streams": {}, "version": 0, "seen": 0, "started": None, "first_token": None,
+            }
+            self._outstanding_files += 1
+
+        units = [unit for unit in units if not self._share_duplicate(unit)]
+        if not units:
+            return None
+        if len(units) == 1 and units[0].tokens <= REVIEW_PACK_FILE_MAX_TOKENS and REVIEW_PACK_MAX_FILES > 1:
+            # 작은 파일은 같은 언어끼리 묶일 때까지 대기
+            unit = units[0]
+            packer = self._packers.get(lang)
+            if packer is None:
+                packer = self._packers[lang] = FilePacker(get_chunk_token_budget(lang), REVIEW_PACK_MAX_FILES)
+            for closed in packer.add(lang, file_diff.filename, unit.parts[0], unit.tokens, unit.change_notes[0]):
+                self._submit(closed)
+        else:
+            for unit in units:
+                self._submit(unit)
+        return None
+
+    def _share_duplicate(self, unit: ReviewUnit) -> bool:
+        """
+        이미 제출한 단위와 같은 변경이면 대표 결과를 기다리도록 등록하고 True를 반환합니다.
+        처음 보는 변경이면 대표로 등록하고 False를 반환합니다. (대표가 이미 끝났으면 바로 결과를 나눠 받음)
+        """
+        if self._dedup is None:
+            return False
+        fp = fingerprint_diff(unit.parts[0], REVIEW_DEDUP_MIN_TOKENS)
+        if fp is None:
+            return False
+        filename = unit.filenames[0]
+        group = {"representative": filename, "followers": [], "chunk": None, "shared": 0}
+        found = self._dedup.find_or_add(unit.language, fp, group)
+        if found is None:
+            with self._lock:
+                self._groups[(filename, unit.chunk_index)] = group
+            return False
+        with self._lock:
+            if found["chunk"] is None:
+                found["followers"].append((filename, unit.chunk_index))
+            found["shared"] += 1
+            if found["shared"] == 1:
+                self.dedup["groups"] += 1
+            self.dedup["units"] += 1
+            self.dedup["tokens_saved"] += unit.tokens
+            chunk = found["chunk"]
+        if chunk is not None:
+            self._complete_unit({filename: shared_chunk_review(chunk, found["representative"], unit.chunk_index)})
+        return True
+
+    def _record_compaction(self, compacted: CompactedDiff):
+        with self._lock:
+            stats = self.compaction
+            stats["files"] += 1
+            stats["original_tokens"] += compacted.original_tokens
+            stats["compacted_tokens"] += compacted.compacted_tokens
+            stats["whitespace_blocks"] += compacted.whitespace_blocks
+            stats["moved_blocks"] += compacted.moved_blocks
+            stats["trimmed_context_lines"] += compacted.trimmed_context_lines
+
+    def close(self):
+        """더 이상 파일이 추가되지 않음을 알리고, 대기 중인 묶음을 모두 제출합니다."""
+        for packer in self._packers.values():
+            for unit in packer.flush():
+                self._submit(unit)
+        with self._lock:
+            self._closed = True
+            if self._outstanding_files == 0:
+                self._completed.put(None)
+        self._admit_deferred()
+
+    def poll_completed(self) -> list[dict]:
+        """지금까지 완료된 파일 결과를 기다리지 않고 가져옵니다."""
+        results = []
+        while True:
+            try:
+                item = self._completed.get_nowait()
+            except queue.Empty:
+                return results
+            if item is None:
+                # 종료 표식은 iter_completed가 볼 수 있도록 되돌려 놓음
+                self._completed.put(None)
+                return results
+            results.append(item)
+
+    def iter_completed(self, timeout: Optional[float] = None) -> Iterator[Optional[dict]]:
+        """
+        `close()` 이후, 남은 파일 결과를 완료되는 순서대로 반환합니다.
+
+        Args:
+            timeout (Optional[float]): 주어지면 이 시간(초) 동안 완료된 파일이 없을 때 None을 반환하여,
+                호출한 쪽이 기다리는 동안 `poll_streaming`으로 중간 결과를 표시할 수 있게 합니다.
+        """
+        while True:
+            try:
+                item = self._completed.get(timeout=timeout)
+            except queue.Empty:
+                yield None
+                continue
+            if item is None:
+                return
+            yield item
+
+    def poll_streaming(self) -> dict[str, str]:
+        """
+        마지막 조회 이후 스트리밍 텍스트가 바뀐 파일의 중간 리뷰를 가져옵니다.
+
+        Returns:
+            dict[str, str]: 파일 경로 → 지금까지 받은 리뷰 텍스트 (청크 순서대로 이어 붙임).
+        """
+        updates = {}
+        with self._lock:
+            for filename, state in self._files.items():
+                if state["version"] == state["seen"]:
+                    continue
+                state["seen"] = state["version"]
+                streams = state["streams"]
+                updates[filename] = "\n\n---\n\n".join("".join(streams[i]) for i in sorted(streams))
+        return updates
+
+    def _submit(self, unit: ReviewUnit):
+        self.unit_count += 1
+        if self._budget is not None:
+            if self._budget.stopped:
+                self._skip_units([unit], self._budget.stop_reason)
+                return
+            if not self._budget.try_reserve(*_reservation(unit)):
+                with self._lock:
+                    self._deferred.append(unit)
+                return
+        self._submit_reserved(unit)
+
+    def _submit_reserved(self, unit: ReviewUnit):
+        with self._lock:
+            self._running += 1
+        if isinstance(self._executor, PriorityThreadPool):
+            future = self._executor.submit_with_priority(
+                unit.estimated_tokens, run_in_session, self._session_id, self._run_unit, unit
+            )
+        else:
+            future = self._executor.submit(run_in_session, self._session_id, self._run_unit, unit)
+        future.add_done_callback(lambda f, unit=unit: self._on_unit_done(unit, f))
+
+    def _run_unit(self, unit: ReviewUnit) -> dict[str, dict]:
+        # 워커가 파일의 첫 리뷰 단위를 시작한 시각부터 첫 토큰/완료까지 시간을 측정
+        now = time.monotonic()
+        with self._lock:
+            for filename in unit.filenames:
+                state = self._files.get(filename)
+                if state is not None and state["started"] is None:
+                    state["started"] = now
+        with trace_scope(self._trace):
+            if self._budget is None:
+                return review_unit(unit, self._use_cache, self._on_delta, self._repository)
+            if self._budget.stopped:
+                # 실행을 기다리는 동안 리뷰 단계가 멈춤
+                raise RequestCancelled()
+            with budget_scope(self._budget), cancel_scope(self):
+                return review_unit(unit, self._use_cache, self._on_delta, self._repository)
+
+    def _on_delta(self, filename: str, chunk_index: int, text: str):
+        # 스케줄러 스레드에서 호출됨: 조각만 모아두고 UI는 건드리지 않음
+        with self._lock:
+            state = self._files.get(filename)
+            if state is None:
+                return
+            state["streams"].setdefault(chunk_index, []).append(text)
+            state["version"] += 1
+            if state["first_token"] is None:
+                state["first_token"] = time.monotonic()
+
+    def _on_unit_done(self, unit: ReviewUnit, future: Future):
+        if self._budget is not None:
+            self._budget.release(*_reservation(unit))
+        try:
+            per_file = future.result()
+        except RequestCancelled:
+            reason = self._budget.stop_reason if self._budget is not None else None
+            self._skip_units([unit], reason or STOP_CANCELLED)
+            per_file = None
+        except Exception as e:
+            traceback.print_exc()
+            per_file = {
+                filename: {"chunk_index": unit.chunk_index, "review": f"리뷰 생성 중 에러 발생: {e}", "error": True}
+                for filename in unit.filenames
+            }
+        if per_file is not None:
+            self._complete_unit(per_file)
+        with self._lock:
+            self._running -= 1
+        # 끝난 단위가 예약을 반납했으므로 보류한 단위를 다시 시도
+        self._admit_deferred()
+
+    def _admit_deferred(self):
+        """
+        보류한 리뷰 단위를 우선순위가 높은 파일, 작은 단위 순으로 예약해 제출합니다.
+        파일 추가가 끝났고 실행 중인 단위도 없는데 남은 단위는 예산 소진으로 건너뜁니다.
+        """
+        with self._lock:
+            if not self._deferred:
+                return
+            self._deferred.sort(key=lambda u: (-max(file_priority(f) for f in u.filenames), u.estimated_tokens))
+            admitted, kept = [], []
+            for unit in self._deferred:
+                if self._budget.try_reserve(*_reservation(unit)):
+                    admitted.append(unit)
+                else:
+                    kept.append(unit)
+            self._deferred = kept
+            give_up = bool(kept) and not admitted and self._closed and self._running == 0
+            if give_up:
+                self._deferred = []
+        for unit in admitted:
+            self._submit_reserved(unit)
+        if give_up:
+            self._skip_units(kept, self._budget.stop_reason or STOP_BUDGET)
+
+    def _on_budget_stop(self, reason: str):
+        # 예산의 리뷰 단계가 멈춤 (타이머 스레드 등에서 호출): 전송 중인 요청을 취소하고 보류한 단위는 건너뜀
+        get_scheduler().cancel(self)
+        with self._lock:
+            deferred, self._deferred = self._deferred, []
+        if deferred:
+            self._skip_units(deferred, reason)
+
+    def _skip_units(self, units: list[ReviewUnit], reason: str):
+        with self._lock:
+            if self.skip_reason is None:
+                self.skip_reason = reason
+        for unit in units:
+            self._complete_unit({
+                filename: {"chunk_index": unit.chunk_index, "review": skipped_chunk_review(reason),
+                           "error": False, "skipped": True}
+                for filename in unit.filenames
+            })
+
+    def _complete_unit(self, per_file: dict[str, dict]):
+        finished = []
+        with self._lock:
+            items = list(per_file.items())
+            for filename, chunk in per_file.items():
+                # 대표 결과를 같은 변경으로 묶인 파일들에 나눠 줌
+                group = self._groups.get((filename, chunk["chunk_index"]))
+                if group is not None:
+                    group["chunk"] = chunk
+                    items.extend(
+                        (follower, shared_chunk_review(chunk, filename, chunk_index))
+                        for follower, chunk_index in group["followers"]
+                    )
+                    group["followers"] = []
+            for filename, chunk in items:
+                state = self._files.get(filename)
+                if state is None:
+                    continue
+                state["chunks"].append(chunk)
+                if len(state["chunks"]) == state["expected"]:
+                    result = assemble_file_result(filename, state["language"], state["chunks"])
+                    result["timing"] = _timing(state["started"], state["first_token"])
+                    finished.append(result)
+                    del self._files[filename]
+            self._outstanding_files -= len(finished)
+            all_done = self._closed and self._outstanding_files == 0
+        for result in finished:
+            self._completed.put(result)
+        if all_done and finished:
+            self._completed.put(None)
+
+
+class SummaryRun:
+    """
+    파일 리뷰 결과를 받아 최종 보고서를 만드는 map-reduce 요약기입니다. (UI와 무관)
+
+    - 결과는 최상위 디렉터리별로 모으고, 한 그룹이 `batch_tokens`를 넘으면 바로 부분 요약(map)을 제출하므로
+      나머지 파일을 리뷰하는 동안 요약이 함께 진행됩니다.
+    - `finish()`에서 남은 리뷰와 부분 요약이 요약 예산 안에 들어가면 한 번에 최종 보고서를 만들고,
+      넘으면 남은 리뷰를 묶어 요약한 뒤 부분 요약끼리도 예산 안에 들어갈 때까지 단계적으로 합칩니다(reduce).
+    - 작은 PR은 부분 요약 없이 기존과 같이 한 번의 요청으로 처리됩니다.
+    - `budget`이 주어지면 사용량을 기록하고, 리뷰 전체가 중단(`cancel`)되면 요약 요청도 취소합니다.
+      시간 제한·예산 소진으로 파일 리뷰만 멈춘 경우에는 끝난 결과로 부분 보고서를 만듭니다.
+    """
+
+    def __init__(self, executor: Executor, session_id: str = "default", batch_tokens: int = SUMMARY_BATCH_MAX_TOKENS,
+                 budget: Optional[ReviewBudget] = None):
+        self._executor = executor
+        self._session_id = session_id
+        self._review_budget = budget
+        self._trace = current_trace()
+        if budget is not None:
+            budget.add_stop_listener(self._on_budget_stop)
+        self._budget = get_summary_token_budget()
+        self._batch_tokens = min(batch_tokens, self._budget)
+        # 그룹 이름 → [(결과, 구간 토큰 수)]
+        self._pending: dict[str, list[tuple[dict, int]]] = {}
+        self._pending_tokens: dict[str, int] = {}
+        # (그룹 이름, 결과 목록, Future[부분 요약])
+        self._partials: list[tuple[str, list[dict], Future]] = []
+        self.map_count = 0
+        self.reduce_count = 0
+
+    def add_result(self, result: dict):
+        """완료된 파일 리뷰 결과를 추가합니다. 그룹이 충분히 커지면 부분 요약을 제출합니다."""
+        group = _summary_group(result["filename"])
+        tokens = count_tokens(format_review_section(result))
+        self._pending.setdefault(group, []).append((result, tokens))
+        self._pending_tokens[group] = self._pending_tokens.get(group, 0) + tokens
+        if self._pending_tokens[group] >= self._batch_tokens:
+            items = self._pending.pop(group)
+            del self._pending_tokens[group]
+            self._submit_partial(group, [result for result, _ in items])
+
+    def finish(self, on_delta: Optional[Callable[[str], None]] = None, skipped: Optional[list[str]] = None) -> str:
+        """
+        남은 결과와 부분 요약을 합쳐 최종 보고서를 생성합니다.
+
+        Args:
+            on_delta (Optional[Callable[[str], None]]): 최종 보고서를 스트리밍으로 받을 콜백 (예: `StreamBuffer.append`).
+            skipped (Optional[list[str]]): 리뷰하지 못한 파일 경로. 있으면 부분 보고서임을 알려 줍니다.
+
+        Returns:
+            str: PR에 대한 최종 분석 보고서 (마크다운 형식).
+
+        Raises:
+            RequestCancelled: 리뷰 전체가 중단된 경우.
+        """
+        leftover = [item for group in sorted(self._pending) for item in self._pending[group]]
+        self._pending.clear()
+        self._pending_tokens.clear()
+
+        partials = self._collect_partials(leftover)
+        total = sum(tokens for _, tokens in leftover) + sum(count_tokens(format_partial_section(*p)) for p in partials)
+        if total > self._budget and leftover:
+            # 남은 리뷰도 예산 단위로 묶어 병렬로 요약
+            for batch in _pack_batches(leftover, self._batch_tokens):
+                self._submit_partial(_batch_title(batch), [result for result, _ in batch])
+            leftover = []
+            partials += self._collect_partials(leftover)
+
+        # 부분 요약끼리도 예산을 넘으면 단계적으로 합침
+        while len(partials) > 1:
+            sized = [(p, count_tokens(format_partial_section(*p))) for p in partials]
+            if sum(tokens for _, tokens in sized) <= self._budget:
+                break
+            batches = _pack_batches(sized, self._budget)
+            if len(batches) == len(partials):
+                # 부분 요약 하나하나가 예산에 가까워 더 합칠 수 없으면 그대로 진행
+                break
+            reduced = []
+            for batch in batches:
+                group = [p for p, _ in batch]
+                if len(group) == 1:
+                    reduced.append((group, None))
+                    continue
+                self.reduce_count += 1
+                title = _join_titles([title for title, _ in group])
+                sections = [format_partial_section(*p) for p in group]
+                reduced.append((group, self._submit(len(group), summarize_partial, title, sections)))
+            partials, failed = [], False
+            for group, future in reduced:
+                if future is None:
+                    partials.extend(group)
+                    continue
+                try:
+                    partials.append((_join_titles([title for title, _ in group]), future.result()))
+                except Exception:
+                    traceback.print_exc()
+                    partials.extend(group)
+                    failed = True
+            if failed:
+                break
+
+        leftover_results = sorted((result for result, _ in leftover), key=lambda r: r["filename"])
+        return self._run_scoped(
+            generate_final_summary, leftover_results, sorted(partials), on_delta=on_delta, skipped=skipped
+        )
+
+    def _submit(self, priority: float, fn, *args) -> Future:
+        if isinstance(self._executor, PriorityThreadPool):
+            return self._executor.submit_with_priority(
+                priority, run_in_session, self._session_id, self._run_scoped, fn, *args
+            )
+        return self._executor.submit(run_in_session, self._session_id, self._run_scoped, fn, *args)
+
+    def _run_scoped(self, fn, *args, **kwargs):
+        with trace_scope(self._trace):
+            if self._review_budget is None:
+                return fn(*args, **kwargs)
+            if self._review_budget.cancelled:
+                raise RequestCancelled()
+            with budget_scope(self._review_budget), cancel_scope(self):
+                return fn(*args, **kwargs)
+
+    def _on_budget_stop(self, reason: str):
+        # 시간 제한·예산 소진으로는 요약을 멈추지 않음 (부분 보고서를 만들어야 하므로)
+        if reason == STOP_CANCELLED:
+            get_scheduler().cancel(self)
+
+    def _submit_partial(self, title: str, results: list[dict]):
+        self.map_count += 1
+        results = sorted(results, key=lambda r: r["filename"])
+        sections = [format_review_section(result) for result in results]
+        self._partials.append((title, results, self._submit(len(results), summarize_partial, title, sections)))
+
+    def _collect_partials(self, leftover: list[tuple[dict, int]]) -> list[tuple[str, str]]:
+        """제출한 부분 요약을 기다립니다. 실패한 그룹의 리뷰는 원문 그대로 `leftover`에 되돌립니다."""
+        partials = []
+        for title, results, future in self._partials:
+            try:
+                partials.append((title, future.result()))
+            except Exception:
+                traceback.print_exc()
+                leftover.extend((result, count_tokens(format_review_section(result))) for result in results)
+        self._partials = []
+        return partials
+
+
+class StreamBuffer:
+    """
+    다른 스레드에서 스트리밍되는 텍스트를 모으는 버퍼입니다.
+    쓰는 쪽은 `append`만 호출하고, UI 스레드는 주기적으로 `poll`하여 바뀐 경우에만 다시 그립니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parts: list[str] = []
+        self._version = 0
+        self._seen = 0
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+
+    def append(self, text: str):
+        with self._lock:
+            if self.first_token_at is None:
+                self.first_token_at = time.monotonic()
+            self._parts.append(text)
+            self._version += 1
+
+    def poll(self) -> Optional[str]:
+        """마지막 조회 이후 바뀌었으면 지금까지의 전체 텍스트를, 아니면 None을 반환합니다."""
+        with self._lock:
+            if self._version == self._seen:
+                return None
+            self._seen = self._version
+            return "".join(self._parts)
+
+    def timing(self) -> dict:
+        """시작부터 첫 토큰까지, 그리고 지금까지 걸린 시간(초)을 반환합니다."""
+        return _timing(self.started_at, self.first_token_at)
+
+
+def _timing(started: Optional[float], first_token: Optional[float]) -> dict:
+    """{'ttft': 첫 토큰까지 걸린 시간 또는 None, 'total': 전체 시간} (초). 캐시 적중 등으로 시작 시각이 없으면 0."""
+    if started is None:
+        return {"ttft": None, "total": 0.0}
+    return {
+        "ttft": (first_token - started) if first_token is not None else None,
+        "total": time.monotonic() - started,
+    }
+
+
+def _reservation(unit: ReviewUnit) -> tuple[int, int]:
+    """리뷰 단위 하나의 예상 (입력, 출력) 토큰 수. 입력에는 프롬프트와 컨벤션 몫을 더합니다."""
+    output_tokens = ESTIMATED_OUTPUT_TOKENS_PER_FILE * len(unit.filenames)
+    return unit.tokens + CONVENTIONS_TOKEN_RESERVE, output_tokens
+
+
+def _summary_group(filename: str) -> str:
+    """파일 경로의 최상위 디렉터리를 요약 그룹 이름으로 사용합니다."""
+    head, sep, _ = filename.partition("/")
+    return head + "/" if sep else "(루트)"
+
+
+def _join_titles(titles: list[str]) -> str:
+    # 이미 합쳐진 제목("a/, b/")도 그룹 단위로 펼쳐 중복 없이 합침
+    unique = list(dict.fromkeys(part for title in titles for part in title.split(", ")))
+    if len(unique) <= 3:
+        return ", ".join(unique)
+    return f"{unique[0]} 외 {len(unique) - 1}개 그룹"
+
+
+def _batch_title(batch: list[tuple[dict, int]]) -> str:
+    return _join_titles([_summary_group(result["filename"]) for result, _ in batch])
+
+
+def _pack_batches(items: list[tuple], max_tokens: int) -> list[list[tuple]]:
+    """(항목, 토큰 수) 목록을 순서대로 `max_tokens` 이하의 묶음으로 나눕니다."""
+    batches: list[list[tuple]] = []
+    current: list[tuple] = []
+    current_tokens = 0
+    for item in items:
+        tokens = item[1]
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
@@ -1,30 +1,164 @@
+import functools
+import json
+import posixpath
 import re
+import time
 import traceback
-import streamlit as st
+from typing import Callable, Optional
+
+# 설정 파일에서 설정값과 공유 클라이언트 임포트
+from config import (
+    get_search_client, AZ_OPENAI_ENGINE, AZ_INDEX,
+    CONVENTIONS_CACHE_TTL, CONVENTIONS_CACHE_MAX_SIZE, CONVENTION_INDEX_TOP_K,
+    REVIEW_CACHE_ENABLED, REVIEW_CACHE_PATH, REVIEW_CACHE_MAX_ENTRIES, REVIEW_CACHE_MAX_AGE_DAYS,
+    AZ_OPENAI_CONTEXT_TOKENS, AZ_OPENAI_MAX_OUTPUT_TOKENS, REVIEW_CHUNK_MAX_TOKENS, SUMMARY_INPUT_MAX_TOKENS,
+    LLM_STREAMING, REVIEW_DIFF_CONTEXT_LINES, AZ_OPENAI_INPUT_COST_PER_1K, AZ_OPENAI_OUTPUT_COST_PER_1K,
+    REVIEW_DEDUP_ENABLED, REVIEW_DEDUP_MIN_TOKENS,
+)
+from chunk_planner import ReviewUnit, count_tokens, split_file_diff
+from convention_index import get_convention_index
+from diff_compactor import COMPACTION_VERSION, CompactedDiff, compact_file_diff
+from diff_parser import FileDiff
+from file_triage import TRIAGE_RULES_VERSION, GitAttributes, triage_file
+from hunk_dedup import normalize_diff
+from language_detector import detect_language, extract_code_lines, record_llm_fallback
+from llm_scheduler import RequestCancelled, get_scheduler
+from review_budget import STOP_REASON_LABELS, current_budget, token_cost
+from review_cache import PRReviewStore, ReviewCache, make_review_key
+from telemetry import record_llm_call, span, traced, warn
+from ttl_cache import TTLCache
+
+# 리뷰 프롬프트(_get_review_prompt)를 변경하면 반드시 올려주세요. 이전 프롬프트로 생성된 캐시를 무효화합니다.
+REVIEW_PROMPT_VERSION = "3"
+
+# 토큰 예산 계산 시 컨벤션 텍스트와 여유분으로 남겨둘 토큰 수
+CONVENTIONS_TOKEN_RESERVE = 2000
+PROMPT_TOKEN_MARGIN = 256
+
+# 부분 요약(map 단계) 응답의 최대 토큰 수
+PARTIAL_SUMMARY_MAX_TOKENS = 1500
+
+# 다중 파일 리뷰 요청/응답에서 파일 구간을 나누는 표식
+MULTI_FILE_MARKER = "### FILE:"
+
+CORE_CONVENTIONS_QUERY = "variable naming, function naming, error handling, exception handling, comment style, code formatting, security best practices, performance optimization, testing guidelines, general best practices"
+CORE_CONVENTIONS_TOP = 5
+
+# 프로세스 전역 컨벤션 검색 캐시 (모든 Streamlit 세션과 워커 스레드가 공유)
+_conventions_cache = TTLCache(max_size=CONVENTIONS_CACHE_MAX_SIZE, ttl=CONVENTIONS_CACHE_TTL)
+
+# 청크 리뷰 결과 영구 캐시 (디스크). 생성에 실패하면 캐시 없이 동작합니다.
+try:
+    _review_cache = ReviewCache(
+        REVIEW_CACHE_PATH,
+        max_entries=REVIEW_CACHE_MAX_ENTRIES,
+        max_age_seconds=REVIEW_CACHE_MAX_AGE_DAYS * 86400,
+    ) if REVIEW_CACHE_ENABLED else None
+    _pr_store = PRReviewStore(
+        REVIEW_CACHE_PATH,
+        max_entries=REVIEW_CACHE_MAX_ENTRIES,
+        max_age_seconds=REVIEW_CACHE_MAX_AGE_DAYS * 86400,
+    ) if REVIEW_CACHE_ENABLED else None
+except Exception:
+    traceback.print_exc()
+    _review_cache = None
+    _pr_store = None
+
+def _chat_completion(messages: list[dict], on_delta: Optional[Callable[[str], None]] = None, **kwargs) -> str:
+    """
+    프로세스 전역 LLM 스케줄러를 통해 Chat Completions 요청을 보내고 응답 텍스트를 반환합니다.
+    요청은 현재 세션의 큐에 들어가 RPM/TPM 한도에 맞춰 전송되고, 429/5xx는 스케줄러가 재시도합니다.
+    현재 `budget_scope`의 리뷰 예산이 있으면 사용량(응답의 usage, 없으면 추정치)을 기록합니다.
+    호출 시간, 큐 대기 시간, 토큰 수와 예상 비용은 현재 단계의 LLM 호출로 `telemetry`에 기록합니다.
+
+    Args:
+        messages (list[dict]): 대화 메시지.
+        on_delta (Optional[Callable[[str], None]]): 주어지고 스트리밍이 켜져 있으면 응답 조각마다 호출됩니다.
+            (스케줄러 스레드에서 호출되므로 스레드 안전해야 합니다.)
+        **kwargs: temperature 등 추가 인자.
 
-# 설정 파일에서 초기화된 클라이언트 객체 임포트
-from config import llm, search_client, AZ_OPENAI_ENGINE
+    Returns:
+        str: 응답 텍스트.
 
-def get_programming_language(code: str) -> str:
+    Raises:
+        RequestCancelled: 리뷰가 중단되어 요청이 취소된 경우.
+    """
+    prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+    scheduler = get_scheduler()
+    budget = current_budget()
+    streamed = on_delta is not None and LLM_STREAMING
+    timing: dict = {}
+    started = time.perf_counter()
+
+    def record(status: str, prompt: int, completion: int, estimated: bool):
+        record_llm_call(
+            time.perf_counter() - started, timing.get("queue_wait", 0.0), prompt, completion,
+            token_cost(prompt, completion, AZ_OPENAI_INPUT_COST_PER_1K, AZ_OPENAI_OUTPUT_COST_PER_1K),
+            status=status, streamed=streamed, estimated=estimated, retries=timing.get("retries", 0),
+        )
+
+    try:
+        if streamed:
+            text = scheduler.chat_stream(
+                on_delta, estimated_prompt_tokens=prompt_tokens, timing=timing,
+                model=AZ_OPENAI_ENGINE, messages=messages, **kwargs
+            )
+            usage = None
+        else:
+            response = scheduler.chat(
+                estimated_prompt_tokens=prompt_tokens, timing=timing,
+                model=AZ_OPENAI_ENGINE, messages=messages, **kwargs
+            )
+            text = response.choices[0].message.content
+            usage = getattr(response, "usage", None)
+    except RequestCancelled:
+        # 중단된 요청도 입력 토큰은 사용한 것으로 계산
+        if budget is not None:
+            budget.charge(prompt_tokens, 0)
+        record("cancelled", prompt_tokens, 0, True)
+        raise
+    except Exception:
+        record("error", 0, 0, True)
+        raise
+    if usage is not None and getattr(usage, "total_tokens", None):
+        used_prompt, used_completion, estimated = usage.prompt_tokens, usage.completion_tokens, False
+    else:
+        used_prompt, used_completion, estimated = prompt_tokens, count_tokens(text or ""), True
+    if budget is not None:
+        budget.charge(used_prompt, used_completion)
+    record("ok", used_prompt, used_completion, estimated)
+    return text
+
+def get_programming_language(code: str, filename: Optional[str] = None) -> str:
     """
-    LLM을 이용하여 주어진 코드 스니펫의 프로그래밍 언어를 식별합니다.
+    주어진 코드 스니펫의 프로그래밍 언어를 식별합니다.
+    파일명·diff 헤더·shebang·내용 휴리스틱으로 로컬에서 먼저 판단하고,
+    판단이 모호한 경우에만 LLM을 호출합니다.
 
     Args:
         code (str): Git diff 형식의 코드 스니펫.
+        filename (Optional[str]): 파일 경로. 없으면 diff 헤더에서 추출합니다.
 
     Returns:
         str: 감지된 프로그래밍 언어 (소문자), 또는 'text'.
     """
+    language = detect_language(code, filename)
+    if language is not None:
+        return language
+
+    language = _detect_language_with_llm(code)
+    record_llm_fallback(code, filename, language)
+    return language
+
+def _detect_language_with_llm(code: str) -> str:
+    """LLM을 이용하여 코드 스니펫의 프로그래밍 언어를 식별합니다. (로컬 감지 실패 시 폴백)"""
     try:
-        # diff 내용에서 실제로 추가되거나 변경되지 않은 코드 라인만 추출
-        code_lines = [line[1:] for line in code.split('\n') if len(line) > 1 and line[0] in ('+', ' ')]
-        clean_code = "\n".join(code_lines)
+        clean_code = "\n".join(extract_code_lines(code))
 
         if not clean_code.strip():
             return "text"
 
-        response = llm.chat.completions.create(
-            model=AZ_OPENAI_ENGINE,
+        language = _chat_completion(
             messages=[
                 {"role": "system", "content": "You are a programming language detector. Respond with only the name of the language in lowercase (e.g., python, c, javascript). If it's not a typical programming language, respond with 'text'."},
                 {"role": "user", "content": f"What programming language is this code written in?\n\n```\n{clean_code}\n```"}
@@ -32,15 +166,17 @@ def get_programming_language(code: str) -> str:
             temperature=0,
             n=1
         )
-        language = response.choices[0].message.content.strip().lower()
+        language = language.strip().lower()
         return language
     except Exception as e:
-        st.warning(f"언어 감지 실패: {e}. 기본값 'text'를 사용합니다.")
+        warn(f"언어 감지 실패: {e}. 기본값 'text'를 사용합니다.")
         return "text"
 
 def search_core_conventions(language: str) -> str:
     """
     Azure AI Search를 사용하여 특정 언어의 핵심 코딩 컨벤션을 검색합니다.
+    검색 결과는 (인덱스, 언어, 쿼리, top) 단위로 프로세스 전역 TTL 캐시에 저장되어
+    세션과 워커 스레드 간에 공유됩니다.
 
     Args:
         language (str): 검색할 프로그래밍 언어.
@@ -51,85 +187,621 @@ def search_core_conventions(language: str) -> str:
     if language == "text":
         return ""
 
-    core_query = "variable naming, function naming, error handling, exception handling, comment style, code formatting, security best practices, performance optimization, testing guidelines, general best practices"
-
+    key = (AZ_INDEX, language, CORE_CONVENTIONS_QUERY, CORE_CONVENTIONS_TOP)
     try:
-        search_results = search_client.search(
-            search_text=core_query,
-            filter=f"language eq '{language}'",
-            include_total_count=True,
-            top=5,
+        conventions = _conventions_cache.get_or_load(
+            key, lambda: _search_conventions(language, CORE_CONVENTIONS_QUERY, CORE_CONVENTIONS_TOP)
         )
-        snippets = [f" - (from: {result['sourcefile']}) {result['content']}" for result in search_results]
-        if not snippets:
-            return "해당 언어에 대한 코딩 컨벤션을 찾지 못했습니다. 일반적인 코딩 원칙에 따라 리뷰합니다."
-        return "\n".join(snippets)
     except Exception:
         return "코딩 컨벤션 검색 중 오류가 발생하여, 일반적인 원칙에 따라 리뷰를 진행합니다."
+    if not conventions:
+        return "해당 언어에 대한 코딩 컨벤션을 찾지 못했습니다. 일반적인 코딩 원칙에 따라 리뷰합니다."
+    return conventions
+
+@traced("conventions")
+def get_unit_conventions(unit: ReviewUnit) -> str:
+    """
+    리뷰 단위의 diff와 가장 관련 있는 코딩 컨벤션을 로컬 임베딩 인덱스에서 찾습니다.
+    임베딩 배포가 설정되지 않았거나 인덱스 검색에 실패하면 `search_core_conventions`의 핵심 컨벤션을 사용합니다.
+
+    Args:
+        unit (ReviewUnit): 리뷰 단위 (다중 파일 단위는 파일별 diff를 모두 쿼리로 사용).
+
+    Returns:
+        str: 코딩 컨벤션 스니펫들을 포함하는 문자열.
+    """
+    index = get_convention_index()
+    if index is None or unit.language == "text":
+        return search_core_conventions(unit.language)
+    try:
+        documents = index.search(unit.language, unit.parts, CONVENTION_INDEX_TOP_K)
+    except Exception:
+        traceback.print_exc()
+        return search_core_conventions(unit.language)
+    if not documents:
+        return search_core_conventions(unit.language)
+    return "\n".join(f" - (from: {doc['sourcefile']}) {doc['content']}" for doc in documents)
 
-def generate_review_for_file(file_info: dict) -> dict:
+def invalidate_conventions_cache(language: Optional[str] = None) -> int:
+    """
+    코딩 컨벤션 검색 캐시를 무효화합니다. 컨벤션 인덱스를 다시 적재(re-ingest)한 뒤 호출합니다.
+    로컬 임베딩 인덱스도 버려서 다음 검색에서 다시 적재합니다.
+
+    Args:
+        language (Optional[str]): 무효화할 언어. None이면 전체를 비웁니다.
+
+    Returns:
+        int: 제거된 캐시 항목 수.
+    """
+    index = get_convention_index()
+    if index is not None:
+        index.invalidate(language)
+    if language is None:
+        return _conventions_cache.invalidate()
+    return _conventions_cache.invalidate(lambda key: key[1] == language)
+
+def get_conventions_cache_stats() -> dict:
+    """코딩 컨벤션 검색 캐시의 적중/미스 통계를 반환합니다."""
+    return _conventions_cache.stats()
+
+def _search_conventions(language: str, query: str, top: int) -> str:
+    """Azure AI Search를 호출하여 컨벤션 스니펫을 가져옵니다. 실패 시 예외를 그대로 전달합니다(캐시되지 않음)."""
+    search_results = get_search_client().search(
+        search_text=query,
+        filter=f"language eq '{language}'",
+        include_total_count=True,
+        top=top,
+    )
+    snippets = [f" - (from: {result['sourcefile']}) {result['content']}" for result in search_results]
+    return "\n".join(snippets)
+
+def generate_review_for_file(file_diff: FileDiff, use_cache: bool = True,
+                             on_delta: Optional[Callable[[str, int, str], None]] = None) -> dict:
     """
     단일 파일의 diff 내용을 기반으로 AI 코드 리뷰를 생성합니다.
+    이전에 같은 조건(청크·언어·컨벤션·프롬프트 버전·모델)으로 리뷰한 청크는 캐시된 결과를 재사용합니다.
 
     Args:
-        file_info (dict): 'filename'과 'diff_content'를 포함하는 딕셔너리.
+        file_diff (FileDiff): `diff_parser.parse_diff`로 파싱한 파일 diff.
+        use_cache (bool): False이면 리뷰 캐시를 조회하지 않고 항상 새로 생성합니다(결과는 캐시에 저장).
+        on_delta (Optional[Callable[[str, int, str], None]]): 리뷰를 스트리밍으로 받을 콜백 (파일 경로, 청크 번호, 텍스트 조각).
 
     Returns:
         dict: 'filename', 'review', 'language'를 포함하는 딕셔너리.
     """
-    filename = file_info['filename']
-    diff_content = file_info['diff_content']
-    reviews = []
+    immediate, lang = prepare_file_review(file_diff)
+    if immediate is not None:
+        return immediate
+
+    units, compacted = plan_file_units(file_diff, lang)
+    if not units:
+        return compacted_file_result(file_diff.filename, lang, compacted)
+    chunk_reviews = []
+    for unit in units:
+        chunk_reviews.append(review_unit(unit, use_cache, on_delta)[file_diff.filename])
+    return assemble_file_result(file_diff.filename, lang, chunk_reviews)
+
+def prepare_file_review(file_diff: FileDiff,
+                        attributes: Optional[GitAttributes] = None) -> tuple[Optional[dict], Optional[str]]:
+    """
+    LLM 리뷰 전에 파일을 분류합니다. 리뷰가 필요 없는 파일은 바로 결과를 만들고, 나머지는 언어를 감지합니다.
 
-    lang = get_programming_language(diff_content)
+    Args:
+        file_diff (FileDiff): 파싱된 파일 diff.
+        attributes (Optional[GitAttributes]): PR head의 `.gitattributes` 규칙 (linguist 속성 판단용).
+
+    Returns:
+        tuple[Optional[dict], Optional[str]]: (즉시 반환할 결과 또는 None, 감지된 언어 또는 None).
+            잠금·자동 생성·vendored·압축 파일 등으로 분류된 결과에는 'triage'
+            ({'reason', 'tokens_saved', 'calls_saved'})가 포함됩니다.
+    """
+    filename = file_diff.filename
+
+    # 리뷰할 코드 라인이 없는 변경(바이너리, 삭제, 이름만 변경)은 LLM을 호출하지 않음
+    skip_reason = _get_skip_reason(file_diff)
+    if skip_reason:
+        return {"filename": filename, "review": skip_reason, "language": "text"}, None
+
+    # 사람이 리뷰할 필요가 없는 파일은 언어 감지(LLM 폴백 포함)보다 먼저 걸러냄
+    with span("triage"):
+        triage = triage_file(file_diff, attributes, REVIEW_CHUNK_MAX_TOKENS)
+    if triage is not None:
+        return {
+            "filename": filename,
+            "review": triage.summary(file_diff),
+            "language": "text",
+            "triage": {"reason": triage.reason, "tokens_saved": triage.tokens_saved, "calls_saved": triage.calls_saved},
+        }, None
+
+    with span("detect_language"):
+        lang = get_programming_language(file_diff.diff_content, filename)
     if lang == "text":
         return {
             "filename": filename,
             "review": "✅ 일반 텍스트 파일(예: 문서, 설정, 데이터)으로 판단되어 코드 리뷰를 건너뜁니다.",
             "language": "text"
-        }
+        }, None
+    return None, lang
 
-    conventions = search_core_conventions(lang)
-    code_chunks = _split_diff_into_chunks(diff_content)
+def plan_file_units(file_diff: FileDiff, lang: str) -> tuple[list[ReviewUnit], CompactedDiff]:
+    """
+    파일 diff를 압축(`diff_compactor`)한 뒤 토큰 예산에 맞는 단일 파일 리뷰 단위들로 나눕니다.
+    생략한 변경(공백 변경, 이동한 블록의 원래 위치)은 변경 유형 설명에 한 줄 노트로 덧붙입니다.
 
-    for i, chunk in enumerate(code_chunks):
-        chunk_info = f" (부분 {i+1}/{len(code_chunks)})" if len(code_chunks) > 1 else ""
-        system_prompt = _get_review_prompt(lang, filename, chunk_info, conventions)
+    Args:
+        file_diff (FileDiff): 파싱된 파일 diff.
+        lang (str): 프로그래밍 언어.
+
+    Returns:
+        tuple[list[ReviewUnit], CompactedDiff]: (리뷰 단위 목록 (순서대로 chunk_index가 매겨짐), 압축 결과).
+            압축 후 리뷰할 변경이 남지 않으면 리뷰 단위 목록은 비어 있습니다.
+    """
+    with span("compact"):
+        compacted = compact_file_diff(file_diff, lang, REVIEW_DIFF_CONTEXT_LINES)
+    if not compacted.file_diff.hunks:
+        return [], compacted
+    with span("chunk_plan"):
+        chunks = split_file_diff(compacted.file_diff, get_chunk_token_budget(lang))
+    change_note = _describe_file_change(file_diff) + compacted.note
+    units = [
+        ReviewUnit(
+            language=lang, filenames=[file_diff.filename], parts=[chunk], tokens=count_tokens(chunk),
+            chunk_index=i, chunk_count=len(chunks), change_notes=[change_note],
+        )
+        for i, chunk in enumerate(chunks)
+    ]
+    return units, compacted
+
+
+def compacted_file_result(filename: str, lang: str, compacted: CompactedDiff) -> dict:
+    """압축 후 리뷰할 변경이 남지 않은 파일(공백·들여쓰기 변경만 있는 파일)의 결과를 만듭니다."""
+    notes = "".join(f"\n* {note}" for note in compacted.notes)
+    return {
+        "filename": filename,
+        "review": f"✅ 공백·들여쓰기 변경만 있어 코드 리뷰를 건너뜁니다.{notes}",
+        "language": lang,
+    }
+
+@functools.lru_cache(maxsize=64)
+def get_chunk_token_budget(lang: str) -> int:
+    """
+    리뷰 요청 하나에 넣을 diff의 최대 토큰 수를 계산합니다.
+    배포의 컨텍스트 한도에서 출력 토큰, 시스템 프롬프트, 컨벤션 예약분을 뺀 값과 설정값 중 작은 값입니다.
+
+    Args:
+        lang (str): 프로그래밍 언어.
+
+    Returns:
+        int: diff 토큰 예산.
+    """
+    prompt_tokens = count_tokens(_get_review_prompt()) + count_tokens(_get_review_context(lang, "", "", ""))
+    available = (
+        AZ_OPENAI_CONTEXT_TOKENS - AZ_OPENAI_MAX_OUTPUT_TOKENS - prompt_tokens
+        - CONVENTIONS_TOKEN_RESERVE - PROMPT_TOKEN_MARGIN
+    )
+    return max(min(REVIEW_CHUNK_MAX_TOKENS, available), 256)
+
+@traced("review_unit")
+def review_unit(unit: ReviewUnit, use_cache: bool = True,
+                on_delta: Optional[Callable[[str, int, str], None]] = None,
+                repository: Optional[str] = None) -> dict[str, dict]:
+    """
+    리뷰 단위 하나를 LLM으로 리뷰합니다. 다중 파일 단위는 한 번의 요청으로 리뷰한 뒤 파일별로 나눕니다.
+
+    Args:
+        unit (ReviewUnit): 리뷰 단위.
+        use_cache (bool): False이면 리뷰 캐시를 조회하지 않습니다(결과는 캐시에 저장).
+        on_delta (Optional[Callable[[str, int, str], None]]): 단일 파일 요청의 응답을 스트리밍으로 받을 콜백
+            (파일 경로, 청크 번호, 텍스트 조각). 다중 파일 요청은 응답을 파일별로 나눠야 하므로 스트리밍하지 않습니다.
+        repository (Optional[str]): 'owner/repo'. 이전 PR에서 리뷰한 같은 변경은 같은 저장소 안에서만 재사용하며,
+            없으면 재사용하지 않습니다.
+
+    Returns:
+        dict[str, dict]: 파일 경로 → {'chunk_index', 'review', 'error'}.
+
+    Raises:
+        RequestCancelled: 리뷰가 중단되어 요청이 취소된 경우.
+    """
+    lang = unit.language
+    conventions = get_unit_conventions(unit)
+    results: dict[str, dict] = {}
+
+    # 캐시에 있는 파일과, 다른 PR·파일에서 이미 리뷰한 같은 변경은 요청에서 제외
+    remaining = []
+    for filename, part, note in zip(unit.filenames, unit.parts, unit.change_notes):
+        cache_key = make_review_key(part, lang, conventions, REVIEW_PROMPT_VERSION, AZ_OPENAI_ENGINE)
+        shared_key = _shared_review_key(part, lang, conventions, repository)
+        cached = _review_cache.get(cache_key) if use_cache and _review_cache is not None else None
+        if cached is not None:
+            results[filename] = {"chunk_index": unit.chunk_index, "review": cached, "error": False}
+            continue
+        shared = _get_shared_review(shared_key) if use_cache else None
+        if shared is not None:
+            source, review = shared
+            results[filename] = earlier_chunk_review(review, source, filename, unit.chunk_index)
+            continue
+        remaining.append((filename, part, note, cache_key, shared_key))
+
+    if len(remaining) > 1:
+        reviews = _review_multiple_files(lang, conventions, remaining)
+        # 응답에서 섹션을 찾지 못한 파일은 개별 요청으로 다시 리뷰
+        missing = [item for item in remaining if item[0] not in reviews]
+        remaining = missing
+        for filename, review in reviews.items():
+            results[filename] = {"chunk_index": unit.chunk_index, "review": review, "error": False}
+
+    for filename, part, note, cache_key, shared_key in remaining:
+        chunk_info = f" (부분 {unit.chunk_index + 1}/{unit.chunk_count})" if unit.chunk_count > 1 else ""
+        context = _get_review_context(lang, filename, chunk_info, conventions)
         messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"다음 코드 변경 사항을 리뷰해주세요:\n\n```diff\n{chunk}\n```"}
+            {"role": "system", "content": _get_review_prompt()},
+            {"role": "user", "content": f"{context}\n다음 코드 변경 사항을 리뷰해주세요:{note}\n\n```diff\n{part}\n```"}
         ]
-
         try:
-            response = llm.chat.completions.create(
-                model=AZ_OPENAI_ENGINE,
-                messages=messages,
-            )
-            reviews.append(response.choices[0].message.content)
+            stream_to = None
+            if on_delta is not None:
+                stream_to = functools.partial(on_delta, filename, unit.chunk_index)
+            review = _chat_completion(messages, on_delta=stream_to)
+            results[filename] = {"chunk_index": unit.chunk_index, "review": review, "error": False}
+        except RequestCancelled:
+            raise
         except Exception as e:
             error_message = f"'{filename}{chunk_info}' 리뷰 생성 중 오류 발생: {e}"
             traceback.print_exc()
-            reviews.append(f"리뷰 생성 중 오류가 발생했습니다: {error_message}")
+            results[filename] = {
+                "chunk_index": unit.chunk_index,
+                "review": f"리뷰 생성 중 오류가 발생했습니다: {error_message}",
+                "error": True,
+            }
+            continue
+        _store_review(filename, review, cache_key, shared_key)
+    return results
+
+def _shared_review_key(part: str, lang: str, conventions: str, repository: Optional[str]) -> Optional[str]:
+    """
+    같은 저장소에서 파일 경로·라인 번호만 다른 같은 변경이 공유하는 캐시 키를 만듭니다 (`hunk_dedup.normalize_diff`).
+    다른 저장소의 리뷰가 섞이지 않도록 키에 저장소('owner/repo')를 넣고, 재사용한 리뷰가 이 diff에 없는 변수 이름을
+    언급하지 않도록 원본 변경(-/+) 라인도 넣습니다. (지역 변수 이름만 다른 변경은 PR 안에서만 묶음)
+    저장소를 모르거나, 중복 제거가 꺼져 있거나, 변경이 너무 짧아 우연히 같아지기 쉬우면 None을 반환합니다.
+    """
+    if not REVIEW_DEDUP_ENABLED or _review_cache is None or not repository:
+        return None
+    normalized, tokens = normalize_diff(part)
+    if tokens < max(REVIEW_DEDUP_MIN_TOKENS, 1):
+        return None
+    changes = "\n".join(_change_lines(part))
+    return make_review_key(
+        f"{repository}\n{normalized}\n{changes}", lang, conventions, REVIEW_PROMPT_VERSION + "/shared3",
+        AZ_OPENAI_ENGINE,
+    )
+
+def _change_lines(part: str) -> list[str]:
+    """diff의 변경(-/+) 라인을 원본 그대로 반환합니다. 경로가 들어 있는 파일 헤더와 '@@' 헤더는 제외합니다."""
+    lines = []
+    in_hunk = False
+    for line in part.split("\n"):
+        if line.startswith("@@"):
+            in_hunk = True
+        elif in_hunk and line[:1] in ("+", "-"):
+            lines.append(line)
+        elif line.startswith("diff --git"):
+            in_hunk = False
+    return lines
+
+def _get_shared_review(shared_key: Optional[str]) -> Optional[tuple[str, str]]:
+    """공유 캐시 키로 저장된 (리뷰한 파일 경로, 리뷰)를 반환합니다. 없으면 None."""
+    if shared_key is None:
+        return None
+    stored = _review_cache.get(shared_key)
+    if stored is None:
+        return None
+    try:
+        entry = json.loads(stored)
+        return entry["filename"], entry["review"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _store_review(filename: str, review: str, cache_key: str, shared_key: Optional[str]):
+    """새로 생성한 리뷰를 청크 키와 (있으면) 공유 키로 캐시에 저장합니다."""
+    if _review_cache is None:
+        return
+    _review_cache.put(cache_key, review)
+    if shared_key is not None:
+        _review_cache.put(shared_key, json.dumps({"filename": filename, "review": review}, ensure_ascii=False))
+
+def _review_multiple_files(lang: str, conventions: str, items: list[tuple]) -> dict[str, str]:
+    """
+    같은 언어의 작은 파일 여러 개를 한 번의 요청으로 리뷰하고, 응답을 파일별로 나눕니다.
 
-    full_review = "\n\n---\n\n".join(reviews)
-    return {"filename": filename, "review": full_review, "language": lang}
+    Args:
+        lang (str): 프로그래밍 언어.
+        conventions (str): 코딩 컨벤션 텍스트.
+        items (list[tuple]): (파일 경로, diff, 변경 유형 설명, 캐시 키, 공유 캐시 키) 목록.
 
-def generate_final_summary(review_results: list[dict]) -> str:
+    Returns:
+        dict[str, str]: 파일 경로 → 리뷰. 실패하거나 섹션을 찾지 못한 파일은 포함되지 않습니다.
+    """
+    filenames = [item[0] for item in items]
+    context = _get_review_context(lang, ", ".join(filenames), "", conventions)
+    diff_sections = "\n\n".join(
+        f"{MULTI_FILE_MARKER} {filename}{note}\n```diff\n{part}\n```" for filename, part, note, _, _ in items
+    )
+    messages = [
+        {"role": "system", "content": _get_review_prompt()},
+        {"role": "user", "content": f"{context}\n{_get_multi_file_instructions(filenames)}\n\n{diff_sections}"}
+    ]
+    try:
+        text = _chat_completion(messages)
+    except RequestCancelled:
+        raise
+    except Exception:
+        traceback.print_exc()
+        return {}
+
+    reviews = split_multi_file_review(text, filenames)
+    for filename, _, _, cache_key, shared_key in items:
+        if filename in reviews:
+            _store_review(filename, reviews[filename], cache_key, shared_key)
+    return reviews
+
+def split_multi_file_review(text: str, filenames: list[str]) -> dict[str, str]:
+    """
+    다중 파일 리뷰 응답을 `### FILE: <경로>` 구분선 기준으로 파일별로 나눕니다.
+
+    Args:
+        text (str): LLM 응답.
+        filenames (list[str]): 요청에 포함된 파일 경로 목록.
+
+    Returns:
+        dict[str, str]: 파일 경로 → 리뷰. 응답에 없는 파일은 포함되지 않습니다.
+    """
+    expected = set(filenames)
+    reviews: dict[str, str] = {}
+    current = None
+    lines: list[str] = []
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith(MULTI_FILE_MARKER):
+            if current in expected and "\n".join(lines).strip():
+                reviews[current] = "\n".join(lines).strip()
+            current = stripped[len(MULTI_FILE_MARKER):].strip().strip("`")
+            lines = []
+        else:
+            lines.append(line)
+    if current in expected and "\n".join(lines).strip():
+        reviews[current] = "\n".join(lines).strip()
+    return reviews
+
+def assemble_file_result(filename: str, lang: str, chunk_reviews: list[dict]) -> dict:
+    """
+    청크별 리뷰를 순서대로 이어 붙여 파일 단위 결과를 만듭니다.
+
+    Args:
+        filename (str): 파일 경로.
+        lang (str): 프로그래밍 언어.
+        chunk_reviews (list[dict]): `review_unit` 결과의 파일별 항목들 ({'chunk_index', 'review', 'error'}).
+
+    Returns:
+        dict: 'filename', 'review', 'language', 'error', 'skipped'(건너뛴 청크가 있는지),
+              'duplicate_of'(모든 청크가 같은 PR의 한 파일 리뷰를 공유하면 그 파일 경로, 아니면 None)를 포함하는 딕셔너리.
+    """
+    ordered = sorted(chunk_reviews, key=lambda r: r["chunk_index"])
+    full_review = "\n\n---\n\n".join(r["review"] for r in ordered)
+    has_error = any(r["error"] for r in ordered)
+    skipped = any(r.get("skipped") for r in ordered)
+    sources = {r.get("shared_with") for r in ordered}
+    duplicate_of = sources.pop() if len(sources) == 1 else None
+    return {"filename": filename, "review": full_review, "language": lang, "error": has_error, "skipped": skipped,
+            "duplicate_of": duplicate_of}
+
+def shared_chunk_review(chunk: dict, representative: str, chunk_index: int) -> dict:
+    """
+    같은 PR에서 같은 변경으로 묶인 대표 파일의 청크 리뷰를 다른 파일의 청크 결과로 옮깁니다.
+
+    Args:
+        chunk (dict): 대표 파일의 청크 결과 ({'chunk_index', 'review', 'error', ...}).
+        representative (str): 실제로 리뷰한 대표 파일 경로.
+        chunk_index (int): 결과를 받을 파일의 청크 번호.
+
+    Returns:
+        dict: 대표 파일을 가리키는 안내와 'shared_with'가 붙은 청크 결과.
+    """
+    notice = f"♻️ `{representative}`와 같은 변경이라 그 파일의 리뷰를 함께 적용합니다."
+    return dict(chunk, chunk_index=chunk_index, review=f"{notice}\n\n{chunk['review']}", shared_with=representative)
+
+def earlier_chunk_review(review: str, source: str, filename: str, chunk_index: int) -> dict:
+    """
+    같은 저장소의 이전 PR에서 리뷰한 같은 변경의 리뷰를 이 파일의 청크 결과로 만듭니다.
+    다른 PR의 파일 경로는 보여주지 않습니다. 안내 문구에 경로를 넣지 않고, 리뷰 본문의 경로는 이 파일 경로로 바꿉니다.
+
+    Args:
+        review (str): 이전 PR에서 저장한 리뷰.
+        source (str): 이전 PR에서 리뷰한 파일 경로.
+        filename (str): 결과를 받을 파일 경로.
+        chunk_index (int): 결과를 받을 파일의 청크 번호.
+
+    Returns:
+        dict: 안내가 붙은 청크 결과 ({'chunk_index', 'review', 'error'}). 'shared_with'는 붙이지 않습니다.
+    """
+    if source != filename:
+        review = review.replace(source, filename)
+        source_name, name = posixpath.basename(source), posixpath.basename(filename)
+        if source_name and source_name != name:
+            review = re.sub(rf"(?<![\w./-]){re.escape(source_name)}(?![\w-])", lambda _: name, review)
+    notice = "♻️ 이 저장소의 이전 PR에서 같은 변경을 리뷰한 결과를 다시 사용합니다."
+    return {"chunk_index": chunk_index, "review": f"{notice}\n\n{review}", "error": False}
+
+def skipped_chunk_review(reason: str) -> str:
+    """중단·시간 제한·예산 소진으로 리뷰하지 않은 청크에 넣을 안내 문구를 만듭니다."""
+    return f"⏭️ 리뷰하지 않음: {STOP_REASON_LABELS.get(reason, reason)}"
+
+def format_skipped_section(skipped: list[str], reason: Optional[str]) -> str:
+    """
+    부분 보고서 끝에 붙일, 리뷰하지 않은 파일 목록 구간을 만듭니다.
+
+    Args:
+        skipped (list[str]): 전체 또는 일부를 리뷰하지 않은 파일 경로.
+        reason (Optional[str]): 건너뛴 사유 (`review_budget.STOP_*`).
+
+    Returns:
+        str: 마크다운 구간. 건너뛴 파일이 없으면 빈 문자열.
+    """
+    if not skipped:
+        return ""
+    label = STOP_REASON_LABELS.get(reason, reason) if reason else "알 수 없음"
+    lines = "\n".join(f"* `{filename}`" for filename in skipped)
+    return (
+        f"\n\n---\n\n## ⏭️ 리뷰하지 않은 파일 ({len(skipped)}개)\n\n"
+        f"> ⚠️ 이 보고서는 부분 보고서입니다. 사유: {label}\n\n{lines}"
+    )
+
+def load_reusable_reviews(owner: str, repo: str, pr_number: int, pr_files: dict[str, dict]) -> tuple[Optional[str], dict[str, dict]]:
+    """
+    같은 PR을 이전에 리뷰한 결과 중, blob SHA와 base 대비 patch가 바뀌지 않은 파일의 결과를 찾습니다.
+    (base가 바뀌어 diff가 달라졌거나 patch를 알 수 없는 파일은 다시 리뷰합니다.)
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        pr_files (dict[str, dict]): `github_util.fetch_pr_files`의 결과 (파일 경로 → {'sha', 'status', 'patch_sha', ...}).
+
+    Returns:
+        tuple[Optional[str], dict[str, dict]]: (이전에 리뷰한 head SHA, 파일 경로 → 재사용할 리뷰 결과).
+    """
+    if _pr_store is None:
+        return None, {}
+    previous = _pr_store.load(owner, repo, pr_number, _review_state_version())
+    if previous is None:
+        return None, {}
+
+    reusable = {}
+    for filename, entry in previous["files"].items():
+        current = pr_files.get(filename)
+        if not current or not current.get("sha") or not current.get("patch_sha"):
+            continue
+        if all(current.get(key) == entry.get(key) for key in ("sha", "status", "patch_sha")):
+            reusable[filename] = entry["result"]
+    return previous["head_sha"], reusable
+
+def save_review_state(owner: str, repo: str, pr_number: int, head_sha: str, pr_files: dict[str, dict], review_results: list[dict]):
+    """
+    이번 실행의 파일별 리뷰 결과를 head SHA와 함께 저장합니다. 오류가 있거나 건너뛴 청크가 있는 결과는 저장하지 않습니다.
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        head_sha (str): 리뷰한 head 커밋 SHA.
+        pr_files (dict[str, dict]): `github_util.fetch_pr_files`의 결과.
+        review_results (list[dict]): 파일별 리뷰 결과.
+    """
+    if _pr_store is None:
+        return
+    files = {}
+    for result in review_results:
+        meta = pr_files.get(result["filename"])
+        if meta is None or result.get("error") or result.get("skipped"):
+            continue
+        stored = {k: v for k, v in result.items() if k not in ("reused", "timing")}
+        files[result["filename"]] = {
+            "sha": meta.get("sha"), "status": meta.get("status"), "patch_sha": meta.get("patch_sha"), "result": stored,
+        }
+    _pr_store.save(owner, repo, pr_number, head_sha, _review_state_version(), files)
+
+def _review_state_version() -> str:
+    """
+    저장된 PR 리뷰 결과의 호환성 버전.
+    프롬프트 버전, 모델, 리뷰할 diff를 바꾸는 설정(컨텍스트 라인 수, 청크 크기)과 압축·분류 규칙 중
+    하나라도 바뀌면 이전 결과를 재사용하지 않습니다.
+    """
+    return ":".join(str(part) for part in (
+        REVIEW_PROMPT_VERSION, AZ_OPENAI_ENGINE, REVIEW_DIFF_CONTEXT_LINES, REVIEW_CHUNK_MAX_TOKENS,
+        COMPACTION_VERSION, TRIAGE_RULES_VERSION,
+    ))
+
+def get_review_cache_stats() -> Optional[dict]:
+    """청크 리뷰 캐시의 적중 통계를 반환합니다. 캐시가 비활성화되어 있으면 None을 반환합니다."""
+    return _review_cache.stats() if _review_cache is not None else None
+
+def format_review_section(result: dict) -> str:
+    """
+    파일 리뷰 결과 하나를 요약 요청에 넣을 마크다운 구간으로 만듭니다.
+    다른 파일의 리뷰를 공유한 결과는 같은 내용을 되풀이하지 않고 대표 파일만 가리킵니다.
+    """
+    if result.get("duplicate_of"):
+        return (f"### 📄 파일: {result['filename']} ({result['language']})\n\n"
+                f"♻️ `{result['duplicate_of']}`와 같은 변경 (리뷰는 해당 파일 참고)\n\n---\n\n")
+    return f"### 📄 파일: {result['filename']} ({result['language']})\n\n{result['review']}\n\n---\n\n"
+
+def format_partial_section(title: str, summary: str) -> str:
+    """부분 요약 하나를 상위 요약 요청에 넣을 마크다운 구간으로 만듭니다."""
+    return f"### 📁 그룹 요약: {title}\n\n{summary}\n\n---\n\n"
+
+@functools.lru_cache(maxsize=1)
+def get_summary_token_budget() -> int:
+    """
+    최종 요약 요청 하나에 넣을 리뷰 텍스트의 최대 토큰 수를 계산합니다.
+    배포의 컨텍스트 한도에서 출력 토큰과 시스템 프롬프트를 뺀 값과 설정값 중 작은 값입니다.
+
+    Returns:
+        int: 요약 입력 토큰 예산.
+    """
+    prompt_tokens = count_tokens(_get_summary_prompt())
+    available = AZ_OPENAI_CONTEXT_TOKENS - AZ_OPENAI_MAX_OUTPUT_TOKENS - prompt_tokens - PROMPT_TOKEN_MARGIN
+    return max(min(SUMMARY_INPUT_MAX_TOKENS, available), 1024)
+
+@traced("summary.partial")
+def summarize_partial(title: str, sections: list[str]) -> str:
+    """
+    파일 리뷰(또는 하위 그룹 요약) 묶음을 하나의 부분 요약으로 압축합니다. (map-reduce 요약의 map 단계)
+
+    Args:
+        title (str): 그룹 이름 (예: 디렉터리 경로).
+        sections (list[str]): `format_review_section`/`format_partial_section`으로 만든 구간 목록.
+
+    Returns:
+        str: 부분 요약 (마크다운).
+
+    Raises:
+        Exception: LLM 호출에 실패한 경우. 호출한 쪽에서 원문을 그대로 사용하도록 처리합니다.
+    """
+    messages = [
+        {"role": "system", "content": _get_partial_summary_prompt()},
+        {"role": "user", "content": f"다음은 `{title}` 그룹의 리뷰들입니다. 요약해주세요:\n\n{''.join(sections)}"}
+    ]
+    return _chat_completion(messages, temperature=0.3, max_tokens=PARTIAL_SUMMARY_MAX_TOKENS)
+
+@traced("summary.final")
+def generate_final_summary(review_results: list[dict], partial_summaries: Optional[list[tuple[str, str]]] = None,
+                           on_delta: Optional[Callable[[str], None]] = None, skipped: Optional[list[str]] = None) -> str:
     """
     개별 파일 리뷰 결과를 종합하여 최종 요약 및 총평을 생성합니다.
+    큰 PR에서는 일부 파일 리뷰가 그룹별 부분 요약으로 미리 압축되어 전달됩니다. (`review_engine.SummaryRun` 참고)
 
     Args:
-        review_results (list[dict]): 각 파일별 리뷰 결과를 담은 딕셔너리 리스트.
+        review_results (list[dict]): 부분 요약에 포함되지 않은 파일별 리뷰 결과 리스트.
+        partial_summaries (Optional[list[tuple[str, str]]]): (그룹 이름, 부분 요약) 목록.
+        on_delta (Optional[Callable[[str], None]]): 보고서를 스트리밍으로 받을 콜백.
+        skipped (Optional[list[str]]): 리뷰하지 못한 파일 경로. 있으면 부분 리뷰임을 요청에 명시합니다.
 
     Returns:
         str: PR에 대한 최종 분석 보고서 (마크다운 형식).
+
+    Raises:
+        RequestCancelled: 리뷰가 중단되어 요청이 취소된 경우.
     """
-    if not review_results:
+    partial_summaries = partial_summaries or []
+    if not review_results and not partial_summaries:
         return "리뷰할 내용이 없습니다."
 
-    individual_reviews_text = ""
-    for result in review_results:
-        individual_reviews_text += f"### 📄 파일: {result['filename']} ({result['language']})\n\n{result['review']}\n\n---\n\n"
+    individual_reviews_text = "".join(format_partial_section(title, summary) for title, summary in partial_summaries)
+    individual_reviews_text += "".join(format_review_section(result) for result in review_results)
+    if skipped:
+        individual_reviews_text += (
+            "※ 다음 파일은 시간/예산 제한으로 리뷰하지 못했습니다. 보고서에서 이 파일들에 대해 단정하지 말고, "
+            "리뷰되지 않았음을 언급해주세요:\n" + "\n".join(f"- {filename}" for filename in skipped)
+        )
 
     system_prompt = _get_summary_prompt()
     messages = [
@@ -138,12 +810,13 @@ def generate_final_summary(review_results: list[dict]) -> str:
     ]
 
     try:
-        response = llm.chat.completions.create(
-            model=AZ_OPENAI_ENGINE,
+        return _chat_completion(
             messages=messages,
+            on_delta=on_delta,
             temperature=0.5,
         )
-        return response.choices[0].message.content
+    except RequestCancelled:
+        raise
     except Exception as e:
         error_message = f"최종 요약 생성 중 오류 발생: {e}"
         traceback.print_exc()
@@ -151,39 +824,54 @@ def generate_final_summary(review_results: list[dict]) -> str:
 
 # --- 프롬프트 및 헬퍼 함수 ---
 
-def _split_diff_into_chunks(diff_content: str, max_length: int = 10000) -> list[str]:
-    """대용량 diff를 hunk 단위로 분할합니다."""
-    if len(diff_content) <= max_length:
-        return [diff_content]
+def _get_skip_reason(file_diff: FileDiff) -> Optional[str]:
+    """리뷰할 코드 라인이 없는 파일이면 그 사유를, 아니면 None을 반환합니다."""
+    if file_diff.is_binary:
+        return "✅ 바이너리 파일이므로 코드 리뷰를 건너뜁니다."
+    if file_diff.status == "deleted":
+        return f"🗑️ 파일이 삭제되었습니다. (삭제된 라인 {file_diff.removed}개)"
+    if not file_diff.hunks:
+        if file_diff.status == "renamed":
+            return f"✅ 내용 변경 없이 파일 이름만 변경되었습니다. (`{file_diff.old_filename}` → `{file_diff.filename}`)"
+        return "✅ 코드 변경 내용이 없어 리뷰를 건너뜁니다. (모드 변경 등)"
+    return None
+
+def _describe_file_change(file_diff: FileDiff) -> str:
+    """프롬프트에 덧붙일 파일 변경 유형 설명을 생성합니다. 일반 수정이면 빈 문자열을 반환합니다."""
+    if file_diff.status == "added":
+        return " (새로 추가된 파일)"
+    if file_diff.status in ("renamed", "copied") and file_diff.old_filename:
+        action = "이름 변경" if file_diff.status == "renamed" else "복사"
+        return f" (`{file_diff.old_filename}`에서 {action}된 파일)"
+    return ""
+
+def _get_review_prompt() -> str:
+    """
+    파일 리뷰의 시스템 프롬프트를 반환합니다.
+    언어·파일 이름·컨벤션 등 요청마다 바뀌는 내용은 `_get_review_context`로 사용자 메시지에 넣어,
+    이 프롬프트가 모든 요청에서 바이트 단위로 같은 접두어가 되도록 합니다. (서버 측 프롬프트 캐시 적중)
+    """
+    return _REVIEW_SYSTEM_PROMPT
 
-    header_match = re.match(r'diff --git.*?\n(--- a/.*?\n\+\+\+ b/.*?\n)', diff_content, re.DOTALL)
-    header = header_match.group(0) if header_match else ''
-    hunks = re.split(r'(?=^@@ .*? @@)', diff_content, flags=re.MULTILINE)
-    
-    code_chunks = []
-    current_chunk = ""
-    # 첫 번째 요소는 diff 헤더이므로, 실제 hunk가 포함된 hunks[1:] 부터 처리
-    for hunk in hunks[1:]:
-        if len(current_chunk) + len(hunk) > max_length and current_chunk:
-            code_chunks.append(header + current_chunk)
-            current_chunk = hunk
-        else:
-            current_chunk += hunk
-    if current_chunk:
-        code_chunks.append(header + current_chunk)
-    
-    return code_chunks
+def _get_review_context(lang: str, filename: str, chunk_info: str, conventions: str) -> str:
+    """리뷰 요청마다 바뀌는 내용(언어, 파일 이름, 코딩 컨벤션)을 사용자 메시지 앞부분으로 만듭니다."""
+    return f"""**Review Target**: '{filename}{chunk_info}' ({lang})
+
+**[Required] Provided '{lang}' Coding Conventions:**
+{conventions}
+*If the convention content is empty, please review based on the general best practices you have learned.*
 
-def _get_review_prompt(lang: str, filename: str, chunk_info: str, conventions: str) -> str:
-    """개별 파일 리뷰를 위한 시스템 프롬프트를 생성합니다."""
-    return f"""
-    You are a **senior software engineer specializing in {lang}**, performing a code review. Your goal is not merely to criticize the code, but to provide constructive feedback that helps your fellow developers grow.
+---
+"""
 
-    Systematically analyze the diff of the '{filename}{chunk_info}' file and write a review according to the following steps:
+_REVIEW_SYSTEM_PROMPT = """
+    You are a **senior software engineer specializing in the programming language given as the Review Target**, performing a code review. Your goal is not merely to criticize the code, but to provide constructive feedback that helps your fellow developers grow.
+
+    Systematically analyze the diff of the Review Target file(s) in the request and write a review according to the following steps:
 
     **5 Steps for Writing a Review:**
     1. **Understand Intent**: Grasp the overall purpose of the code changes (-, + lines).
-    2. **Compare to Conventions**: Systematically compare the changed code with the provided '{lang} Coding Conventions'.
+    2. **Compare to Conventions**: Systematically compare the changed code with the Coding Conventions provided in the request.
     3. **Core Analysis**: Identify issues from the perspectives of readability, performance, maintainability, potential bugs, and security. Specifically, focus on checking for side effects that might arise from the changed parts.
     4. **Structure Feedback**: Based on the analysis, draft a review according to the **"Review Template"** below.
     5. **Final Review**: Review the draft to refine it with a positive and constructive tone, and ensure that any suggested code is syntactically correct.
@@ -191,12 +879,6 @@ def _get_review_prompt(lang: str, filename: str, chunk_info: str, conventions: s
     Make sure to answer in Korean.
     ---
 
-    **[Required] Provided '{lang}' Coding Conventions:**
-    {conventions}
-    *If the convention content is empty, please review based on the general best practices you have learned.*
-
-    ---
-
     **[Required] Review Template (Please respond only in this format):**
 
     #### 🔒 Security & Secrets Check
@@ -234,6 +916,16 @@ def _get_review_prompt(lang: str, filename: str, chunk_info: str, conventions: s
     make sure to answer in 한국말.
     """
 
+def _get_multi_file_instructions(filenames: list[str]) -> str:
+    """여러 파일을 한 번에 리뷰할 때 사용자 메시지 앞에 붙이는 응답 형식 지시문을 생성합니다."""
+    file_list = "\n".join(f"- {name}" for name in filenames)
+    return f"""다음 {len(filenames)}개 파일의 코드 변경 사항을 각각 리뷰해주세요:
+{file_list}
+
+Review each file independently using the Review Template.
+Start each file's review with a line containing exactly `{MULTI_FILE_MARKER} <file path>` (the path exactly as listed above), and do not use that marker anywhere else.
+Every listed file must have its own section, in the same order."""
+
 def _get_summary_prompt() -> str:
     """최종 요약을 위한 시스템 프롬프트를 생성합니다."""
     return """
@@ -257,3 +949,17 @@ def _get_summary_prompt() -> str:
 
     결과는 반드시 한국어 마크다운 형식으로 작성해주세요.
     """
+
+def _get_partial_summary_prompt() -> str:
+    """그룹별 부분 요약(map 단계)을 위한 시스템 프롬프트를 생성합니다."""
+    return """
+    You are a **Tech Lead** preparing notes for the final review report of a large Pull Request.
+    You will receive code reviews for one group of files (or summaries of smaller groups). Condense them into compact notes that will later be merged with the notes of other groups.
+
+    * **Key Changes**: What the changes in this group do, in 1-3 bullet points.
+    * **Issues**: Every issue worth reporting, each tagged `Critical`, `Major` or `Minor`, with the file name it belongs to. Do not drop `Critical` or `Major` issues.
+    * **Patterns**: Positive or negative patterns repeated across several files.
+
+    Be concise and do not add issues that are not in the reviews.
+    결과는 반드시 한국어 마크다운 형식으로 작성해주세요.
+    """
@@ -0,0 +1,302 @@
+import time
+import traceback
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+from typing import Iterable, Iterator, Optional
+
+from config import DIFF_STREAMING, REVIEW_MAX_WORKERS
+from diff_parser import FileDiff, iter_parse_diff, parse_diff
+from file_triage import GitAttributes
+from github_util import fetch_gitattributes, fetch_pr_diff, fetch_pr_files, fetch_pr_head_sha, stream_pr_diff
+from llm_scheduler import RequestCancelled, current_session, run_in_session
+from review_budget import ReviewBudget
+from review_engine import ReviewRun, StreamBuffer, SummaryRun
+from review_generator import format_skipped_section, load_reusable_reviews, save_review_state
+from task_pool import PriorityThreadPool
+from telemetry import Trace, record_span, span, trace_scope, warn
+
+# 스트리밍 중인 리뷰를 관찰자에게 전달하는 최소 간격(초)
+DEFAULT_POLL_INTERVAL = 0.3
+
+
+class ReviewObserver:
+    """
+    `review_pull_request`의 진행 상황을 받는 콜백 모음입니다. 기본 구현은 아무것도 하지 않습니다.
+    모든 콜백은 `review_pull_request`를 호출한 스레드에서 호출되므로, UI를 직접 갱신해도 됩니다.
+    """
+
+    def on_start(self, report: dict):
+        """증분 리뷰 정보(이전 head, 재사용할 파일 수)를 확인한 뒤 호출됩니다."""
+
+    def on_file_started(self, filename: str):
+        """파일을 리뷰 대상으로 제출했을 때 호출됩니다."""
+
+    def on_streaming(self, updates: dict[str, str]):
+        """스트리밍 중인 파일들의 중간 리뷰 (파일 경로 → 지금까지의 텍스트)."""
+
+    def on_file_done(self, result: dict):
+        """파일 리뷰가 끝났을 때 호출됩니다. 이전 결과를 재사용한 파일은 `result['reused']`가 True입니다."""
+
+    def on_fetch_error(self, error: Exception):
+        """diff 다운로드가 중간에 실패했을 때 호출됩니다. 이미 제출한 리뷰는 마저 끝납니다."""
+
+    def on_reviews_done(self, report: dict):
+        """모든 파일 리뷰가 끝나고 최종 보고서 생성을 시작하기 직전에 호출됩니다."""
+
+    def on_summary_progress(self, text: str):
+        """스트리밍 중인 최종 보고서 (지금까지의 텍스트)."""
+
+
+def review_pull_request(owner: str, repo: str, pr_number: int, github_token: str, *,
+                        file_diffs: Optional[Iterable[FileDiff]] = None,
+                        use_cache: bool = True,
+                        executor: Optional[Executor] = None,
+                        session_id: Optional[str] = None,
+                        observer: Optional[ReviewObserver] = None,
+                        poll_interval: float = DEFAULT_POLL_INTERVAL,
+                        budget: Optional[ReviewBudget] = None,
+                        trace: Optional[Trace] = None) -> dict:
+    """
+    PR 하나를 리뷰하고 최종 보고서까지 생성합니다. (UI와 무관한 리뷰 파이프라인)
+
+    1. 마지막으로 리뷰한 head 이후 blob이 바뀌지 않은 파일은 이전 결과를 재사용합니다.
+    2. diff를 (스트리밍으로) 받으며 파일별 리뷰를 제출하고, 완료된 결과를 map-reduce 요약기에 넘깁니다.
+    3. 파일별 결과를 저장한 뒤 최종 보고서를 생성합니다.
+
+    시간 제한이나 토큰/비용 예산 때문에 리뷰하지 못한 파일이 있으면, 끝난 결과만으로 부분 보고서를 만들고
+    보고서 끝에 건너뛴 파일을 표시합니다. `budget.cancel()`로 중단하면 최종 보고서를 만들지 않습니다.
+
+    Args:
+        owner (str): 저장소 소유자.
+        repo (str): 저장소 이름.
+        pr_number (int): Pull Request 번호.
+        github_token (str): GitHub 개인 접근 토큰(PAT).
+        file_diffs (Optional[Iterable[FileDiff]]): 이미 준비된 파일 diff. 없으면 GitHub에서 가져옵니다.
+        use_cache (bool): 청크 리뷰 캐시 및 이전 PR 리뷰 결과 재사용 여부.
+        executor (Optional[Executor]): 리뷰 단위를 실행할 풀. 없으면 `REVIEW_MAX_WORKERS` 크기로 만듭니다.
+        session_id (Optional[str]): LLM 스케줄러의 공정 큐잉 단위. 없으면 현재 `session_scope`의 세션.
+        observer (Optional[ReviewObserver]): 진행 상황 콜백.
+        poll_interval (float): 스트리밍 중간 결과를 전달하는 주기(초).
+        budget (Optional[ReviewBudget]): 중단·시간 제한·토큰/비용 예산. 없으면 환경 변수 설정으로 만듭니다.
+        trace (Optional[Trace]): 단계별 구간과 LLM 호출을 기록할 트레이스. 없으면 새로 만듭니다.
+            (진행 중에 `trace.breakdown()`으로 지금까지의 시간 분석을 볼 수 있습니다.)
+
+    Returns:
+        dict: 'owner', 'repo', 'pr_number', 'head_sha', 'previous_head', 'reused', 'file_count',
+              'files'(파일별 결과), 'summary'(최종 보고서 또는 None), 'fetch_error', 'map_count', 'reduce_count',
+              'summary_timing', 'skipped'(리뷰하지 못한 파일), 'stop_reason', 'cancelled',
+              'usage'(`ReviewBudget.snapshot`), 'triage'(LLM 리뷰 전에 걸러낸 파일 수와 아낀 요청·토큰 수),
+              'compaction'(diff 압축 전후 토큰 수 등 `ReviewRun.compaction`),
+              'dedup'(같은 변경을 한 번만 리뷰해 생략한 단위 수 등 `ReviewRun.dedup`), 'elapsed'(초),
+              'trace'(단계별 시간과 LLM 사용량, `Trace.breakdown`),
+              'warnings'(워커 스레드에서 발생한 사용자 경고)를 포함하는 딕셔너리.
+    """
+    trace = trace or Trace("review", owner=owner, repo=repo, pr_number=pr_number)
+    with trace_scope(trace):
+        try:
+            report = _review_pull_request(
+                owner, repo, pr_number, github_token, file_diffs=file_diffs, use_cache=use_cache, executor=executor,
+                session_id=session_id, observer=observer, poll_interval=poll_interval, budget=budget,
+            )
+        except BaseException:
+            trace.finish("failed")
+            raise
+    report["warnings"] = trace.warnings
+    report["trace"] = trace.finish(_trace_status(report), head_sha=report["head_sha"], files=report["file_count"])
+    return report
+
+
+def _trace_status(report: dict) -> str:
+    if report["cancelled"]:
+        return "cancelled"
+    if report["fetch_error"]:
+        return "fetch_error"
+    if report["skipped"]:
+        return "partial"
+    return "ok"
+
+
+def _review_pull_request(owner: str, repo: str, pr_number: int, github_token: str, *,
+                         file_diffs: Optional[Iterable[FileDiff]], use_cache: bool, executor: Optional[Executor],
+                         session_id: Optional[str], observer: Optional[ReviewObserver], poll_interval: float,
+                         budget: Optional[ReviewBudget]) -> dict:
+    observer = observer or ReviewObserver()
+    session_id = session_id or current_session()
+    budget = budget or ReviewBudget.from_config()
+    started = time.monotonic()
+    report = {
+        "owner": owner, "repo": repo, "pr_number": pr_number,
+        "head_sha": None, "previous_head": None, "reused": 0, "file_count": 0,
+        "files": [], "summary": None, "fetch_error": None,
+        "map_count": 0, "reduce_count": 0, "summary_timing": None,
+        "skipped": [], "stop_reason": None, "cancelled": False, "usage": None,
+        "triage": {"files": 0, "calls_saved": 0, "tokens_saved": 0}, "compaction": None, "dedup": None,
+        "elapsed": 0.0, "trace": None, "warnings": [],
+    }
+
+    # 이전 리뷰 이후 blob이 바뀌지 않은 파일은 결과를 재사용
+    head_sha, pr_files, reusable = None, {}, {}
+    try:
+        with span("incremental"):
+            head_sha = fetch_pr_head_sha(owner, repo, pr_number, github_token)
+            pr_files = fetch_pr_files(owner, repo, pr_number, github_token)
+            if use_cache:
+                report["previous_head"], reusable = load_reusable_reviews(owner, repo, pr_number, pr_files)
+    except Exception:
+        # 증분 리뷰 정보를 가져오지 못해도 전체 리뷰는 계속 진행
+        traceback.print_exc()
+        head_sha, pr_files, reusable = None, {}, {}
+        report["previous_head"] = None
+    report["head_sha"] = head_sha
+    report["reused"] = len(reusable)
+
+    # linguist-generated/linguist-vendored 속성은 PR head의 .gitattributes에서 한 번만 읽음
+    attributes = None
+    if head_sha:
+        try:
+            with span("gitattributes"):
+                attributes = GitAttributes.parse(fetch_gitattributes(owner, repo, head_sha, github_token))
+        except Exception:
+            traceback.print_exc()
+    observer.on_start(report)
+
+    if file_diffs is None:
+        file_diffs = _fetch_file_diffs(owner, repo, pr_number, github_token)
+    # 다음 파일 diff를 기다린 시간(다운로드·파싱)을 'diff' 단계로 기록
+    file_diffs = _timed_iter(file_diffs, "diff")
+
+    own_executor = executor is None
+    if own_executor:
+        executor = PriorityThreadPool(REVIEW_MAX_WORKERS)
+    try:
+        # 완료된 파일 리뷰는 디렉터리별로 모아 리뷰가 진행되는 동안 부분 요약을 미리 생성
+        summary = SummaryRun(executor, session_id=session_id, budget=budget)
+        run = ReviewRun(
+            executor, use_cache=use_cache, session_id=session_id, budget=budget, attributes=attributes,
+            repository=f"{owner}/{repo}",
+        )
+
+        def file_done(result: dict):
+            report["files"].append(result)
+            triage = result.get("triage")
+            if triage and not result.get("reused"):
+                report["triage"]["files"] += 1
+                report["triage"]["calls_saved"] += triage["calls_saved"]
+                report["triage"]["tokens_saved"] += triage["tokens_saved"]
+            summary.add_result(result)
+            observer.on_file_done(result)
+
+        def push_streaming():
+            updates = run.poll_streaming()
+            if updates:
+                observer.on_streaming(updates)
+
+        last_refresh = time.monotonic()
+        try:
+            for file_diff in file_diffs:
+                if budget.cancelled:
+                    # 중단되면 diff를 더 받지 않음
+                    break
+                report["file_count"] += 1
+                filename = file_diff.filename
+                if filename in reusable:
+                    file_done(dict(reusable[filename], reused=True))
+                    continue
+
+                observer.on_file_started(filename)
+                immediate = run.add_file(file_diff)
+                if immediate is not None:
+                    file_done(immediate)
+
+                # diff를 받는 동안 이미 끝난 리뷰와 스트리밍 중인 리뷰를 바로 전달
+                for result in run.poll_completed():
+                    file_done(result)
+                if time.monotonic() - last_refresh >= poll_interval:
+                    push_streaming()
+                    last_refresh = time.monotonic()
+        except Exception as e:
+            # diff 다운로드가 중간에 실패하면 이미 제출한 리뷰만 마저 끝내고 최종 보고서는 만들지 않음
+            traceback.print_exc()
+            report["fetch_error"] = str(e)
+            observer.on_fetch_error(e)
+        finally:
+            file_diffs.close()
+
+        run.close()
+        for result in run.iter_completed(timeout=poll_interval):
+            if result is None:
+                push_streaming()
+                continue
+            file_done(result)
+
+        report["skipped"] = sorted(r["filename"] for r in report["files"] if r.get("skipped"))
+        report["stop_reason"] = run.skip_reason
+        report["compaction"] = dict(run.compaction)
+        report["dedup"] = dict(run.dedup)
+        report["cancelled"] = budget.cancelled
+        if report["fetch_error"] or report["file_count"] == 0 or budget.cancelled:
+            return report
+
+        if head_sha:
+            try:
+                with span("save_state"):
+                    # head SHA·파일 목록·diff는 따로 받으므로, 그 사이 새 커밋이 푸시되었으면 diff가 head SHA와
+                    # 맞지 않을 수 있음. 이 상태를 저장하면 다음 리뷰가 잘못된 결과를 재사용하므로 저장하지 않음
+                    current_head = fetch_pr_head_sha(owner, repo, pr_number, github_token)
+                    if current_head == head_sha:
+                        save_review_state(owner, repo, pr_number, head_sha, pr_files, report["files"])
+                    else:
+                        warn("리뷰하는 동안 PR에 새 커밋이 푸시되어 증분 재리뷰용 상태를 저장하지 않았습니다.")
+            except Exception:
+                traceback.print_exc()
+        observer.on_reviews_done(report)
+
+        # 남은 리뷰와 부분 요약을 합쳐 최종 보고서 생성.
+        # 별도 스레드에서 생성하고, 호출한 스레드는 스트리밍된 보고서를 주기적으로 전달
+        buffer = StreamBuffer()
+        with ThreadPoolExecutor(max_workers=1) as finisher:
+            future = finisher.submit(run_in_session, session_id, summary.finish, buffer.append, report["skipped"])
+            while not wait([future], timeout=poll_interval).done:
+                partial = buffer.poll()
+                if partial is not None:
+                    observer.on_summary_progress(partial)
+            try:
+                report["summary"] = future.result() + format_skipped_section(report["skipped"], report["stop_reason"])
+            except RequestCancelled:
+                report["cancelled"] = True
+                return report
+        report["map_count"] = summary.map_count
+        report["reduce_count"] = summary.reduce_count
+        report["summary_timing"] = buffer.timing()
+        return report
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True)
+        budget.close()
+        report["usage"] = budget.snapshot()
+        report["elapsed"] = time.monotonic() - started
+
+
+def _timed_iter(items: Iterable, stage: str) -> Iterator:
+    """반복자에서 다음 항목을 기다린 시간을 합산해, 반복이 끝나거나 닫힐 때 한 번의 구간으로 기록합니다."""
+    waited = 0.0
+    iterator = iter(items)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.perf_counter() - start
+            yield item
+    finally:
+        record_span(stage, waited)
+
+
+def _fetch_file_diffs(owner: str, repo: str, pr_number: int, github_token: str) -> Iterator[FileDiff]:
+    """GitHub에서 PR diff를 가져와 파일별로 반환합니다. 스트리밍 모드에서는 다운로드하면서 반환합니다."""
+    if DIFF_STREAMING:
+        yield from iter_parse_diff(stream_pr_diff(owner, repo, pr_number, github_token))
+    else:
+        yield from parse_diff(fetch_pr_diff(owner, repo, pr_number, github_token))
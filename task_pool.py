@@ -0,0 +1,90 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable
+
+
+class PriorityThreadPool(Executor):
+    """
+    우선순위가 높은 작업부터 실행하는 스레드 풀입니다.
+
+    LLM 호출처럼 I/O 대기가 대부분인 작업을 위해 워커 수를 CPU 수와 무관하게 지정할 수 있으며,
+    예상 비용(토큰 수)을 우선순위로 주면 가장 긴 작업부터 실행하는 LPT(Longest Processing Time first)
+    스케줄링이 되어 전체 완료 시간(makespan)을 줄입니다. 우선순위가 같으면 제출 순서대로 실행합니다.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "review-worker"):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        """우선순위 0으로 작업을 제출합니다."""
+        return self.submit_with_priority(0, fn, *args, **kwargs)
+
+    def submit_with_priority(self, priority: float, fn: Callable, /, *args, **kwargs) -> Future:
+        """
+        우선순위를 지정하여 작업을 제출합니다.
+
+        Args:
+            priority (float): 클수록 먼저 실행됩니다 (예: 예상 토큰 수).
+            fn (Callable): 실행할 함수.
+
+        Returns:
+            Future: 작업 결과.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queue.put((-priority, next(self._counter), future, fn, args, kwargs))
+            self._ensure_workers()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    item[2].cancel()
+            threads = list(self._threads)
+            # 워커마다 종료 표식을 하나씩 넣음 (가장 낮은 우선순위로 정렬되도록 +inf)
+            for _ in threads:
+                self._queue.put((float("inf"), next(self._counter), None, None, None, None))
+        if wait:
+            for t in threads:
+                t.join()
+
+    def _ensure_workers(self):
+        # 작업이 제출될 때마다 최대 개수까지 워커를 하나씩 늘림 (self._lock 보유 상태에서 호출)
+        if len(self._threads) < self._max_workers:
+            t = threading.Thread(
+                target=self._worker, name=f"{self._thread_name_prefix}-{len(self._threads)}", daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            _, _, future, fn, args, kwargs = self._queue.get()
+            if future is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
@@ -0,0 +1,434 @@
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+# Prometheus 히스토그램 구간(초)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+METRIC_PREFIX = "codereview"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("review_trace", default=None)
+# 현재 실행 중인 단계 이름. LLM 호출은 이 단계로 집계됩니다.
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("review_stage", default="")
+
+
+@contextlib.contextmanager
+def trace_scope(trace: Optional["Trace"]):
+    """블록 안에서 기록하는 구간(span)과 LLM 호출을 지정한 트레이스에도 기록합니다."""
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional["Trace"]:
+    """현재 스레드(작업)의 트레이스를 반환합니다. 없으면 None."""
+    return _current_trace.get()
+
+
+class Trace:
+    """
+    PR 리뷰 하나의 단계별 구간(span)과 LLM 호출 기록입니다. (모든 메서드는 스레드 안전)
+
+    워커 스레드의 구간은 겹쳐서 실행되므로, 단계별 합계는 벽시계 시간이 아니라 누적 시간입니다.
+    워커 스레드에서 사용자에게 알릴 경고(`warn`)도 모아 두며, UI는 메인 스레드에서 이를 표시합니다.
+    캐시 적중·언어 감지 등 리뷰 하나의 횟수 통계(`count`)도 여기에 모읍니다.
+    (프로세스 전역 통계의 차이로 계산하면 동시에 실행되는 다른 리뷰의 값이 섞이기 때문입니다.)
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self._lock = threading.Lock()
+        self._spans: list[dict] = []
+        self._calls: list[dict] = []
+        self._warnings: list[str] = []
+        self._counters: dict[str, float] = {}
+
+    def add_span(self, name: str, start: float, duration: float, attrs: dict):
+        with self._lock:
+            self._spans.append({
+                "name": name, "start": round(start - self._t0, 6), "duration": round(duration, 6),
+                "thread": threading.current_thread().name, **attrs,
+            })
+
+    def add_call(self, call: dict):
+        with self._lock:
+            self._calls.append(dict(call, start=round(call["start"] - self._t0, 6)))
+
+    def add_warning(self, message: str):
+        with self._lock:
+            if message not in self._warnings:
+                self._warnings.append(message)
+
+    def add_count(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def counters(self) -> dict[str, float]:
+        """지금까지 모은 횟수 통계 ({이름: 값})."""
+        with self._lock:
+            return dict(self._counters)
+
+    @property
+    def warnings(self) -> list[str]:
+        """지금까지 모은 경고 메시지 (중복 제외, 발생 순서)."""
+        with self._lock:
+            return list(self._warnings)
+
+    @property
+    def elapsed(self) -> float:
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._t0
+
+    def breakdown(self) -> dict:
+        """
+        단계별 소요 시간과 LLM 사용량을 집계합니다.
+
+        Returns:
+            dict: 'wall'(경과 시간, 초),
+                  'stages'(누적 시간이 큰 순서의 [{'stage', 'count', 'total', 'max'}]),
+                  'llm'({'calls', 'errors', 'latency', 'queue_wait', 'prompt_tokens', 'completion_tokens', 'cost',
+                         'by_stage': {단계: 같은 항목}}).
+        """
+        with self._lock:
+            spans, calls = list(self._spans), list(self._calls)
+        stages: dict[str, dict] = {}
+        for s in spans:
+            entry = stages.setdefault(s["name"], {"stage": s["name"], "count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += s["duration"]
+            entry["max"] = max(entry["max"], s["duration"])
+        llm = _empty_llm_totals()
+        llm["by_stage"] = {}
+        for call in calls:
+            for totals in (llm, llm["by_stage"].setdefault(call["stage"], _empty_llm_totals())):
+                totals["calls"] += 1
+                totals["errors"] += 1 if call["status"] != "ok" else 0
+                totals["latency"] += call["latency"]
+                totals["queue_wait"] += call["queue_wait"]
+                totals["prompt_tokens"] += call["prompt_tokens"]
+                totals["completion_tokens"] += call["completion_tokens"]
+                totals["cost"] += call["cost"]
+        return {
+            "wall": self.elapsed,
+            "stages": sorted(stages.values(), key=lambda e: e["total"], reverse=True),
+            "llm": llm,
+        }
+
+    def finish(self, status: str = "ok", **attrs) -> dict:
+        """
+        트레이스를 끝내고 집계 결과를 반환합니다. `TRACE_JSONL_PATH`가 설정되어 있으면 한 줄로 기록합니다.
+
+        Args:
+            status (str): 리뷰 결과 ('ok', 'cancelled', 'failed' 등). 프로세스 지표의 레이블로 사용합니다.
+            **attrs: 트레이스에 덧붙일 속성 (파일 수 등).
+
+        Returns:
+            dict: `breakdown()` 결과.
+        """
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._t0
+        self.attrs.update(attrs)
+        breakdown = self.breakdown()
+        _metrics.observe_review(status, self._elapsed)
+        try:
+            from config import TRACE_JSONL_PATH
+            if TRACE_JSONL_PATH:
+                with self._lock:
+                    record = {
+                        "trace_id": self.trace_id, "name": self.name, "status": status, "attrs": self.attrs,
+                        "started_at": self.started_at, "wall": self._elapsed, "breakdown": breakdown,
+                        "spans": self._spans, "llm_calls": self._calls, "warnings": self._warnings,
+                        "counters": self._counters,
+                    }
+                _append_jsonl(TRACE_JSONL_PATH, record)
+        except Exception:
+            traceback.print_exc()
+        return breakdown
+
+
+def _empty_llm_totals() -> dict:
+    return {"calls": 0, "errors": 0, "latency": 0.0, "queue_wait": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+
+
+_jsonl_lock = threading.Lock()
+
+
+def _append_jsonl(path: str, record: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _jsonl_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextlib.contextmanager
+def span(name: str, **attrs):
+    """
+    블록의 실행 시간을 단계(`name`)의 구간으로 기록합니다. 현재 트레이스와 프로세스 지표에 함께 반영됩니다.
+    블록 안에서 보낸 LLM 호출은 이 단계로 집계됩니다.
+    """
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _current_stage.reset(token)
+        _record_span(name, start, duration, attrs)
+
+
+def traced(name: str) -> Callable:
+    """함수 호출을 `span(name)`으로 감싸는 데코레이터."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, duration: float, **attrs):
+    """이미 측정한 시간(초)을 단계의 구간으로 기록합니다. (예: HTTP 응답 지연 시간)"""
+    _record_span(name, time.perf_counter() - duration, duration, attrs)
+
+
+def _record_span(name: str, start: float, duration: float, attrs: dict):
+    _metrics.observe_stage(name, duration)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start, duration, attrs)
+
+
+def warn(message: str):
+    """
+    사용자에게 알릴 경고를 현재 트레이스에 기록합니다. 워커 스레드에서도 호출할 수 있습니다.
+    (Streamlit 함수는 스크립트 실행 컨텍스트가 없는 스레드에서 호출할 수 없으므로, 화면 표시는 메인 스레드가 맡습니다.)
+    트레이스가 없으면 표준 오류로 출력합니다.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_warning(message)
+    else:
+        print(f"경고: {message}", file=sys.stderr)
+
+
+def count(name: str, amount: float = 1):
+    """현재 트레이스의 횟수 통계 `name`에 `amount`를 더합니다. 트레이스가 없으면 아무것도 하지 않습니다."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, amount)
+
+
+def record_llm_call(latency: float, queue_wait: float, prompt_tokens: int, completion_tokens: int, cost: float,
+                    status: str = "ok", streamed: bool = False, estimated: bool = False, retries: int = 0):
+    """
+    LLM 호출 하나를 현재 단계로 기록합니다.
+
+    Args:
+        latency (float): 호출 전체 시간(초, 스케줄러 대기 포함).
+        queue_wait (float): 스케줄러 큐에서 기다린 시간(초).
+        prompt_tokens (int), completion_tokens (int): 입력/출력 토큰 수.
+        cost (float): 예상 비용.
+        status (str): 'ok', 'error', 'cancelled'.
+        streamed (bool): 스트리밍 요청 여부.
+        estimated (bool): 토큰 수가 응답의 usage가 아니라 추정치인지 여부.
+        retries (int): 재시도 횟수.
+    """
+    stage = _current_stage.get() or "llm"
+    call = {
+        "stage": stage, "start": time.perf_counter() - latency, "latency": latency, "queue_wait": queue_wait,
+        "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "cost": cost,
+        "status": status, "streamed": streamed, "estimated": estimated, "retries": retries,
+    }
+    _metrics.observe_llm_call(call)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_call(call)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self):
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class _Metrics:
+    """프로세스 전역 집계. Prometheus 텍스트 형식으로 내보냅니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: dict[str, _Histogram] = {}
+        self._llm_latency: dict[str, _Histogram] = {}
+        self._llm_requests: dict[tuple[str, str], int] = {}
+        self._llm_queue_wait: dict[str, float] = {}
+        self._llm_tokens: dict[tuple[str, str], int] = {}
+        self._llm_cost: dict[str, float] = {}
+        self._reviews: dict[str, int] = {}
+        self._review_duration = _Histogram()
+
+    def observe_stage(self, stage: str, duration: float):
+        with self._lock:
+            self._stages.setdefault(stage, _Histogram()).observe(duration)
+
+    def observe_llm_call(self, call: dict):
+        stage = call["stage"]
+        with self._lock:
+            self._llm_latency.setdefault(stage, _Histogram()).observe(call["latency"])
+            key = (stage, call["status"])
+            self._llm_requests[key] = self._llm_requests.get(key, 0) + 1
+            self._llm_queue_wait[stage] = self._llm_queue_wait.get(stage, 0.0) + call["queue_wait"]
+            for kind in ("prompt", "completion"):
+                key = (stage, kind)
+                self._llm_tokens[key] = self._llm_tokens.get(key, 0) + call[f"{kind}_tokens"]
+            self._llm_cost[stage] = self._llm_cost.get(stage, 0.0) + call["cost"]
+
+    def merge_breakdown(self, status: str, breakdown: dict):
+        llm = breakdown["llm"]
+        with self._lock:
+            for stage, totals in llm["by_stage"].items():
+                for status_key, count in (("ok", totals["calls"] - totals["errors"]), ("error", totals["errors"])):
+                    if count:
+                        key = (stage, status_key)
+                        self._llm_requests[key] = self._llm_requests.get(key, 0) + count
+                self._llm_queue_wait[stage] = self._llm_queue_wait.get(stage, 0.0) + totals["queue_wait"]
+                for kind in ("prompt", "completion"):
+                    key = (stage, kind)
+                    self._llm_tokens[key] = self._llm_tokens.get(key, 0) + totals[f"{kind}_tokens"]
+                self._llm_cost[stage] = self._llm_cost.get(stage, 0.0) + totals["cost"]
+        self.observe_review(status, breakdown["wall"])
+
+    def observe_review(self, status: str, duration: float):
+        with self._lock:
+            self._reviews[status] = self._reviews.get(status, 0) + 1
+            self._review_duration.observe(duration)
+
+    def render(self) -> str:
+        p = METRIC_PREFIX
+        lines = []
+        with self._lock:
+            _render_histograms(lines, f"{p}_stage_duration_seconds", "단계별 구간 실행 시간", "stage", self._stages)
+            _render_histograms(lines, f"{p}_llm_request_duration_seconds", "LLM 호출 시간(대기 포함)", "stage",
+                               self._llm_latency)
+            _render_counter(lines, f"{p}_llm_requests_total", "LLM 호출 수", ("stage", "status"), self._llm_requests)
+            _render_counter(lines, f"{p}_llm_queue_wait_seconds_total", "LLM 스케줄러 대기 시간 합계", ("stage",),
+                            {(k,): v for k, v in self._llm_queue_wait.items()})
+            _render_counter(lines, f"{p}_llm_tokens_total", "LLM 토큰 수", ("stage", "kind"), self._llm_tokens)
+            _render_counter(lines, f"{p}_llm_cost_total", "LLM 예상 비용", ("stage",),
+                            {(k,): v for k, v in self._llm_cost.items()})
+            _render_counter(lines, f"{p}_reviews_total", "완료된 PR 리뷰 수", ("status",),
+                            {(k,): v for k, v in self._reviews.items()})
+            _render_histograms(lines, f"{p}_review_duration_seconds", "PR 리뷰 전체 시간", None,
+                               {"": self._review_duration})
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names, values) -> str:
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_counter(lines: list[str], name: str, help_text: str, label_names: tuple, values: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key in sorted(values):
+        lines.append(f"{name}{_labels(label_names, key)} {values[key]}")
+
+
+def _render_histograms(lines: list[str], name: str, help_text: str, label_name: Optional[str],
+                       histograms: dict[str, _Histogram]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key in sorted(histograms):
+        h = histograms[key]
+        base = [(label_name, key)] if label_name else []
+        for bound, count in zip(DURATION_BUCKETS, h.buckets):
+            lines.append(f"{name}_bucket{_labels(*zip(*(base + [('le', bound)])))} {count}")
+        lines.append(f"{name}_bucket{_labels(*zip(*(base + [('le', '+Inf')])))} {h.count}")
+        suffix = _labels(*zip(*base)) if base else ""
+        lines.append(f"{name}_sum{suffix} {h.sum}")
+        lines.append(f"{name}_count{suffix} {h.count}")
+
+
+_metrics = _Metrics()
+
+
+def merge_breakdown(status: str, breakdown: dict):
+    """
+    다른 프로세스(예: 배치 리뷰 워커)에서 끝난 리뷰의 `Trace.breakdown` 결과를 이 프로세스의 지표에 더합니다.
+    LLM 호출 수·토큰·비용·대기 시간과 리뷰 수만 반영하며, 구간별 히스토그램은 반영하지 않습니다.
+    """
+    _metrics.merge_breakdown(status, breakdown)
+
+
+def render_prometheus() -> str:
+    """프로세스 전역 지표를 Prometheus 텍스트 형식(0.0.4)으로 반환합니다."""
+    return _metrics.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(host: str, port: int) -> Optional[ThreadingHTTPServer]:
+    """
+    `/metrics` 엔드포인트를 제공하는 HTTP 서버를 백그라운드 스레드에서 시작합니다. 프로세스당 한 번만 시작합니다.
+    포트가 이미 사용 중이면(예: 같은 머신의 다른 프로세스) 경고만 출력하고 None을 반환합니다.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                traceback.print_exc()
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
@@ -0,0 +1,41 @@
+from hunk_dedup import DedupIndex, fingerprint_diff, normalize_diff
+
+
+def _diff(path: str, *changes: str) -> str:
+    body = "\n".join(changes)
+    return (
+        f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -10,4 +10,4 @@ def handler():\n"
+        f" def handler(request):\n{body}\n     return response\n"
+    )
+
+
+def test_different_callees_are_not_merged():
+    a = _diff("billing.py", "-    total = 0", "+    total = compute_price(items)")
+    b = _diff("users.py", "-    count = 0", "+    count = delete_all(users)")
+    assert normalize_diff(a)[0] != normalize_diff(b)[0]
+
+    index = DedupIndex(0.5)
+    assert index.find_or_add("python", fingerprint_diff(a), "billing.py") is None
+    assert index.find_or_add("python", fingerprint_diff(b), "users.py") is None
+
+
+def test_different_attributes_and_keyword_arguments_are_not_merged():
+    a = _diff("a.py", "+    response = client.get(url, timeout=30)")
+    b = _diff("b.py", "+    response = client.delete(url, retries=30)")
+    assert normalize_diff(a)[0] != normalize_diff(b)[0]
+
+
+def test_consistent_local_rename_is_merged():
+    a = _diff("billing.py", "-    total = 0", "+    total = compute_price(items)")
+    b = _diff("orders/api.py", "-    amount = 0", "+    amount = compute_price(rows)")
+    assert normalize_diff(a)[0] == normalize_diff(b)[0]
+
+    index = DedupIndex(0.8)
+    assert index.find_or_add("python", fingerprint_diff(a), "billing.py") is None
+    assert index.find_or_add("python", fingerprint_diff(b), "orders/api.py") == "billing.py"
+
+
+def test_inconsistent_rename_is_not_merged():
+    a = _diff("a.py", "+    total = price + price")
+    b = _diff("b.py", "+    total = price + tax")
+    assert normalize_diff(a)[0] != normalize_diff(b)[0]
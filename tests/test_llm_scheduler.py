@@ -0,0 +1,142 @@
+import threading
+import time
+import types
+
+import pytest
+
+from llm_scheduler import LLMScheduler, RequestCancelled, cancel_scope
+
+
+class _Raw:
+    def __init__(self, headers: dict = None):
+        self.headers = headers or {}
+
+    def parse(self):
+        return types.SimpleNamespace(usage=None, choices=[])
+
+
+class _Completions:
+    def __init__(self, headers: dict = None):
+        self.calls = 0
+        self.headers = headers
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return _Raw(self.headers)
+
+
+class _Tag:
+    """취소 표식 (약한 참조가 가능해야 함)"""
+
+
+def _scheduler(tpm: int, embedding_headers: dict = None) -> tuple[LLMScheduler, _Completions]:
+    completions = _Completions()
+    client = types.SimpleNamespace(
+        chat=types.SimpleNamespace(completions=types.SimpleNamespace(with_raw_response=completions)),
+        embeddings=types.SimpleNamespace(with_raw_response=_Completions(embedding_headers)),
+    )
+    scheduler = LLMScheduler(lambda: client, rpm=1000, tpm=tpm, max_concurrency=4, max_retries=0,
+                             default_output_tokens=0)
+    return scheduler, completions
+
+
+def _chat_in_thread(scheduler: LLMScheduler, tag: object, tokens: int) -> tuple[threading.Thread, list]:
+    errors = []
+
+    def run():
+        with cancel_scope(tag):
+            try:
+                scheduler.chat(estimated_prompt_tokens=tokens)
+            except RequestCancelled as e:
+                errors.append(e)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, errors
+
+
+def _chat_lane(scheduler: LLMScheduler):
+    return scheduler._lanes[("chat", "")]
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            pytest.fail("조건을 기다리다 시간 초과")
+        time.sleep(0.01)
+
+
+def test_cancel_while_waiting_for_tpm_is_not_counted_as_dispatched():
+    # TPM 600(초당 10토큰): 첫 요청이 버킷을 비우면 다음 요청은 약 1초 기다림
+    scheduler, completions = _scheduler(tpm=600)
+    scheduler.chat(estimated_prompt_tokens=600)
+
+    tag = _Tag()
+    thread, errors = _chat_in_thread(scheduler, tag, 10)
+    time.sleep(0.3)
+    scheduler.cancel(tag)
+    thread.join(5)
+
+    assert len(errors) == 1
+    _wait_for(lambda: scheduler.get_stats()["cancelled"] == 1)
+    stats = scheduler.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+    assert stats["dispatched"] == 1
+    assert completions.calls == 1
+
+
+def test_cancel_wakes_request_waiting_for_tpm():
+    # TPM 100: 첫 요청이 버킷을 비우면 다음 요청은 약 1분을 기다려야 함
+    scheduler, completions = _scheduler(tpm=100)
+    scheduler.chat(estimated_prompt_tokens=100)
+
+    tag = _Tag()
+    thread, errors = _chat_in_thread(scheduler, tag, 100)
+    time.sleep(0.3)
+    started = time.monotonic()
+    scheduler.cancel(tag)
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1.0
+    assert len(errors) == 1
+    assert completions.calls == 1
+
+
+def test_cancel_does_not_duplicate_round_robin_entry():
+    scheduler, _ = _scheduler(tpm=100)
+    scheduler.chat(estimated_prompt_tokens=100)
+
+    # 첫 요청은 TPM을 기다리고, 같은 세션의 두 번째 요청은 큐에 남음
+    waiting_tag, queued_tag = _Tag(), _Tag()
+    waiting, _ = _chat_in_thread(scheduler, waiting_tag, 100)
+    _wait_for(lambda: _chat_lane(scheduler).token_waiter is not None)
+    queued, queued_errors = _chat_in_thread(scheduler, queued_tag, 10)
+    _wait_for(lambda: scheduler.get_stats()["queued"] == 2)
+
+    scheduler.cancel(queued_tag)
+    queued.join(5)
+    assert len(queued_errors) == 1
+    again, _ = _chat_in_thread(scheduler, waiting_tag, 10)
+    _wait_for(lambda: scheduler.get_stats()["queued"] == 2)
+    round_robin = _chat_lane(scheduler).round_robin
+    assert len(round_robin) == len(set(round_robin))
+
+    scheduler.cancel(waiting_tag)
+    waiting.join(5)
+    again.join(5)
+
+
+def test_embedding_rate_limit_headers_do_not_throttle_chat():
+    # 임베딩 배포가 남은 한도 0을 알려도 채팅 배포의 버킷(TPM 60: 초당 1토큰)은 그대로
+    scheduler, completions = _scheduler(tpm=60, embedding_headers={
+        "x-ratelimit-remaining-requests": "0", "x-ratelimit-remaining-tokens": "0",
+    })
+    scheduler.embed(estimated_prompt_tokens=10, model="embedding", input=["x"])
+
+    started = time.monotonic()
+    scheduler.chat(estimated_prompt_tokens=10)
+    assert time.monotonic() - started < 1.0
+    assert completions.calls == 1
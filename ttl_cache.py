@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    스레드 안전한 프로세스 단위 TTL 캐시입니다.
+
+    - 항목은 `ttl`초 후 만료되며, `max_size`를 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다(LRU).
+    - `get_or_load`는 single-flight로 동작하여, 같은 키에 대한 동시 미스는 로더를 한 번만 호출합니다.
+    - 로더가 예외를 던지면 결과를 캐시하지 않고, 대기 중인 모든 호출자에게 같은 예외를 전달합니다.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._coalesced = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        캐시된 값을 반환합니다. 없거나 만료되었으면 None을 반환합니다.
+
+        Args:
+            key (Hashable): 캐시 키.
+
+        Returns:
+            Optional[Any]: 캐시된 값 또는 None.
+        """
+        with self._lock:
+            return self._get_locked(key)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        캐시된 값을 반환하고, 없으면 `loader()`를 호출해 값을 채웁니다.
+
+        Args:
+            key (Hashable): 캐시 키.
+            loader (Callable[[], Any]): 캐시 미스 시 값을 생성하는 함수.
+
+        Returns:
+            Any: 캐시된 값 또는 새로 로드한 값.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._coalesced += 1
+
+        if not is_owner:
+            # 다른 스레드가 같은 키를 로드 중이면 그 결과를 기다립니다.
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._set_locked(key, value)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """값을 캐시에 저장합니다."""
+        with self._lock:
+            self._set_locked(key, value)
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """
+        캐시 항목을 무효화합니다.
+
+        Args:
+            predicate (Optional[Callable[[Hashable], bool]]): 제거할 키를 판별하는 함수. None이면 전체를 비웁니다.
+
+        Returns:
+            int: 제거된 항목 수.
+        """
+        with self._lock:
+            if predicate is None:
+                removed = len(self._data)
+                self._data.clear()
+                return removed
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self) -> dict:
+        """
+        캐시 통계를 반환합니다.
+
+        Returns:
+            dict: 'hits', 'misses', 'coalesced'(single-flight로 합쳐진 미스), 'evictions', 'size', 'hit_rate'.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "coalesced": self._coalesced,
+                "evictions": self._evictions,
+                "size": len(self._data),
+                "hit_rate": (self._hits / total) if total else 0.0,
+            }
+
+    # --- 내부 헬퍼 (self._lock을 잡은 상태에서 호출) ---
+
+    def _get_locked(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self._misses += 1
+            return None
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def _set_locked(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._evictions += 1
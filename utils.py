@@ -1,33 +1,3 @@
-import re
-
-def parse_diff(diff_text: str) -> list[dict]:
-    """
-    Git diff 텍스트를 파일별로 분리합니다.
-
-    Args:
-        diff_text (str): 전체 Git diff 텍스트.
-
-    Returns:
-        list[dict]: 각 파일의 'filename'과 'diff_content'를 포함하는 딕셔너리 리스트.
-    """
-    # diff --git으로 시작하는 패턴을 기준으로 diff 텍스트를 분할
-    # (?=...)는 lookahead assertion으로, 구분자(diff --git)를 결과에 포함시킵니다.
-    file_chunks = re.split(r'(?=diff --git a/.*? b/.*?)', diff_text)
-    
-    files = []
-    # 첫 번째 청크는 보통 비어 있으므로, 비어있지 않은 청크만 처리
-    for chunk in filter(None, file_chunks):
-        # 파일명 추출 (+++ b/ 이후의 경로)
-        filename_match = re.search(r'\+\+\+ b/(.*?)\n', chunk)
-        if filename_match:
-            filename = filename_match.group(1)
-            files.append({
-                "filename": filename,
-                "diff_content": chunk.strip()
-            })
-            
-    return files
-
 def get_copy_button_html(markdown_to_copy: str) -> str:
     """
     마크다운 텍스트를 클립보드에 복사하는 버튼의 HTML과 JavaScript 코드를 생성합니다.